@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+Statistics over many data frames that share the same index columns,
+computed one data frame at a time so that they never all sit in memory.
+Two accumulators can be merged, so the work can be split between
+processes. For instance:
+
+    >>> acc = Accumulator(['year', 'forest_type'], ['mass'])
+    >>> for runner in members: acc.update(runner.post_processor.inventory.sum_merch_stock)
+    >>> print(acc.df)
+"""
+
+# Built-in modules #
+
+# Third party modules #
+import numpy, pandas
+
+# First party modules #
+
+# Internal modules #
+
+###############################################################################
+class Accumulator(object):
+    """
+    For every row (identified by the `index` columns) and every column in
+    `values`, keeps the count, mean, sum of squared deviations (Welford),
+    minimum and maximum. Quantiles come from a uniform random sample of at
+    most `max_samples` values per row, exact when there are fewer members.
+    """
+
+    def __init__(self, index, values, max_samples=100, seed=1):
+        # Default attributes #
+        self.index       = list(index)
+        self.values      = list(values)
+        self.max_samples = max_samples
+        self.random      = numpy.random.RandomState(seed)
+        # The state, one entry per value column #
+        self.keys    = pandas.MultiIndex.from_tuples([], names=self.index)
+        self.count   = {v: numpy.zeros(0)                  for v in self.values}
+        self.mean    = {v: numpy.zeros(0)                  for v in self.values}
+        self.m2      = {v: numpy.zeros(0)                  for v in self.values}
+        self.minimum = {v: numpy.zeros(0)                  for v in self.values}
+        self.maximum = {v: numpy.zeros(0)                  for v in self.values}
+        self.samples = {v: numpy.zeros((0, max_samples))   for v in self.values}
+
+    def __repr__(self):
+        return '%s object with %i rows' % (self.__class__, len(self.keys))
+
+    #-------------------------------------------------------------------------#
+    def align(self, keys):
+        """Extend the state so that it covers the given keys too."""
+        union = self.keys.union(keys, sort=False) if len(self.keys) else keys
+        if len(union) == len(self.keys): return
+        position = self.keys.get_indexer(union)
+        new      = position == -1
+        def extend(array, fill):
+            shape  = (len(union),) + array.shape[1:]
+            result = numpy.full(shape, fill, dtype=float)
+            result[~new] = array[position[~new]]
+            return result
+        for v in self.values:
+            self.count[v]   = extend(self.count[v],   0.0)
+            self.mean[v]    = extend(self.mean[v],    0.0)
+            self.m2[v]      = extend(self.m2[v],      0.0)
+            self.minimum[v] = extend(self.minimum[v], numpy.inf)
+            self.maximum[v] = extend(self.maximum[v], -numpy.inf)
+            self.samples[v] = extend(self.samples[v], numpy.nan)
+        self.keys = union
+
+    def update(self, df):
+        """Add one data frame, typically the output of one member."""
+        # Sum duplicated rows if any #
+        df   = df.groupby(self.index, observed=True)[self.values].sum()
+        keys = pandas.MultiIndex.from_frame(df.index.to_frame(index=False))
+        self.align(keys)
+        rows = self.keys.get_indexer(keys)
+        for v in self.values:
+            x     = df[v].values.astype(float)
+            valid = ~numpy.isnan(x)
+            r, x  = rows[valid], x[valid]
+            # Welford #
+            n     = self.count[v][r] + 1
+            delta = x - self.mean[v][r]
+            self.count[v][r] = n
+            self.mean[v][r] += delta / n
+            self.m2[v][r]   += delta * (x - self.mean[v][r])
+            self.minimum[v][r] = numpy.minimum(self.minimum[v][r], x)
+            self.maximum[v][r] = numpy.maximum(self.maximum[v][r], x)
+            # Reservoir sampling #
+            slot = (n - 1).astype(int)
+            full = slot >= self.max_samples
+            pick = self.random.randint(0, 2**31 - 1, size=len(n)) % n.astype(int)
+            slot = numpy.where(full, pick, slot)
+            keep = slot < self.max_samples
+            self.samples[v][r[keep], slot[keep]] = x[keep]
+
+    def merge(self, other):
+        """Combine with another accumulator that saw different members."""
+        self.align(other.keys)
+        rows = self.keys.get_indexer(other.keys)
+        for v in self.values:
+            na, nb = self.count[v][rows], other.count[v]
+            n      = na + nb
+            safe   = numpy.where(n > 0, n, 1)
+            delta  = other.mean[v] - self.mean[v][rows]
+            self.mean[v][rows] += delta * nb / safe
+            self.m2[v][rows]   += other.m2[v] + delta**2 * na * nb / safe
+            self.count[v][rows] = n
+            self.minimum[v][rows] = numpy.minimum(self.minimum[v][rows], other.minimum[v])
+            self.maximum[v][rows] = numpy.maximum(self.maximum[v][rows], other.maximum[v])
+            # Samples, each side is represented in proportion of its count #
+            for i, row in enumerate(rows):
+                a = self.samples[v][row][~numpy.isnan(self.samples[v][row])]
+                b = other.samples[v][i][~numpy.isnan(other.samples[v][i])]
+                pool = numpy.concatenate([a, b])
+                if len(pool) > self.max_samples:
+                    weights = numpy.concatenate([numpy.full(len(a), na[i] / max(len(a), 1)),
+                                                 numpy.full(len(b), nb[i] / max(len(b), 1))])
+                    pool = self.random.choice(pool, self.max_samples, replace=False,
+                                              p=weights / weights.sum())
+                self.samples[v][row] = numpy.nan
+                self.samples[v][row][:len(pool)] = pool
+        return self
+
+    #-------------------------------------------------------------------------#
+    @property
+    def df(self):
+        """
+        One row per key with the mean, variance, standard deviation,
+        minimum, maximum and 5%, 50%, 95% quantiles of every value column.
+        """
+        result = self.keys.to_frame(index=False)
+        for v in self.values:
+            n = self.count[v]
+            result[v + '_n']    = n
+            result[v + '_mean'] = numpy.where(n > 0, self.mean[v], numpy.nan)
+            result[v + '_var']  = numpy.where(n > 1, self.m2[v] / numpy.maximum(n - 1, 1), numpy.nan)
+            result[v + '_std']  = numpy.sqrt(result[v + '_var'])
+            result[v + '_min']  = numpy.where(n > 0, self.minimum[v], numpy.nan)
+            result[v + '_max']  = numpy.where(n > 0, self.maximum[v], numpy.nan)
+            for q in (5, 50, 95):
+                with numpy.errstate(all='ignore'):
+                    quantile = numpy.full(len(n), numpy.nan)
+                    has = n > 0
+                    if has.any(): quantile[has] = numpy.nanpercentile(self.samples[v][has], q, axis=1)
+                result[v + '_q%02i' % q] = quantile
+        return result
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+Keeps the memory used by cached data frames below a budget. You can set
+the budget in megabytes with an environment variable:
+
+    $ export CBMCFS3_CACHE_BUDGET=8000
+
+And interact with it like this:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> from cbmcfs3_runner.core.cache_manager import cache_manager
+    >>> cache_manager.pin('AT')
+    >>> print(cache_manager.stats)
+    >>> continent.free_memory()
+"""
+
+# Built-in modules #
+import os, gc, weakref, collections
+
+# Third party modules #
+import pandas
+
+# First party modules #
+from plumbing.cache import property_cached
+
+# Internal modules #
+
+# Default budget in megabytes #
+default_budget = 4000
+
+# But you can override that with an environment variable #
+if os.environ.get("CBMCFS3_CACHE_BUDGET"):
+    default_budget = int(os.environ['CBMCFS3_CACHE_BUDGET'])
+
+###############################################################################
+def size_of(value):
+    """The memory used by a cached value in bytes. Only pandas objects count."""
+    if isinstance(value, pandas.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pandas.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    return 0
+
+def country_of(obj):
+    """
+    Go up the `parent` chain to find which country an object belongs to.
+    Returns the ISO2 code or None.
+    """
+    for i in range(8):
+        if obj is None: return None
+        if hasattr(obj, 'iso2_code'): return obj.iso2_code
+        country = obj.__dict__.get('country')
+        if country is not None: return country.iso2_code
+        obj = getattr(obj, 'parent', None)
+    return None
+
+###############################################################################
+class CacheManager(object):
+    """
+    Tracks every value computed by a `property_managed` attribute in
+    least-recently-used order. When the total size goes above the budget
+    the oldest entries are purged from the cache of their instance, so they
+    will simply be recomputed if accessed again. Entries belonging to a
+    pinned country are never evicted automatically.
+    """
+
+    def __init__(self, budget=default_budget):
+        # The budget in bytes #
+        self.budget  = budget * 1024 * 1024
+        # Key is (id(instance), name) #
+        self.entries = collections.OrderedDict()
+        self.pinned  = set()
+        # Statistics #
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return '%s object with %i entries using %.1f MB' % \
+               (self.__class__, len(self.entries), self.total_size / 1024 / 1024)
+
+    @property
+    def total_size(self):
+        return sum(e['size'] for e in self.entries.values())
+
+    @property
+    def stats(self):
+        """A summary of the activity of the cache."""
+        total = self.hits + self.misses
+        return {'entries':   len(self.entries),
+                'size_mb':   self.total_size / 1024 / 1024,
+                'budget_mb': self.budget / 1024 / 1024,
+                'hits':      self.hits,
+                'misses':    self.misses,
+                'hit_ratio': self.hits / total if total else None,
+                'evictions': self.evictions,
+                'pinned':    sorted(self.pinned)}
+
+    @property
+    def df(self):
+        """One row per entry currently cached, oldest first."""
+        rows = [{'name':    e['name'],
+                 'owner':   repr(e['ref']()),
+                 'country': e['country'],
+                 'size_mb': e['size'] / 1024 / 1024} for e in self.entries.values()]
+        return pandas.DataFrame(rows)
+
+    #-------------------------------------------------------------------------#
+    def pin(self, iso2_code):
+        """Never evict the entries of this country automatically."""
+        self.pinned.add(iso2_code)
+
+    def unpin(self, iso2_code):
+        self.pinned.discard(iso2_code)
+
+    def hit(self, instance, name):
+        self.hits += 1
+        key = (id(instance), name)
+        if key in self.entries: self.entries.move_to_end(key)
+
+    def add(self, instance, name, value):
+        """Record a newly computed value and evict if needed."""
+        self.misses += 1
+        size = size_of(value)
+        if size == 0: return
+        key = (id(instance), name)
+        # Remove the entry automatically if the instance is garbage collected #
+        ref = weakref.ref(instance, lambda r, key=key: self.entries.pop(key, None))
+        self.entries[key] = {'ref':     ref,
+                             'name':    name,
+                             'size':    size,
+                             'country': country_of(instance)}
+        # Check the budget #
+        self.enforce_budget()
+
+    def evict(self, key):
+        """Remove one entry from the cache of its instance."""
+        entry    = self.entries.pop(key)
+        instance = entry['ref']()
+        if instance is not None: instance.__cache__.pop(entry['name'], None)
+        self.evictions += 1
+
+    def enforce_budget(self):
+        """Evict the least recently used entries until we are within budget."""
+        total = self.total_size
+        if total <= self.budget: return
+        for key in list(self.entries):
+            if total <= self.budget: break
+            entry = self.entries[key]
+            if entry['country'] in self.pinned: continue
+            total -= entry['size']
+            self.evict(key)
+
+    def free_memory(self, include_pinned=False):
+        """Evict every entry, but keep the pinned countries by default."""
+        for key in list(self.entries):
+            if not include_pinned and self.entries[key]['country'] in self.pinned: continue
+            self.evict(key)
+        gc.collect()
+
+# A single instance shared by all #
+cache_manager = CacheManager()
+
+###############################################################################
+class property_managed(property_cached):
+    """
+    Same as `property_cached` but the value computed is registered
+    with the cache manager that may evict it to stay under budget.
+    """
+
+    def __get__(self, instance, owner):
+        # If called from a class #
+        if instance is None: return self
+        # Is the answer in the cache? #
+        self.check_cache(instance)
+        if self.name in instance.__cache__:
+            cache_manager.hit(instance, self.name)
+            return instance.__cache__[self.name]
+        # If not we will compute it #
+        result = property_cached.__get__(self, instance, owner)
+        cache_manager.add(instance, self.name, result)
+        # Return #
+        return result
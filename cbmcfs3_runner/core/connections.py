@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+Keeps one handle per Access database file, shared by everyone who needs
+it and closed when the last user releases it. You can inspect the open
+handles and close them all like this:
+
+    >>> from cbmcfs3_runner.core.connections import connection_pool
+    >>> print(connection_pool.df)
+    >>> connection_pool.close_all()
+"""
+
+# Built-in modules #
+import os, time, itertools, threading
+
+# Third party modules #
+import pandas
+
+# First party modules #
+from plumbing.databases.access_database import AccessDatabase
+
+# Internal modules #
+
+###############################################################################
+class ClosedHandleError(Exception):
+    """Raised when a handle that the pool closed is used again."""
+    pass
+
+class PooledDatabase(AccessDatabase):
+    """
+    An `AccessDatabase` that refuses to reconnect once the pool closed it,
+    instead of silently opening a connection that nobody tracks.
+    """
+
+    closed = False
+
+    def check_open(self):
+        if not self.closed: return
+        msg = "The handle on '%s' was closed by the connection pool, acquire a new one."
+        raise ClosedHandleError(msg % self.path)
+
+    def new_conn(self):
+        self.check_open()
+        return super(PooledDatabase, self).new_conn()
+
+    def table_as_df_via_mdbtools(self, *args, **kwargs):
+        self.check_open()
+        return super(PooledDatabase, self).table_as_df_via_mdbtools(*args, **kwargs)
+
+###############################################################################
+def close_handle(database):
+    """
+    Close only the connections and cursors that were actually opened,
+    `AccessDatabase.close` would open them first just to close them.
+    """
+    cache = database.__dict__.get('__cache__', {})
+    for name in ('cursor', 'own_cursor', 'conn', 'own_conn'):
+        if name not in cache: continue
+        try:
+            cache.pop(name).close()
+        except Exception:
+            pass
+
+###############################################################################
+class ConnectionPool(object):
+    """
+    Reference counted `AccessDatabase` objects, keyed by the real path of
+    the file. Calling `acquire` twice on the same file gives back the same
+    object, so the connection and the cursor are reused. When the count
+    goes back to zero the connections are closed.
+
+    Every `acquire` returns a token that must be given back to `release`.
+    A token only counts for the handle it was issued with, so releasing
+    it after that handle was closed, or twice, does nothing.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.owners  = {}
+        self.tokens  = itertools.count()
+        self.lock    = threading.RLock()
+        # Statistics #
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+
+    def __repr__(self):
+        return '%s object with %i open handles' % (self.__class__, len(self.entries))
+
+    def key(self, path):
+        return os.path.realpath(str(path))
+
+    #-------------------------------------------------------------------------#
+    def acquire(self, path):
+        """
+        Get the shared handle on a database file and count one more user.
+        Returns the handle and the token to release it with.
+        """
+        key = self.key(path)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                database = PooledDatabase(path)
+                database.convert_col_names_to_snake = True
+                entry = {'database': database,
+                         'tokens':   set(),
+                         'acquired': 0,
+                         'opened_at': time.time()}
+                self.entries[key] = entry
+                self.opened += 1
+            else:
+                self.reused += 1
+            token = next(self.tokens)
+            entry['tokens'].add(token)
+            entry['acquired'] += 1
+            entry['used_at']   = time.time()
+            self.owners[token] = entry
+            return entry['database'], token
+
+    def release(self, token):
+        """Count one less user and close the handle if nobody is left."""
+        with self.lock:
+            entry = self.owners.pop(token, None)
+            if entry is None: return
+            entry['tokens'].discard(token)
+            if entry['tokens']: return
+            # Only if that handle is still the current one for its file #
+            key = self.key(entry['database'].path)
+            if self.entries.get(key) is entry: self.close(key)
+
+    def close(self, path):
+        """
+        Close the handle on a database file regardless of its users, for
+        instance before the file is overwritten by a new simulation.
+        The users still holding it get an error if they try to use it.
+        """
+        key = self.key(path)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None: return
+            for token in entry['tokens']: self.owners.pop(token, None)
+            entry['database'].closed = True
+            close_handle(entry['database'])
+            self.closed += 1
+
+    def close_all(self):
+        for key in list(self.entries): self.close(key)
+
+    #-------------------------------------------------------------------------#
+    @property
+    def stats(self):
+        """A summary of the activity of the pool."""
+        return {'open':   len(self.entries),
+                'opened': self.opened,
+                'reused': self.reused,
+                'closed': self.closed,
+                'refs':   sum(len(e['tokens']) for e in self.entries.values())}
+
+    @property
+    def df(self):
+        """One row per open handle."""
+        now  = time.time()
+        rows = [{'path':      key,
+                 'refs':      len(e['tokens']),
+                 'acquired':  e['acquired'],
+                 'connected': 'own_conn' in e['database'].__dict__.get('__cache__', {}),
+                 'age_s':     now - e['opened_at'],
+                 'idle_s':    now - e['used_at']} for key, e in self.entries.items()]
+        return pandas.DataFrame(rows)
+
+# A single instance shared by all #
+connection_pool = ConnectionPool()
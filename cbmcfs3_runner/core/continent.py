@@ -27,6 +27,9 @@ from plumbing.cache       import property_cached
 # Internal modules #
 from cbmcfs3_runner.core.country import Country
 from cbmcfs3_runner.scenarios import scen_classes
+from cbmcfs3_runner.core.cache_manager import cache_manager
+from cbmcfs3_runner.core.manifest import StatusIndex
+from cbmcfs3_runner.core.cube import ResultsCube
 
 # Where is the data, default case #
 cbm_data_repos = DirectoryPath("~/repos/cbmcfs3_data/")
@@ -52,6 +55,8 @@ class Continent(object):
     /countries/
     /scenarios/
     /reports/
+    /cube/
+    /status.sqlite
     """
 
     def __init__(self, base_dir):
@@ -93,12 +98,37 @@ class Continent(object):
         all_scenarios = [Scen(self) for Scen in scen_classes]
         return {s.short_name: s for s in all_scenarios}
 
+    @property_cached
+    def status_index(self):
+        """The state of every runner, see `core/manifest.py`."""
+        return StatusIndex(self.paths.status)
+
+    @property_cached
+    def cube(self):
+        """The results of all scenarios and countries, see `core/cube.py`."""
+        return ResultsCube(self)
+
     def run_scenarios(self, verbose=True):
         """Run all scenarios for all countries in continent."""
         for scenario in self.scenarios.values():
             print(scenario)
             scenario(verbose=verbose)
 
+    def free_memory(self, include_pinned=False):
+        """
+        Release all the data frames cached by the post-processing of every
+        runner, except those of the pinned countries. They will be recomputed
+        if they are accessed again.
+        """
+        cache_manager.free_memory(include_pinned)
+
+    def pin(self, iso2_code):
+        """Keep the cached data frames of this country in memory."""
+        cache_manager.pin(iso2_code)
+
+    def unpin(self, iso2_code):
+        cache_manager.unpin(iso2_code)
+
     def get_runner(self, scenario, country, step):
         """
         Return a runner based on scenario, country and step.
@@ -30,6 +30,7 @@ from cbmcfs3_runner.stdrd_import_tool.associations import Associations
 from cbmcfs3_runner.disturbances.demand            import Demand
 from cbmcfs3_runner.disturbances.silviculture      import Silviculture
 from cbmcfs3_runner.pump.faostat                   import faostat
+from cbmcfs3_runner.pump.schemas                   import schemas
 
 # Constants #
 country_code_path = module_dir + 'extra_data/country_codes.csv'
@@ -79,7 +80,8 @@ class Country(object):
         self.set_years()
 
     def __call__(self):
-        self.graphs(rerun=True)
+        # One country alone is not worth a pool of processes #
+        self.graphs.render(processes=1)
         self.report()
         #c.report.copy_to_outbox()
 
@@ -198,7 +200,7 @@ class Country(object):
 
         Columns are: ['id', 'forest_type', 'density', 'harvest_gr']
         """
-        return pandas.read_csv(str(self.paths.coefficients))
+        return schemas['coefficients'].read(self.paths.coefficients)
 
     @property_cached
     def faostat(self):
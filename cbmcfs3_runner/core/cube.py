@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+The results of every runner gathered in one labelled table with the
+dimensions scenario, country, year, category and variable. The category
+is the IPCC pool or the forest type depending on the source. Use it
+like this:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> cube = continent.cube
+    >>> cube.build(['static_demand', 'calibration'])
+    >>> print(cube.select(country='LU', variable='mass'))
+    >>> print(cube.difference('static_demand', 'calibration', variable='tc'))
+    >>> print(cube.rollup(scenario='static_demand', variable='tc'))
+"""
+
+# Built-in modules #
+import os
+
+# Third party modules #
+import pandas
+from tqdm import tqdm
+
+# First party modules #
+from autopaths.dir_path import DirectoryPath
+
+# Internal modules #
+
+###############################################################################
+class Source(object):
+    """
+    One output of the post-processor added to the cube. The `category`
+    column becomes the category dimension, the `additive` variables are
+    the only ones that can be summed across countries.
+    """
+
+    def __init__(self, name, func, category, variables, additive):
+        self.name      = name
+        self.func      = func
+        self.category  = category
+        self.variables = variables
+        self.additive  = additive
+
+    def __repr__(self):
+        return '%s object "%s"' % (self.__class__, self.name)
+
+    def long(self, runner):
+        """The output of one runner melted to the cube dimensions."""
+        df = self.func(runner)
+        variables = self.variables or [c for c in df.select_dtypes('number').columns
+                                       if c not in ('year', 'time_step')]
+        # Aggregate anything finer than our dimensions #
+        index = ['year'] + ([self.category] if self.category else [])
+        df = df.groupby(index, observed=True)[variables].sum(min_count=1).reset_index()
+        if not self.category: df['category'] = 'total'
+        else:                 df = df.rename(columns={self.category: 'category'})
+        df['category'] = df['category'].astype(str)
+        # Melt #
+        df = df.melt(id_vars    = ['year', 'category'],
+                     value_vars = variables,
+                     var_name   = 'variable',
+                     value_name = 'value')
+        df.insert(0, 'country',  runner.country.iso2_code)
+        df.insert(0, 'scenario', runner.scenario.short_name)
+        return df
+
+# The sources available #
+sources = [
+    Source('carbon_stock', lambda r: r.post_processor.ipcc.carbon_stock_long,
+           category  = 'ipcc_pool',
+           variables = ['tc', 'area', 'tc_ha', 'tc_change', 'co2_em_ha'],
+           additive  = ['tc', 'area', 'tc_change']),
+    Source('merch_stock',  lambda r: r.post_processor.inventory.sum_merch_stock,
+           category  = 'forest_type',
+           variables = ['mass', 'volume'],
+           additive  = ['mass', 'volume']),
+    Source('hwp',          lambda r: r.post_processor.products.hwp,
+           category  = None,
+           variables = None,
+           additive  = None),
+]
+sources = {s.name: s for s in sources}
+
+###############################################################################
+class ResultsCube(object):
+    """
+    Stored on disk in chunks of one file per source, scenario and country,
+    so that adding a runner only rewrites its own chunks and selecting
+    a scenario or a country only reads the chunks concerned.
+    The chunks are parquet files in long format, one row per value.
+    """
+
+    dimensions = ['scenario', 'country', 'year', 'category', 'variable']
+
+    def __init__(self, parent, base_dir=None):
+        # Default attributes #
+        self.parent   = parent
+        self.base_dir = base_dir or parent.paths.cube_dir
+        self.base_dir = DirectoryPath(self.base_dir)
+
+    def __repr__(self):
+        return '%s object in "%s"' % (self.__class__, self.base_dir)
+
+    #-------------------------------------------------------------------------#
+    def chunk_path(self, source, scenario, iso2_code):
+        return self.base_dir + source + '/' + scenario + '/' + iso2_code + '.parquet'
+
+    def chunk_is_fresh(self, path, runner):
+        """A chunk is fresh when it was written after the last run."""
+        if not path.exists:              return False
+        if not runner.paths.log.exists:  return True
+        return os.path.getmtime(str(path)) >= os.path.getmtime(str(runner.paths.log))
+
+    def add(self, runner, overwrite=False):
+        """Write the chunks of one runner, skipping those still fresh."""
+        for source in sources.values():
+            path = self.chunk_path(source.name, runner.scenario.short_name,
+                                   runner.country.iso2_code)
+            if not overwrite and self.chunk_is_fresh(path, runner): continue
+            path.directory.create_if_not_exists()
+            source.long(runner).to_parquet(str(path), index=False)
+
+    def build(self, scenarios=None, countries=None, step=-1, overwrite=False):
+        """
+        Add the last runner of every country of every scenario given,
+        by default all of them. Runners that did not complete are skipped.
+        """
+        if scenarios is None: scenarios = list(self.parent.scenarios)
+        for name in scenarios:
+            scenario = self.parent.scenarios[name]
+            for iso2_code, steps in tqdm(scenario.runners.items(), desc=name):
+                if countries is not None and iso2_code not in countries: continue
+                runner = steps[step]
+                if runner.map_value < 1.0: continue
+                self.add(runner, overwrite=overwrite)
+
+    #-------------------------------------------------------------------------#
+    def chunks(self, source=None, scenario=None, country=None):
+        """The chunk files that can contain the selection."""
+        as_set = lambda x: None if x is None else set([x] if isinstance(x, str) else x)
+        source, scenario, country = as_set(source), as_set(scenario), as_set(country)
+        if not self.base_dir.exists: return
+        for src_dir in self.base_dir.flat_directories:
+            if source is not None and src_dir.name not in source: continue
+            for scen_dir in src_dir.flat_directories:
+                if scenario is not None and scen_dir.name not in scenario: continue
+                for path in scen_dir.flat_files:
+                    if country is not None and path.prefix not in country: continue
+                    yield path
+
+    def select(self, source=None, scenario=None, country=None,
+               year=None, category=None, variable=None):
+        """
+        A series of values indexed by the five dimensions. Every argument
+        can be a single label or a list of labels, `None` means all.
+        """
+        # Only read the chunks needed #
+        frames = [pandas.read_parquet(str(p)) for p in
+                  self.chunks(source, scenario, country)]
+        if not frames:
+            empty = pandas.MultiIndex.from_tuples([], names=self.dimensions)
+            return pandas.Series([], index=empty, name='value', dtype=float)
+        df = pandas.concat(frames, ignore_index=True)
+        # Filter the remaining dimensions #
+        for dim, labels in (('year', year), ('category', category), ('variable', variable)):
+            if labels is None: continue
+            if isinstance(labels, (str, int)): labels = [labels]
+            df = df[df[dim].isin(labels)]
+        # Return #
+        return df.set_index(self.dimensions)['value'].sort_index()
+
+    def difference(self, scenario, reference, **selection):
+        """
+        The values of `scenario` minus those of `reference`, aligned on
+        the other dimensions. Missing values on one side give NaN.
+        """
+        a = self.select(scenario=scenario,  **selection).droplevel('scenario')
+        b = self.select(scenario=reference, **selection).droplevel('scenario')
+        return a.sub(b)
+
+    def rollup(self, **selection):
+        """
+        The sum over every country of the additive variables, for instance
+        the carbon stock or the area but not the carbon per hectare.
+        """
+        df = self.select(**selection).reset_index()
+        ratios = set()
+        for source in sources.values():
+            if source.additive is None: continue
+            ratios |= set(source.variables) - set(source.additive)
+        df = df[~df['variable'].isin(ratios)]
+        index = [d for d in self.dimensions if d != 'country']
+        return df.groupby(index, observed=True)['value'].sum()
+
+    def to_wide(self, series, columns='scenario'):
+        """Put one dimension in the columns, typically to compare scenarios."""
+        return series.unstack(columns)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+Run many runners at the same time in separate processes. Runners are
+sent to the workers as (scenario, country, num) keys and found again
+there through the continent, since the objects themselves hold loggers
+and database connections.
+"""
+
+# Built-in modules #
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Third party modules #
+from tqdm import tqdm
+
+# First party modules #
+
+# Internal modules #
+
+###############################################################################
+def runner_key(runner):
+    return runner.scenario.short_name, runner.country.iso2_code, runner.num
+
+def resolve(key):
+    """Find a runner from its key, used inside the workers."""
+    from cbmcfs3_runner.core.continent import continent
+    scenario, iso2_code, num = key
+    runners = continent.scenarios[scenario].runners[iso2_code]
+    return [r for r in runners if r.num == num][0]
+
+def run_one(key, verbose=False):
+    """Entry point of a worker process. Returns the key and the status."""
+    runner = resolve(key)
+    runner(interrupt_on_error=False, verbose=verbose)
+    status = runner.status
+    return key, status['status'] if status else None
+
+def run_many(runners, processes=1, verbose=False):
+    """
+    Run every runner given, `processes` at a time.
+    Returns a dictionary of keys to the final status of each runner.
+    """
+    runners = list(runners)
+    # Serial #
+    if processes <= 1:
+        return dict(run_one(runner_key(r), verbose) for r in tqdm(runners))
+    # Parallel #
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(run_one, runner_key(r), verbose) for r in runners]
+        return dict(f.result() for f in tqdm(as_completed(futures), total=len(futures)))
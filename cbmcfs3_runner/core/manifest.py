@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+Every runner writes a small structured summary of its last run, and the
+same information is kept for all runners in one SQLite file at the root
+of the data repository. You can query it like this:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> print(continent.status_index.df)
+    >>> print(continent.status_index.df.query("status == 'failed'"))
+"""
+
+# Built-in modules #
+import os, time, socket, sqlite3
+
+# Third party modules #
+import pandas
+import simplejson as json
+
+# First party modules #
+from autopaths            import Path
+from autopaths.auto_paths import AutoPaths
+
+# Internal modules #
+
+# The stages of a runner in the order they happen #
+stages = ['pre_processor', 'stage_in', 'pre_flight', 'aidb_switch',
+          'default_sit', 'append_sit', 'middle_processor', 'launch_cbm',
+          'launch_libcbm', 'sync_back', 'post_processor']
+
+###############################################################################
+def progress(status, stage):
+    """
+    Return a float that indicates how far a runner went within the
+    pipeline. Same values as what we used to get by scraping the logs:
+    0.5 once SIT has created the project, 1.0 only once the whole run
+    completed. A run that failed in the post-processing stays at 0.5.
+    """
+    if status == 'completed':                        return 1.0
+    if stage is None or stage not in stages:         return 0.0
+    if stages.index(stage) > stages.index('default_sit'): return 0.5
+    return 0.0
+
+###############################################################################
+class RunManifest(object):
+    """
+    A machine readable summary of the last run of a runner: the last
+    stage reached, the time taken by each stage, some hashes and the
+    class of the error if any. It is rewritten every time a stage starts
+    and mirrored in the continent-wide `StatusIndex`.
+    """
+
+    all_paths = """
+    /logs/manifest.json
+    """
+
+    def __init__(self, parent):
+        # Default attributes #
+        self.parent = parent
+        self.content = {}
+        # Directories #
+        self.paths = AutoPaths(self.parent.data_dir, self.all_paths)
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.paths.json)
+
+    @property
+    def index(self):
+        return self.parent.scenario.continent.status_index
+
+    #-------------------------------------------------------------------------#
+    def start(self):
+        """Called at the beginning of a run."""
+        self.content = {'runner':        self.parent.short_name,
+                        'scenario':      self.parent.scenario.short_name,
+                        'country':       self.parent.country.iso2_code,
+                        'num':           self.parent.num,
+                        'simulator':     self.parent.simulator,
+                        'hostname':      socket.gethostname(),
+                        'pid':           os.getpid(),
+                        'status':        'running',
+                        'stage':         None,
+                        'started':       time.time(),
+                        'ended':         None,
+                        'timings':       {},
+                        'hashes':        {},
+                        'error_class':   None,
+                        'error_message': None}
+        self.save()
+
+    def reached(self, stage):
+        """Called when a stage starts."""
+        # The sync back happens even after a failure, it tells us nothing #
+        if stage == 'sync_back': return
+        self.content['stage'] = stage
+        self.save()
+
+    def add_hash(self, name, value):
+        self.content['hashes'][name] = value
+
+    def finish(self):
+        """Called when the run completed without errors."""
+        self.content['status'] = 'completed'
+        self.end()
+
+    def fail(self, error):
+        """Called with the exception that interrupted the run."""
+        self.content['status']         = 'failed'
+        self.content['error_class']    = error.__class__.__name__
+        self.content['error_message']  = str(error)[:1000]
+        self.content['failure_reason'] = getattr(error, 'reason', None)
+        self.end()
+
+    def end(self):
+        self.content['ended'] = time.time()
+        # Only top level stages, from the metrics #
+        self.content['timings'] = {r['stage']: r['wall_time']
+                                   for r in self.parent.metrics.records
+                                   if r['parent'] is None}
+        self.save()
+
+    #-------------------------------------------------------------------------#
+    def save(self):
+        """Write the JSON atomically and update the status index."""
+        # Write to a temporary file first then rename #
+        tmp_path = Path(self.paths.json + '.tmp')
+        tmp_path.write(json.dumps(self.content, indent=4, ignore_nan=True))
+        os.replace(str(tmp_path), str(self.paths.json))
+        # The index #
+        self.index.update(self.content)
+
+    def load(self):
+        """Read the manifest of the last run from disk."""
+        if not self.paths.json.exists: return {}
+        return json.loads(self.paths.json.contents)
+
+###############################################################################
+class StatusIndex(object):
+    """
+    One SQLite database with one row per runner, so that we can know the
+    state of every runner without reading any log file.
+    Each update is a single transaction so concurrent runners can share it.
+    """
+
+    columns = ['runner', 'scenario', 'country', 'num', 'simulator', 'status',
+               'stage', 'map_value', 'hostname', 'started', 'ended',
+               'error_class', 'error_message', 'failure_reason']
+
+    create_query = """
+    CREATE TABLE IF NOT EXISTS runners (
+        runner        TEXT PRIMARY KEY,
+        scenario      TEXT,
+        country       TEXT,
+        num           INTEGER,
+        simulator     TEXT,
+        status        TEXT,
+        stage         TEXT,
+        map_value     REAL,
+        hostname      TEXT,
+        started       REAL,
+        ended         REAL,
+        error_class    TEXT,
+        error_message  TEXT,
+        failure_reason TEXT
+    )"""
+
+    # The types of the columns added since the first version of the table #
+    added_columns = {'failure_reason': 'TEXT'}
+
+    def __init__(self, path):
+        self.path  = Path(path)
+        self.ready = False
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.path)
+
+    def connect(self):
+        """A new connection each time, safe to use from many processes."""
+        return sqlite3.connect(str(self.path), timeout=60)
+
+    def setup(self, connection):
+        """Create or upgrade the table, only once and only before writing."""
+        if self.ready: return
+        connection.execute(self.create_query)
+        self.migrate(connection)
+        self.ready = True
+
+    def migrate(self, connection):
+        """
+        Add the columns that an older status.sqlite doesn't have yet,
+        `CREATE TABLE IF NOT EXISTS` leaves an existing table as it is.
+        """
+        existing = {row[1] for row in connection.execute("PRAGMA table_info(runners)")}
+        for name, kind in self.added_columns.items():
+            if name in existing: continue
+            try:
+                with connection: connection.execute("ALTER TABLE runners ADD COLUMN %s %s" % (name, kind))
+            except sqlite3.OperationalError:
+                # Another process added it at the same time #
+                pass
+
+    def update(self, content):
+        """Insert or replace the row of one runner from its manifest."""
+        row = {k: content.get(k) for k in self.columns}
+        row['map_value'] = progress(content.get('status'), content.get('stage'))
+        query = "INSERT OR REPLACE INTO runners (%s) VALUES (%s)"
+        query = query % (', '.join(self.columns), ', '.join('?' * len(self.columns)))
+        connection = self.connect()
+        try:
+            self.setup(connection)
+            with connection: connection.execute(query, [row[k] for k in self.columns])
+        finally:
+            connection.close()
+
+    #-------------------------------------------------------------------------#
+    def select(self, connection):
+        """
+        The SELECT clause of all our columns, those that an older file
+        doesn't have yet come back as NULL. None if there is no table.
+        Reading never creates nor changes anything.
+        """
+        existing = {row[1] for row in connection.execute("PRAGMA table_info(runners)")}
+        if not existing: return None
+        cols = [c if c in existing else 'NULL AS ' + c for c in self.columns]
+        return "SELECT %s FROM runners" % ', '.join(cols)
+
+    def get(self, runner):
+        """The row of one runner as a dictionary, or None."""
+        if not self.path.exists: return None
+        connection = self.connect()
+        try:
+            query = self.select(connection)
+            if query is None: return None
+            result = connection.execute(query + " WHERE runner = ?", (runner,)).fetchone()
+        finally:
+            connection.close()
+        if result is None: return None
+        return dict(zip(self.columns, result))
+
+    @property
+    def df(self):
+        """All the rows of the index."""
+        if not self.path.exists: return pandas.DataFrame(columns=self.columns)
+        connection = self.connect()
+        try:
+            query = self.select(connection)
+            if query is None: return pandas.DataFrame(columns=self.columns)
+            df = pandas.read_sql_query(query, connection)
+        finally:
+            connection.close()
+        return df
+
+    def rebuild(self, runners):
+        """
+        Fill the index from the manifests already on disk, for instance
+        after deleting the SQLite file.
+        """
+        for runner in runners:
+            content = runner.manifest.load()
+            if content: self.update(content)
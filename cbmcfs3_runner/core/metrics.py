@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+Every runner records how long each stage of its pipeline took along
+with the resources consumed. You can inspect them like this:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> runner = continent[('static_demand', 'LU', 0)]
+    >>> print(runner.metrics.df)
+
+Or aggregated across all countries of a scenario:
+
+    >>> scenario = continent.scenarios['static_demand']
+    >>> print(scenario.metrics_hotspots())
+"""
+
+# Built-in modules #
+import os, sys, time, functools, contextlib
+
+# Third party modules #
+import pandas
+import simplejson as json
+
+# First party modules #
+from autopaths.auto_paths import AutoPaths
+
+# Internal modules #
+from cbmcfs3_runner.core.cache_manager import property_managed
+
+# The module `resource` only exists on Unix #
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# The module `psutil` is optional #
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+###############################################################################
+def max_rss():
+    """
+    The high-water mark of the resident memory of the current process in
+    bytes, or None. It never goes down, and child processes are excluded.
+    """
+    if resource is not None:
+        # Linux reports kilobytes while macOS reports bytes #
+        value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return value if sys.platform == 'darwin' else value * 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)
+    return None
+
+def io_bytes():
+    """A tuple of bytes read and bytes written so far, or (None, None)."""
+    if psutil is None: return None, None
+    try:
+        counters = psutil.Process().io_counters()
+    except (AttributeError, psutil.Error):
+        return None, None
+    return counters.read_bytes, counters.write_bytes
+
+def cpu_time():
+    """User and system time of this process and of its finished children."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+###############################################################################
+class Metrics(object):
+    """
+    Records wall time, CPU time, memory and bytes read/written for
+    every stage of a runner. Stages can be nested, in which case the
+    name of the enclosing stage is recorded in the `parent` column.
+    CPU time includes the child processes that have exited such as SIT.
+    A stage that raised, for instance because it was killed, is recorded
+    too but with `succeeded` set to False.
+
+    For memory, `max_rss` is the high-water mark of the whole python
+    process at the end of the stage, and `rss_growth` is how much the
+    stage raised it, zero if the stage used less than an earlier one.
+    The memory of SIT and CBM, which are child processes, is not counted.
+    """
+
+    all_paths = """
+    /logs/metrics.json
+    """
+
+    def __init__(self, parent):
+        # Default attributes #
+        self.parent  = parent
+        self.records = []
+        self.stack   = []
+        # Directories #
+        self.paths = AutoPaths(self.parent.data_dir, self.all_paths)
+
+    def __repr__(self):
+        return '%s object with %i records' % (self.__class__, len(self.records))
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Use this as a context manager around the code to be measured."""
+        # Before #
+        parent = self.stack[-1] if self.stack else None
+        self.stack.append(name)
+        start_wall = time.time()
+        start_cpu  = cpu_time()
+        start_read, start_write = io_bytes()
+        start_rss  = max_rss()
+        succeeded  = False
+        # Run #
+        try:
+            yield
+            succeeded = True
+        finally:
+            # After #
+            self.stack.pop()
+            end_read, end_write = io_bytes()
+            end_rss = max_rss()
+            record = {'stage':       name,
+                      'parent':      parent,
+                      'start':       start_wall,
+                      'succeeded':   succeeded,
+                      'wall_time':   time.time() - start_wall,
+                      'cpu_time':    cpu_time()  - start_cpu,
+                      'max_rss':     end_rss,
+                      'rss_growth':  None if end_rss is None else end_rss - start_rss,
+                      'bytes_read':  None if end_read  is None else end_read  - start_read,
+                      'bytes_written': None if end_write is None else end_write - start_write}
+            self.records.append(record)
+
+    def reset(self):
+        """Forget everything recorded, typically at the start of a run."""
+        self.records = []
+        self.stack   = []
+
+    def save(self):
+        """Write all records to the JSON file in the logs directory."""
+        content = {'runner': self.parent.short_name, 'records': self.records}
+        self.paths.json.write(json.dumps(content, indent=4, ignore_nan=True))
+
+    @property
+    def df(self):
+        """The records of the last run, as saved on disk if nothing is in memory."""
+        if self.records:           records = self.records
+        elif self.paths.json.exists: records = json.loads(self.paths.json.contents)['records']
+        else:                      records = []
+        return pandas.DataFrame(records)
+
+###############################################################################
+def find_metrics(obj):
+    """Go up the `parent` chain until we find an object that has metrics."""
+    for i in range(8):
+        if obj is None: return None
+        if 'metrics' in dir(type(obj)): return obj.metrics
+        obj = getattr(obj, 'parent', None)
+    return None
+
+def property_measured(f):
+    """
+    Same as `property_managed` but the first evaluation, the expensive one,
+    is recorded as a stage in the metrics of the runner it belongs to.
+    """
+    @functools.wraps(f)
+    def measured(self):
+        metrics = find_metrics(self)
+        if metrics is None: return f(self)
+        with metrics.stage(self.__class__.__name__ + '.' + f.__name__):
+            return f(self)
+    return property_managed(measured)
+
+###############################################################################
+def hotspots(runners):
+    """
+    Aggregate the metrics of many runners into a table with one row per
+    stage, sorted by total wall time so the most expensive comes first.
+    """
+    # Load every runner that has metrics #
+    frames = []
+    for runner in runners:
+        df = runner.metrics.df
+        if df.empty: continue
+        df.insert(0, 'runner', runner.short_name)
+        frames.append(df)
+    if not frames: return pandas.DataFrame()
+    df = pandas.concat(frames, ignore_index=True)
+    # Only top level stages add up to the total run time #
+    total = df.loc[df['parent'].isna(), 'wall_time'].sum()
+    # Aggregate #
+    agg = {'wall_time':     ['count', 'sum', 'mean', 'max'],
+           'cpu_time':      ['sum', 'mean'],
+           'max_rss':       ['max'],
+           'rss_growth':    ['max'],
+           'bytes_read':    ['sum'],
+           'bytes_written': ['sum']}
+    # Files saved by older versions don't have every column #
+    agg = {k: v for k, v in agg.items() if k in df.columns}
+    df = df.groupby('stage').agg(agg)
+    df.columns = ['_'.join(col) for col in df.columns]
+    df = df.rename(columns={'wall_time_count': 'count'})
+    # Fraction of the total #
+    df['wall_time_frac'] = df['wall_time_sum'] / total if total else 0.0
+    # Return #
+    return df.sort_values('wall_time_sum', ascending=False).reset_index()
@@ -9,7 +9,7 @@ Unit D1 Bioeconomy.
 """
 
 # Built-in modules #
-import os
+import os, contextlib
 
 # First party modules #
 from autopaths            import Path
@@ -23,14 +23,22 @@ from plumbing.logger      import create_file_logger
 # Internal modules #
 import cbmcfs3_runner
 from cbmcfs3_runner.graphs import runner_graphs, load_graphs_from_module
+from cbmcfs3_runner.core.scratch                   import Scratch, scratch_root
+from cbmcfs3_runner.core.metrics                   import Metrics
+from cbmcfs3_runner.core.manifest                  import RunManifest, progress
+from cbmcfs3_runner.core.supervisor                import Supervisor
 from cbmcfs3_runner.pre_processor                  import PreProcessor
 from cbmcfs3_runner.pump.middle_process            import MiddleProcessor
 from cbmcfs3_runner.post_processor                 import PostProcessor
 from cbmcfs3_runner.pump.input_data                import InputData
 from cbmcfs3_runner.pump.pre_flight                import PreFlight
+from cbmcfs3_runner.pump.aidb                      import installation_lock
+from cbmcfs3_runner.pump.aidb                      import lock_path as aidb_lock_path
 from cbmcfs3_runner.reports.runner                 import RunnerReport
 from cbmcfs3_runner.stdrd_import_tool.launch_sit   import DefaultSIT, AppendSIT
 from cbmcfs3_runner.external_tools.launch_cbm      import LaunchCBM
+from cbmcfs3_runner.external_tools.launch_libcbm   import LaunchLibCBM
+from cbmcfs3_runner.disturbances.surrogate       import SurrogateProjector
 
 # Constants #
 home = os.environ.get('HOME', '~') + '/'
@@ -55,6 +63,7 @@ class Runner(object):
     """
 
     sit_calling = 'dual' or 'single'
+    simulator   = 'cbmcfs3' or 'libcbm'
 
     def __repr__(self):
         return '%s object on "%s"' % (self.__class__, self.data_dir)
@@ -73,6 +82,9 @@ class Runner(object):
         self.short_name += str(self.num)
         # Where the data will be stored for this run #
         self.data_dir = self.scenario.scenarios_dir + self.short_name + '/'
+        # Where SIT and CBM will do their work, possibly a fast local disk #
+        self.work_dir = self.data_dir
+        if scratch_root: self.work_dir = scratch_root + self.short_name + '/'
         # Automatically access paths based on a string of many subpaths #
         self.paths = AutoPaths(self.data_dir, self.all_paths)
 
@@ -103,37 +115,87 @@ class Runner(object):
         # Messages #
         self.log.info("Using module at '%s'." % Path(cbmcfs3_runner))
         self.log.info("Runner '%s' starting." % self.short_name)
-        # Record the hash of the other library "cbm3_python" e.g. 4dc12af #
-        cbm3py_repos = GitRepo(home + "repos/cbm3_python/")
-        self.log.info("Using cbm3_python at '%s'." % cbm3py_repos.hash)
         # Clean everything from previous run #
+        self.post_processor.close()
         self.remove_directory()
+        # Every stage is timed, the results go to a JSON file #
+        self.metrics.reset()
+        self.manifest.start()
+        try:
+            self.run_stages()
+        except Exception as error:
+            self.manifest.fail(error)
+            raise
+        else:
+            self.manifest.finish()
+        finally:
+            self.metrics.save()
+        # Messages #
+        self.log.info("Done.")
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Record in the manifest that we reached a stage, and measure it."""
+        self.manifest.reached(name)
+        with self.metrics.stage(name): yield
+
+    def run_stages(self):
+        """The steps of the pipeline, each one is measured."""
+        stage = self.stage
         # Modify input data before copying it #
-        self.pre_processor()
+        with stage('pre_processor'): self.pre_processor()
+        # Copy the inputs to the fast local disk #
+        if self.scratch.enabled:
+            with stage('stage_in'): self.scratch.stage_in()
         # Pre-flight check #
-        self.pre_flight()
-        # Just check we are on Windows #
-        if os.name == "posix":
-            raise Exception("Can't go any further (only on Windows).")
-        # Switch archive index #
-        self.country.aidb.switch()
-        # Standard import tool #
-        self.default_sit()
-        if self.sit_calling == 'dual': self.append_sit()
-        # Final steps #
-        self.middle_processor()
-        self.launch_cbm()
+        with stage('pre_flight'): self.pre_flight()
+        # The simulation itself, always bring back what was produced #
+        try:
+            if self.simulator == 'libcbm': self.run_libcbm()
+            else:                          self.supervisor.with_retries(self.run_cbmcfs3)
+        finally:
+            if self.scratch.enabled:
+                with stage('sync_back'): self.scratch.sync_back()
+                self.scratch.remove()
         # Save hash #
         db = self.post_processor.database
         self.log.info("Database '%s' md5 hash '%s'." % (db, db.md5))
+        self.manifest.add_hash('output_database', db.md5)
         # Post-processing #
-        self.post_processor()
+        with stage('post_processor'): self.post_processor()
         # Reporting #
         #self.log.info("Creating runner report.")
         #for graph in self.graphs: graph()
         #self.report()
-        # Messages #
-        self.log.info("Done.")
+
+    def run_cbmcfs3(self):
+        """Run SIT and CBM-CFS3 through the Windows executables."""
+        stage = self.stage
+        # Record the hash of the other library "cbm3_python" e.g. 4dc12af #
+        cbm3py_repos = GitRepo(home + "repos/cbm3_python/")
+        self.log.info("Using cbm3_python at '%s'." % cbm3py_repos.hash)
+        self.manifest.add_hash('cbm3_python', cbm3py_repos.hash)
+        # Just check we are on Windows #
+        if os.name == "posix":
+            raise Exception("Can't go any further (only on Windows).")
+        # SIT reads the archive index of the installation, CBM gets its own #
+        # No other runner may switch the installation's AIDB before SIT ends #
+        self.log.info("Waiting for the lock on '%s'." % aidb_lock_path)
+        with installation_lock():
+            with stage('aidb_switch'):
+                self.country.aidb.switch()
+                self.launch_cbm.install_aidb()
+            # Standard import tool #
+            with stage('default_sit'): self.default_sit()
+            if self.sit_calling == 'dual':
+                with stage('append_sit'): self.append_sit()
+        # Final steps #
+        with stage('middle_processor'): self.middle_processor()
+        with stage('launch_cbm'):       self.launch_cbm()
+
+    def run_libcbm(self):
+        """Run the same input CSVs through libcbm, works on any platform."""
+        with self.stage('launch_libcbm'): self.launch_libcbm()
 
     def remove_directory(self):
         """
@@ -145,11 +207,29 @@ class Runner(object):
         # The output directory #
         self.paths.input_dir.remove(safe=False)
         self.paths.output_dir.remove(safe=False)
+        # The copy on the fast local disk #
+        if self.scratch.enabled: self.scratch.remove()
         # Empty all the other logs #
         for element in self.paths.logs_dir.flat_contents:
             if element != self.paths.log:
                 element.remove()
 
+    @property_cached
+    def metrics(self):
+        return Metrics(self)
+
+    @property_cached
+    def manifest(self):
+        return RunManifest(self)
+
+    @property_cached
+    def supervisor(self):
+        return Supervisor(self)
+
+    @property_cached
+    def scratch(self):
+        return Scratch(self)
+
     @property_cached
     def input_data(self):
         return InputData(self)
@@ -175,10 +255,19 @@ class Runner(object):
     def launch_cbm(self):
         return LaunchCBM(self)
 
+    @property_cached
+    def launch_libcbm(self):
+        return LaunchLibCBM(self)
+
     @property_cached
     def post_processor(self):
         return PostProcessor(self)
 
+    @property_cached
+    def surrogate(self):
+        """A fast approximation of the simulation, see the module."""
+        return SurrogateProjector(self)
+
     @property
     def tail(self):
         """A short summary showing just the end of the log file."""
@@ -187,6 +276,19 @@ class Runner(object):
         msg += self.paths.log.pretty_tail
         return msg
 
+    @property
+    def status(self):
+        """
+        The row of this runner in the status index, a dictionary with the
+        last stage reached, the status and the error class if any.
+        Falls back on the manifest file for runs that are not indexed.
+        """
+        row = self.scenario.continent.status_index.get(self.short_name)
+        if row is not None: return row
+        content = self.manifest.load()
+        if content: content['map_value'] = progress(content['status'], content['stage'])
+        return content or None
+
     @property
     def map_value(self):
         """
@@ -194,10 +296,15 @@ class Runner(object):
         within the pipeline. This can be used to plot the country on a
         color scale map.
         """
+        # New runs have a status that doesn't require reading the log #
+        status = self.status
+        if status is not None: return status['map_value']
+        # Older runs only have a log #
         if not self.paths.log.exists: return 0.0
-        if   'run is completed' in self.paths.log.contents: return 1.0
-        elif 'SIT created'      in self.paths.log.contents: return 0.5
-        else:                                               return 0.0
+        contents = self.paths.log.contents
+        if   'run is completed' in contents: return 1.0
+        elif 'SIT created'      in contents: return 0.5
+        else:                                return 0.0
 
     @property_cached
     def graphs(self):
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+To make SIT and CBM-CFS3 do their heavy random I/O on a fast local disk
+instead of the data share, set an environment variable before starting:
+
+    $ export CBMCFS3_SCRATCH="/dev/shm/cbmcfs3_scratch/"
+
+Then each runner will copy its inputs there, run SIT and CBM there, and
+copy back only the final databases and logs to its normal `data_dir`.
+You can remove scratch directories left behind by crashed runs with:
+
+    >>> from cbmcfs3_runner.core.scratch import clean_orphans
+    >>> clean_orphans()
+"""
+
+# Built-in modules #
+import os, glob, shutil, socket
+
+# Third party modules #
+
+# First party modules #
+from autopaths            import Path
+from autopaths.dir_path   import DirectoryPath
+from autopaths.auto_paths import AutoPaths
+
+# Internal modules #
+
+# Where the fast local disk is, by default we don't use one #
+scratch_root = None
+
+# But you can set it with an environment variable #
+if os.environ.get("CBMCFS3_SCRATCH"):
+    scratch_root = DirectoryPath(os.environ['CBMCFS3_SCRATCH'])
+
+# Name of the file that marks a scratch directory as being in use #
+lock_name = 'scratch.lock'
+
+###############################################################################
+class Scratch(object):
+    """
+    Manages the copy of a runner's working files on a fast local disk.
+    Only the input CSVs are staged in. Only the SIT and CBM databases,
+    the XLS/JSON files given to SIT and the logs are synced back.
+    The CBM temporary files never leave the scratch directory.
+    """
+
+    all_paths = """
+    /input/csv/
+    /scratch.lock
+    """
+
+    # The directories that are copied back to the data share #
+    to_sync_back = ['input/xls/', 'input/sit_config/', 'output/sit/',
+                    'output/cbm/', 'logs/']
+
+    def __init__(self, parent):
+        # Default attributes #
+        self.parent = parent
+        # Directories #
+        self.directory = DirectoryPath(self.parent.work_dir)
+        self.paths     = AutoPaths(self.parent.work_dir, self.all_paths)
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.directory)
+
+    @property
+    def log(self): return self.parent.log
+
+    @property
+    def enabled(self):
+        """True only if the runner works somewhere else than its data_dir."""
+        return self.parent.work_dir != self.parent.data_dir
+
+    #-------------------------------------------------------------------------#
+    def stage_in(self):
+        """Copy the input CSVs to the scratch directory and lock it."""
+        # Message #
+        self.log.info("Staging inputs to scratch '%s'." % self.directory)
+        # Take the opportunity to clean up after crashed runs #
+        clean_orphans()
+        # Start from a clean state #
+        self.remove()
+        self.directory.create(safe=True)
+        # Mark as in use by this process #
+        self.paths.lock.write(socket.gethostname() + ' ' + str(os.getpid()))
+        # Copy #
+        source = self.parent.paths.csv_dir
+        shutil.copytree(str(source), str(self.paths.csv_dir))
+
+    def sync_back(self):
+        """Copy the final artifacts back to the runner's data_dir."""
+        # Message #
+        self.log.info("Syncing scratch results back to '%s'." % self.parent.data_dir)
+        # Copy every directory that exists #
+        for sub_dir in self.to_sync_back:
+            source = DirectoryPath(self.directory + sub_dir)
+            if not source.exists: continue
+            for f in source.flat_files:
+                dest = Path(self.parent.data_dir + sub_dir + f.filename)
+                # Don't overwrite the log that the runner is writing to #
+                if dest == self.parent.paths.log: continue
+                dest.directory.create(safe=True)
+                shutil.copy2(str(f), str(dest))
+
+    def remove(self):
+        """Delete the scratch directory entirely."""
+        if self.directory.exists: shutil.rmtree(str(self.directory))
+
+###############################################################################
+def pid_is_alive(pid):
+    """Check if a process with this PID exists on the current host."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+def clean_orphans(root=None):
+    """
+    Remove scratch directories whose lock was taken by a process on
+    this host that doesn't exist anymore. Directories locked by other
+    hosts sharing the same scratch root are left alone.
+    Returns the list of directories removed.
+    """
+    # Default #
+    if root is None: root = scratch_root
+    if root is None: return []
+    root = DirectoryPath(root)
+    if not root.exists: return []
+    # Find locks, layout is <scenario>/<iso2>/<num>/ #
+    hostname = socket.gethostname()
+    removed  = []
+    for lock in glob.glob(root + '*/*/*/' + lock_name):
+        host, pid = Path(lock).contents.split()
+        if host != hostname:     continue
+        if pid_is_alive(int(pid)): continue
+        directory = os.path.dirname(str(lock))
+        shutil.rmtree(directory, ignore_errors=True)
+        removed.append(directory)
+    # Return #
+    return removed
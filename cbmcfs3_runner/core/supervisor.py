@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+SIT and CBM-CFS3 are external executables that sometimes hang forever.
+The supervisor runs them in a child process that it can kill, with a
+time limit for each stage and a check that they are still writing to
+their log files. You can see the time limits of a runner like this:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> runner = continent[('static_demand', 'LU', 0)]
+    >>> print(runner.supervisor.timeouts)
+"""
+
+# Built-in modules #
+import os, time, queue, subprocess, multiprocessing
+
+# Third party modules #
+import numpy
+import simplejson as json
+
+# First party modules #
+from autopaths          import Path
+from autopaths.dir_path import DirectoryPath
+
+# Internal modules #
+
+# The module `psutil` is optional #
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+###############################################################################
+class SupervisedError(Exception):
+    """
+    An external stage that failed, with the reason it failed.
+    Only some reasons are worth trying again.
+    """
+
+    retryable = False
+
+    def __init__(self, stage, reason, message=''):
+        self.stage  = stage
+        self.reason = reason
+        super(SupervisedError, self).__init__("[%s] %s: %s" % (reason, stage, message))
+
+class StageTimeout(SupervisedError):
+    retryable = True
+
+class StageStalled(SupervisedError):
+    retryable = True
+
+class StageTransient(SupervisedError):
+    retryable = True
+
+# Messages found in the logs and what they mean #
+log_patterns = [
+    ('Illegal target type for RANDOM sort', 'invalid_disturbances', False),
+    ('Invalid disturbances found',          'invalid_disturbances', False),
+    ('being used by another process',       'file_locked',          True),
+    ('Could not use',                       'file_locked',          True),
+    ('OutOfMemory',                         'out_of_memory',        True),
+]
+
+# Failures that will happen again however many times we try, the inputs
+# rejected by the pre-flight checks included #
+permanent_reasons = {reason for pattern, reason, retryable in log_patterns if not retryable}
+permanent_reasons.add('pre_flight')
+
+###############################################################################
+def kill_tree(pid):
+    """Kill a process and every process it started, if we can find them."""
+    if psutil is not None:
+        try:
+            parent   = psutil.Process(pid)
+            children = parent.children(recursive=True)
+        except psutil.Error:
+            children = []
+        for child in children:
+            try:
+                child.kill()
+            except psutil.Error:
+                pass
+    try:
+        os.kill(pid, 9)
+    except OSError:
+        pass
+
+def last_activity(paths):
+    """The most recent modification time of the files and directories given."""
+    latest = 0.0
+    for path in paths:
+        path = str(path)
+        if not os.path.exists(path): continue
+        latest = max(latest, os.path.getmtime(path))
+        if not os.path.isdir(path): continue
+        for root, dirs, files in os.walk(path):
+            for name in files:
+                try:
+                    latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+                except OSError:
+                    pass
+    return latest
+
+def call_in_child(func, kwargs, queue):
+    """Entry point of the child process, sends back the result or the error."""
+    try:
+        queue.put(('ok', func(**kwargs)))
+    except Exception as error:
+        queue.put(('error', repr(error)))
+
+###############################################################################
+class Supervisor(object):
+    """
+    Every external stage gets a time limit, which is `timeout_factor`
+    times the `history_percentile` of the durations this stage took when
+    it succeeded in the same scenario, and never less than `min_timeout`
+    seconds. Stages that were killed or failed are not part of the history,
+    otherwise every hang would raise the next limit. Without any history
+    `default_timeout` is used. A stage whose log files and outputs have not changed for
+    `stall_timeout` seconds is considered hung.
+
+    When the whole CBM-CFS3 sequence fails for a reason that can be
+    retried, it is started again from fresh working directories, at most
+    `retries` times. Every attempt is recorded in the manifest.
+    """
+
+    # Time limits in seconds #
+    default_timeout = 6 * 3600
+    min_timeout     = 10 * 60
+    timeout_factor  = 3.0
+    stall_timeout   = 30 * 60
+
+    # Which duration of the successful runs the limit is based on #
+    history_percentile = 90
+
+    # How often we look at the child process #
+    poll_interval = 5
+
+    # How long we wait for the result of a child that has finished #
+    result_timeout = 60
+
+    # How many times we try again #
+    retries = 1
+
+    def __init__(self, parent):
+        # Default attributes #
+        self.parent = parent
+        self.runner = parent
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.runner.short_name)
+
+    @property
+    def log(self): return self.runner.log
+
+    #-------------------------------------------------------------------------#
+    @property
+    def history(self):
+        """
+        The typical wall time of each stage in previous successful runs of
+        this scenario. Records saved before `succeeded` existed are ignored.
+        """
+        walls = {}
+        for steps in self.runner.scenario.runners.values():
+            for runner in steps:
+                path = runner.metrics.paths.json
+                if not path.exists: continue
+                try:
+                    records = json.loads(path.contents)['records']
+                except (ValueError, KeyError):
+                    continue
+                for r in records:
+                    if r.get('succeeded') is not True: continue
+                    walls.setdefault(r['stage'], []).append(r['wall_time'])
+        return {stage: float(numpy.percentile(values, self.history_percentile))
+                for stage, values in walls.items()}
+
+    @property
+    def timeouts(self):
+        """The time limit of every stage that has a history."""
+        return {stage: max(self.min_timeout, self.timeout_factor * wall)
+                for stage, wall in self.history.items()}
+
+    def timeout_for(self, stage):
+        return self.timeouts.get(stage, self.default_timeout)
+
+    #-------------------------------------------------------------------------#
+    def watch(self, stage, is_alive, kill, watched):
+        """
+        Wait for a child to finish while checking the time it takes and
+        its activity on disk. Kills it and raises if something is wrong.
+        """
+        timeout = self.timeout_for(stage)
+        start   = time.time()
+        msg     = "Supervising '%s' with a timeout of %i seconds."
+        self.log.info(msg % (stage, timeout))
+        while is_alive():
+            time.sleep(self.poll_interval)
+            now = time.time()
+            if now - start > timeout:
+                kill()
+                raise StageTimeout(stage, 'timeout', "killed after %i seconds" % (now - start))
+            activity = max(last_activity(watched), start)
+            if now - activity > self.stall_timeout:
+                kill()
+                raise StageStalled(stage, 'stalled', "no activity for %i seconds" % (now - activity))
+
+    def classify(self, stage, message, logs):
+        """Turn a failure into the right exception by reading the logs."""
+        texts = [message] + [Path(p).contents for p in logs if os.path.exists(str(p))]
+        for pattern, reason, retryable in log_patterns:
+            if any(pattern in text for text in texts):
+                cls = StageTransient if retryable else SupervisedError
+                return cls(stage, reason, message)
+        return SupervisedError(stage, 'failed', message)
+
+    def run_process(self, stage, cmd, logs=(), watched=()):
+        """
+        Run an executable with its arguments under supervision. The error
+        stream goes to a file in the logs directory, a pipe that nobody
+        reads would block the child once it is full.
+        """
+        stderr_path = Path(self.runner.paths.logs_dir + stage + '_stderr.log')
+        with open(str(stderr_path), 'wb') as stderr:
+            process = subprocess.Popen([str(c) for c in cmd],
+                                       stdout = subprocess.DEVNULL,
+                                       stderr = stderr)
+            self.watch(stage,
+                       is_alive = lambda: process.poll() is None,
+                       kill     = lambda: kill_tree(process.pid),
+                       watched  = list(logs) + list(watched) + [stderr_path])
+        if process.returncode != 0:
+            message = "exit code %i. %s" % (process.returncode, stderr_path.contents[-500:])
+            raise self.classify(stage, message, logs)
+
+    def run_function(self, stage, func, kwargs, logs=(), watched=()):
+        """
+        Run a python function in a child process under supervision.
+        A child that dies without sending anything back, for instance
+        killed by the operating system, is a failure worth retrying.
+        """
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        process = context.Process(target=call_in_child, args=(func, kwargs, results))
+        process.start()
+        self.watch(stage,
+                   is_alive = lambda: process.is_alive() and results.empty(),
+                   kill     = lambda: kill_tree(process.pid),
+                   watched  = list(logs) + list(watched))
+        try:
+            status, value = results.get(timeout=self.result_timeout)
+        except queue.Empty:
+            process.join(self.result_timeout)
+            message = "the child ended with exit code %s and no result" % process.exitcode
+            raise StageTransient(stage, 'crashed', message)
+        process.join()
+        if status == 'error': raise self.classify(stage, value, logs)
+        return value
+
+    #-------------------------------------------------------------------------#
+    def with_retries(self, func):
+        """
+        Call `func` and start it again from fresh working directories
+        if it failed for a reason that can be retried.
+        """
+        attempts = self.runner.manifest.content.setdefault('attempts', [])
+        for attempt in range(self.retries + 1):
+            start = time.time()
+            try:
+                result = func()
+            except SupervisedError as error:
+                attempts.append({'attempt':  attempt,
+                                 'stage':    error.stage,
+                                 'reason':   error.reason,
+                                 'duration': time.time() - start})
+                self.runner.manifest.save()
+                if not error.retryable or attempt == self.retries: raise
+                self.log.warning("Attempt %i failed (%s), trying again." % (attempt, error))
+                self.fresh_start()
+            else:
+                return result
+
+    def fresh_start(self):
+        """Remove what SIT and CBM produced, and stage the inputs again."""
+        runner = self.runner
+        if runner.scratch.enabled:
+            runner.scratch.stage_in()
+            return
+        for sub_dir in ('output/sit/', 'output/cbm/', 'output/cbm_tmp_dir/'):
+            directory = DirectoryPath(runner.work_dir + sub_dir)
+            if directory.exists: directory.remove()
@@ -14,12 +14,19 @@ Create a runner and display the demand data frames
     runner.country.demand.gftm_irw
     runner.country.demand.gftm_fw
 
+The GFTM files are parsed once for all countries, to see the whole table:
+
+    from cbmcfs3_runner.disturbances.demand import gftm_demand
+    gftm_demand.df
 """
 
 # Built-in modules #
+import os
 
 # First party modules #
-from plumbing.cache import property_cached
+from autopaths          import Path
+from autopaths.dir_path import DirectoryPath
+from plumbing.cache     import property_cached
 
 # Third party modules #
 import pandas, math, numpy
@@ -32,16 +39,139 @@ historical_demand_path = module_dir + 'extra_data/hist_harvest_corrected.csv'
 gftm_irw_demand_path   = module_dir + 'extra_data/gftm_forest_model.csv'
 gftm_fw_demand_path    = module_dir + 'extra_data/gftm_fuel_wood_bau.csv'
 
+# Where the parsed GFTM demand is kept #
+cache_dir = DirectoryPath(os.environ.get("CBMCFS3_DATA", "~/repos/cbmcfs3_data/"))
+cache_dir = DirectoryPath(cache_dir + 'cache/')
+
 # Parse #
 historical_demand = pandas.read_csv(str(historical_demand_path))
-gftm_irw_demand   = pandas.read_csv(str(gftm_irw_demand_path), header=None)
-gftm_fw_demand    = pandas.read_csv(str(gftm_fw_demand_path))
 
-# Fix some country names #
-old_names = ['LUX', 'SW', 'SL']
-new_names = ['LU',  'SE', 'SI']
-fixed_names = gftm_fw_demand['country_iso2'].replace(old_names, new_names)
-gftm_fw_demand['country_iso2'] = fixed_names
+###############################################################################
+class GFTMDemand(object):
+    """
+    Parses the two GFTM files for all countries at once, into a single long
+    table with one row per country, product and year. The table does not
+    depend on the time steps of any country, and is saved to disk so that
+    the next session does not parse the CSVs at all. It is parsed again
+    when one of the CSVs is newer than the saved copy.
+
+    Columns are:
+
+        ['country', 'source', 'hwp', 'year_min', 'year', 'value_ub', 'value_ob']
+    """
+
+    # Volumes are given under bark, this value converts them to over bark #
+    bark_correction_factor = 0.88
+
+    # The only part of the wide IRW file that we use #
+    irw_variable = 'Annual  production (m3ub) - from GFTM'
+    irw_periods  = ['2016 to 2020', '2021 to 2025', '2026 to 2030']
+    irw_names    = {'C log': 'irw_c', 'C pulpwood': 'irw_c',
+                    'N log': 'irw_b', 'N pulpwood': 'irw_b'}
+
+    # Fix some country names in the FW file #
+    fw_countries = {'LUX': 'LU', 'SW': 'SE', 'SL': 'SI'}
+    fw_names     = {'coniferous': 'fw_c', 'broadleaved': 'fw_b'}
+
+    def __init__(self, cache_path=cache_dir + 'gftm_demand.parquet'):
+        self.cache_path = Path(cache_path)
+
+    def __repr__(self):
+        return '%s object at "%s"' % (self.__class__, self.cache_path)
+
+    #-------------------------------------------------------------------------#
+    @property
+    def year_expansion(self):
+        """
+        GFTM gives a yearly demand over 5 year intervals. This little
+        data frame repeats each interval for every year it contains.
+
+        Columns are: ['year_min', 'year']
+        """
+        year_min = numpy.repeat(numpy.arange(2016, 2030, 5), 5)
+        return pandas.DataFrame({'year_min': year_min,
+                                 'year':     numpy.arange(2016, 2031)})
+
+    def parse_irw(self):
+        """The IRW demand of every country, from the wide 'gftm_forest_model.csv'."""
+        raw = pandas.read_csv(str(gftm_irw_demand_path), header=None)
+        # The first three rows are the variable, the period and the product #
+        header  = raw[0:3].ffill(axis=1)
+        periods = header.loc[1].replace('2016to 2020', '2016 to 2020')
+        columns = header.columns[(header.loc[0] == self.irw_variable) &
+                                 periods.isin(self.irw_periods)]
+        # Take only those columns in all countries at once #
+        values = raw.loc[3:, columns].astype(str)
+        values = values.apply(lambda col: col.str.strip('%').str.replace("'", ''))
+        values = values.apply(pandas.to_numeric).fillna(0.0)
+        values.index   = raw.loc[3:, 0].values
+        values.columns = pandas.MultiIndex.from_arrays(
+            [periods[columns].str[:4].astype(int).values,
+             header.loc[2, columns].map(self.irw_names).values],
+            names = ['year_min', 'hwp'])
+        # Sum log and pulpwood and go to long format #
+        values = values.T.groupby(level=['year_min', 'hwp']).sum().T
+        df = values.stack(['year_min', 'hwp']).rename('value_ub').reset_index()
+        df = df.rename(columns={'level_0': 'country'})
+        df['source'] = 'irw'
+        return df
+
+    def parse_fw(self):
+        """The FW demand of every country, from 'gftm_fuel_wood_bau.csv'."""
+        raw = pandas.read_csv(str(gftm_fw_demand_path))
+        raw['country_iso2'] = raw['country_iso2'].replace(self.fw_countries)
+        df = raw.melt(id_vars='country_iso2', var_name='product_year', value_name='value_ub')
+        df[['hwp', 'year_min']] = df['product_year'].str.split('_', n=1, expand=True)
+        df['hwp']      = df['hwp'].replace(self.fw_names)
+        df['year_min'] = df['year_min'].astype(int) + 1
+        # Limit fw year to 2026 equal to the maximum of irw years #
+        df = df.query('year_min < 2030')
+        df = df.rename(columns={'country_iso2': 'country'})
+        df['source'] = 'fw'
+        return df
+
+    def parse(self):
+        """Both files in one long table, with one row per year."""
+        df = pandas.concat([self.parse_irw(), self.parse_fw()], ignore_index=True)
+        df['value_ob'] = df['value_ub'] / self.bark_correction_factor
+        df = df.merge(self.year_expansion, on='year_min', how='left')
+        columns = ['country', 'source', 'hwp', 'year_min', 'year', 'value_ub', 'value_ob']
+        df = df[columns].astype({'country': str, 'source': str, 'hwp': str,
+                                 'year_min': int, 'year': int,
+                                 'value_ub': float, 'value_ob': float})
+        return df.sort_values(['country', 'source', 'year_min', 'hwp', 'year'],
+                              ignore_index=True)
+
+    #-------------------------------------------------------------------------#
+    @property
+    def cache_is_fresh(self):
+        if not self.cache_path.exists: return False
+        sources = max(os.path.getmtime(str(p)) for p in (gftm_irw_demand_path,
+                                                         gftm_fw_demand_path))
+        return os.path.getmtime(str(self.cache_path)) >= sources
+
+    @property_cached
+    def df(self):
+        """The parsed table, from the copy on disk when possible."""
+        if self.cache_is_fresh: return pandas.read_parquet(str(self.cache_path))
+        df = self.parse()
+        self.cache_path.directory.create_if_not_exists()
+        tmp = str(self.cache_path) + '.%i.tmp' % os.getpid()
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, str(self.cache_path))
+        return df
+
+    @property_cached
+    def by_country(self):
+        """One data frame per country and source, to be sliced instantly."""
+        return {key: df for key, df in self.df.groupby(['country', 'source'], sort=False)}
+
+    def get(self, iso2_code, source):
+        """The rows of one country, `source` is either 'irw' or 'fw'."""
+        return self.by_country.get((iso2_code, source), self.df.iloc[0:0])
+
+# A single instance shared by all #
+gftm_demand = GFTMDemand()
 
 ###############################################################################
 class Demand(object):
@@ -66,163 +196,44 @@ class Demand(object):
     unknown reason.
     """
 
-    # This value ... #
-    bark_correction_factor = 0.88
-
     def __init__(self, parent):
         # Default attributes #
         self.parent = parent
 
-    @property_cached
-    def year_expansion(self):
-        """
-        Create a little data frame to expand years
-        from a 5 year time frame to a yearly time frame.
-
-        GFTM gives a yearly demand over a 5 year interval in
-        cubic meters under bark.
-
-        We will use this data frame to duplicate the yearly demand
-        volume 5 times. This will then be used to generate disturbances.
+    columns_of_interest = ['year', 'step', 'hwp', 'value_ub', 'value_ob']
 
-        Columns are: ['year_min', 'year']
-        """
-        year_min = numpy.concatenate([numpy.repeat(x,5) for x in range(2016, 2030, 5)])
-        df = pandas.DataFrame({'year_min': year_min,
-                               'year':     range(2016, 2031, 1)})
-        df['year'] = df['year'].astype(int)
-        # Convert year to time step #
+    def gftm_slice(self, source):
+        """The rows of this country in the continent wide GFTM table."""
+        df = gftm_demand.get(self.parent.iso2_code, source).copy()
         df['step'] = self.parent.year_to_timestep(df['year'])
-        return df
-
-    @property
-    def gftm_header(self):
-       return gftm_irw_demand[0:3]
-
-    @property
-    def gftm_content(self):
-        return gftm_irw_demand[3:]
-
-    @property_cached
-    def gftm_row(self):
-        """Get the row corresponding to the current country."""
-        selector = self.gftm_content[0] == self.parent.iso2_code
-        return self.gftm_content.loc[selector].copy()
-
-    columns_of_interest = ['year', 'step', 'hwp', 'value_ub', 'value_ob']
+        return df[self.columns_of_interest].reset_index(drop=True)
 
     @property_cached
     def gftm_irw(self):
         """
-        Future IRW demand as predicted by GFTM.
-        Load and reshape the data frame in long format.
-
-        Now we have a yearly demand over a 5 year interval in
-        cubic meters over bark (column `value_ob`).
-
-        Columns are:
+        Future IRW demand as predicted by GFTM, log and pulpwood summed
+        by HWP. A yearly demand over 5 year intervals, in cubic meters
+        under bark (column `value_ub`) and over bark (column `value_ob`).
 
-            ['year_min', 'year_text', 'hwp', 'value_ob', 'year_max', 'year', 'step']
+        Columns are: ['year', 'step', 'hwp', 'value_ub', 'value_ob']
         """
-        # Fill values #
-        header = self.gftm_header.fillna(method='ffill', axis=1)
-        # Get the headers #
-        df = pandas.concat([header, self.gftm_row])
-        # Transpose #
-        df = df.transpose()
-        # Drop country code and country name #
-        df = df.drop([0,1])
-        # New index #
-        df = df.set_index([0,1,2])
-        # New column name #
-        df = df.rename(columns={df.columns[0]: 'value'})
-        # Drop special characters #
-        df['value'] = df['value'].str.strip('%')
-        df['value'] = df['value'].str.replace("'", '')
-        # Switch to number #
-        df['value'] = pandas.to_numeric(df['value'])
-        df['value'] = df['value'].fillna(0.0)
-        df = (df.reset_index()
-              .rename(columns = {0: 'variable',
-                                 1: 'year',
-                                 2: 'product'}))
-        # Correct an inconsistency in the year range #
-        df['year'] = df['year'].replace('2016to 2020', '2016 to 2020')
-        # Filter for years with data and select the variable of interest #
-        years_to_keep = ['2016 to 2020', '2021 to 2025', '2026 to 2030']
-        variable      = 'Annual  production (m3ub) - from GFTM'
-        df = df.query("variable==@variable & year in @years_to_keep").copy()
-        # Convert under bark demand volumes to over bark using a correction factor #
-        df['value_ub'] = df['value']
-        df['value_ob'] = df['value'] / self.bark_correction_factor
-        df = df.drop(columns=['value'])
-        # Sum log and pulpwood #
-        # Create a little data frame to rename products to HWP #
-        gftm_irw_names = pandas.DataFrame({'product': ['C log', 'C pulpwood',
-                                                       'N log', 'N pulpwood'],
-                                           'hwp':     ['irw_c', 'irw_c',
-                                                       'irw_b', 'irw_b']})
-        df = (df
-              # Rename products to HWP #
-              .set_index('product')
-              .join(gftm_irw_names.set_index('product'))
-              # Aggregate the log and pulpwood values by HWP #
-              .groupby(['year', 'hwp'])
-              .agg({'value_ob': sum,
-                    'value_ub': sum})
-              .reset_index())
-        df['year_min'] = df['year'].str[:4].astype(int)
-        df['year_max'] = df['year'].str[-4:].astype(int)
-        # Rename year column, because a new year column will be created later
-        # when expanding the years
-        df = df.rename(columns={'year': 'year_text'})
-        # Repeat lines for each successive year within a range by
-        # joining the year_expansion data frame
-        df = df.left_join(self.year_expansion, 'year_min')
-        # Return #
-        return df[self.columns_of_interest]
+        return self.gftm_slice('irw')
 
     @property_cached
     def gftm_fw(self):
         """
         Future FW demand as predicted by GFTM. Using the historical
         proportion of fuel wood with respect to industrial round wood.
-        Load and reshape the data frame in long format.
-
-        Columns are:
 
-            ['year_min', 'country_iso2', 'product_year', 'value', 'hwp', 'value_ob',
-             'year', 'step'],
+        Columns are: ['year', 'step', 'hwp', 'value_ub', 'value_ob']
         """
-        # Get the row corresponding to the current country #
-        selector = gftm_fw_demand['country_iso2'] == self.parent.iso2_code
+        df = self.gftm_slice('fw')
         # Check there is something to find for this country #
-        if not any(selector):
+        if df.empty:
             msg = f'No fuel wood data for {self.parent.iso2_code} ' \
                   f'in "{gftm_fw_demand_path}".'
             raise pandas.errors.EmptyDataError(msg)
-        # Copy only the current country #
-        fw_wide = gftm_fw_demand.loc[selector].copy()
-        # Reshape to long format #
-        df = fw_wide.melt(id_vars='country_iso2', var_name='product_year',
-                          value_name='value')
-        # Separate the hwp and year_min columns  #
-        df[['hwp', 'year_min']] = df['product_year'].str.split('_', n=1, expand=True)
-        # Rename #
-        df['hwp'] = df['hwp'].replace(['coniferous', 'broadleaved'],
-                                      ['fw_c', 'fw_b'])
-        df['year_min'] = df['year_min'].astype(int) + 1
-        # Limit fw year to 2026 equal to the maximum of irw years #
-        df = df.query('year_min<2030').copy()
-        # Convert demand value to over bark #
-        df['value_ub'] = df['value']
-        df['value_ob'] = df['value'] / self.bark_correction_factor
-        df = df.drop(columns=['value'])
-        # Repeat lines for each successive year within a range by
-        # joining the year_expansion data frame
-        df = df.left_join(self.year_expansion, 'year_min')
-        # Return #
-        return df[self.columns_of_interest]
+        return df
 
     def gftm(self, columns_of_interest = ('hwp', 'value_ob', 'year', 'step')):
         """
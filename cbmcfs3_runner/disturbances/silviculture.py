@@ -18,6 +18,7 @@ from autopaths.auto_paths import AutoPaths
 from plumbing.cache import property_cached
 
 # Internal modules #
+from cbmcfs3_runner.pump.schemas import schemas
 
 ###############################################################################
 class Silviculture(object):
@@ -73,15 +74,11 @@ class Silviculture(object):
         The column `perc_merch_biom_rem` is redundant with `dist_id`
         and simply shows the percent of thinning.
         """
-        # Read CSV #
-        df = pandas.read_csv(str(self.paths.treatments))
+        # Read CSV, the column `dist_type_name` and the classifiers are
+        # always strings to prevent issues when merging and filtering #
+        df = schemas['treatments'].read(self.paths.treatments)
         # Rename the classifier columns to full names #
         df = df.rename(columns = self.parent.classifiers.mapping)
-        # The column `dist_type_name` can be loaded as either an int or a str,
-        # so convert to string to prevent issues when merging and filtering
-        df['dist_type_name']      = df['dist_type_name'].astype(str)
-        df['management_strategy'] = df['management_strategy'].astype(str)
-        df['management_type']     = df['management_type'].astype(str)
         # If 'CC' is present in inventory (and there are no 'For'), then do nothing
         # If 'For' is present in the inventory (and there are no 'CC'), then
         # replace 'CC' by 'For' in the silviculture treatments.
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+A very simplified projection of the forest of a country that runs in
+a fraction of a second, to screen demand scenarios before running CBM.
+Use it like this:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> runner = continent[('static_demand', 'LU', 0)]
+    >>> print(runner.surrogate.df)
+    >>> print(runner.surrogate.screen([0.8, 1.0, 1.2, 1.5]))
+"""
+
+# Built-in modules #
+
+# Third party modules #
+import numpy, pandas
+
+# First party modules #
+from plumbing.cache import property_cached
+
+# Internal modules #
+
+###############################################################################
+class SurrogateProjector(object):
+    """
+    Ages the inventory area year by year through the yield curves and
+    removes the harvest of the disturbance events that the pre-processor
+    would give to SIT. The state is one array of area by stand and by age
+    in years, where a stand is a combination of classifiers.
+
+    This is not CBM. The approximations are:
+
+    * Merchantable volume is read from the current yield curves,
+      linearly interpolated between age classes of ten years.
+    * Events of measurement type 'M' take their amount of carbon from all
+      eligible stands and ages in proportion of their stock, ignoring
+      the sort type, the efficiency and the time since last disturbance.
+    * Events of type 'A' and 'P' remove the fraction `perc_merch_biom_rem`
+      of the silviculture treatments (or everything if unknown).
+    * Harvested area, or its equivalent for partial cuts, goes back to age
+      zero immediately. There is no regeneration delay.
+    """
+
+    # Oldest age tracked, older stands stay in the last bin #
+    max_age = 300
+
+    # Age class width of the yield curves in years #
+    age_class_width = 10
+
+    def __init__(self, parent):
+        # Default attributes #
+        self.parent  = parent
+        self.country = parent.country
+        self.names   = self.country.classifiers.names
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.parent.short_name)
+
+    #-------------------------------------------------------------------------#
+    @property_cached
+    def stands(self):
+        """
+        One row per combination of classifiers found in the inventory,
+        with the area by age in years as a 2D array.
+        """
+        df = self.country.orig_data.inventory.copy()
+        # Same proxy for the actual age as in the silviculture #
+        df['age_proxy'] = numpy.where(df['using_id'],
+                                      df['age_class'] * self.age_class_width - 5,
+                                      df['age'])
+        df['age_proxy'] = df['age_proxy'].astype(float).clip(0, self.max_age).astype(int)
+        # Number the stands #
+        keys = df[self.names].astype(str)
+        df['stand'] = keys.groupby(self.names, sort=False).ngroup()
+        stands = keys.drop_duplicates().reset_index(drop=True)
+        # Fill the area array #
+        area = numpy.zeros((len(stands), self.max_age + 1))
+        numpy.add.at(area, (df['stand'].values, df['age_proxy'].values), df['area'].values)
+        # Return #
+        return stands, area
+
+    def match(self, key):
+        """
+        Indices of the stands that are matched by a tuple of classifier
+        values in which '?' means any value.
+        """
+        stands, area = self.stands
+        selector = numpy.ones(len(stands), dtype=bool)
+        for name, value in zip(self.names, key):
+            if value == '?': continue
+            selector &= (stands[name].values == value)
+        return numpy.flatnonzero(selector)
+
+    @property_cached
+    def volume(self):
+        """
+        Merchantable volume in m^3 per hectare by stand and by age.
+        Stands without a yield curve get zero.
+        The first curve that matches a stand is used, like the order of the file.
+        """
+        stands, area = self.stands
+        yields = self.country.orig_data.yields_long
+        volume = numpy.zeros(area.shape)
+        found  = numpy.zeros(len(stands), dtype=bool)
+        ages   = numpy.arange(self.max_age + 1)
+        # One curve per combination of classifiers #
+        for key, curve in yields.groupby(self.names, sort=False, observed=True):
+            idx = self.match(tuple(str(k) for k in key))
+            idx = idx[~found[idx]]
+            if len(idx) == 0: continue
+            curve = curve.drop_duplicates('age_class').sort_values('age_class')
+            x = curve['age_class'].values * self.age_class_width
+            volume[idx] = numpy.interp(ages, x, curve['volume'].values)
+            found[idx] = True
+        # Return #
+        return volume
+
+    @property_cached
+    def carbon_per_m3(self):
+        """Tons of carbon in one cubic meter of wood, by stand."""
+        stands, area = self.stands
+        coefs   = self.country.coefficients.set_index('forest_type')['density']
+        density = stands['forest_type'].map(coefs).fillna(coefs.mean())
+        return density.values / 2
+
+    @property_cached
+    def removal_fraction(self):
+        """The fraction of merchantable biomass removed by disturbance type."""
+        treatments = self.country.silviculture.treatments
+        return treatments.groupby('dist_type_name')['perc_merch_biom_rem'].max().to_dict()
+
+    @property_cached
+    def events(self):
+        """
+        The disturbance events as the pre-processor would write them,
+        with the eligible ages in years in 'age_min' and 'age_max'.
+        When 'using_id' is true, 'sw_start' and 'sw_end' are age classes,
+        class `c` being the ages from `(c-1) * width + 1` to `c * width`.
+        A negative or missing bound means no limit.
+        """
+        df = self.parent.pre_processor.disturbance_events().copy()
+        df['dist_type_name'] = df['dist_type_name'].astype(str)
+        for name in self.names: df[name] = df[name].astype(str)
+        # Convert the age classes to years #
+        width    = self.age_class_width
+        by_class = df['using_id'].astype(str).str.lower().isin(['true', '1', '1.0'])
+        lo = pandas.to_numeric(df['sw_start'], errors='coerce')
+        hi = pandas.to_numeric(df['sw_end'],   errors='coerce')
+        lo = lo.mask(by_class & (lo >= 0), (lo - 1) * width + 1)
+        hi = hi.mask(by_class & (hi >= 0), hi * width)
+        df['age_min'] = lo.where(lo >= 0, 0).clip(upper=self.max_age).astype(int)
+        df['age_max'] = hi.where(hi >= 0, self.max_age).clip(upper=self.max_age).astype(int)
+        return df
+
+    @property
+    def first_demand_step(self):
+        """Events after the base year come from the demand of the economic model."""
+        return int(self.country.year_to_timestep(self.country.base_year)) + 1
+
+    #-------------------------------------------------------------------------#
+    def project(self, demand_ratio=1.0):
+        """
+        Run the projection, multiplying the amount of the events that come
+        after the base year by `demand_ratio`. Returns one row per time step.
+        """
+        # Initial state #
+        stands, area = self.stands
+        area   = area.copy()
+        volume = self.volume
+        carbon = volume * self.carbon_per_m3[:, None]
+        events = self.events
+        # The matching is the same every year #
+        cache  = {}
+        rows   = []
+        last   = max(int(events['step'].max()), self.first_demand_step)
+        by_step = dict(tuple(events.groupby('step')))
+        for step in range(1, last + 1):
+            demand = harvest = harvest_m3 = 0.0
+            if step not in by_step: by_step[step] = events.iloc[0:0]
+            for event in by_step[step].itertuples(index=False):
+                # Which stands and ages are eligible #
+                key = tuple(getattr(event, name) for name in self.names)
+                if key not in cache: cache[key] = self.match(key)
+                idx    = cache[key]
+                cells  = numpy.ix_(idx, numpy.arange(event.age_min, event.age_max + 1))
+                amount = event.amount
+                if step >= self.first_demand_step: amount *= demand_ratio
+                # How much of the eligible area is cut #
+                perc = self.removal_fraction.get(event.dist_type_name, 1.0)
+                if event.measurement_type == 'M':
+                    available = (area[cells] * carbon[cells]).sum()
+                    if step >= self.first_demand_step: demand += amount
+                    if available <= 0: continue
+                    frac = min(amount / available, 1.0)
+                    perc = 1.0
+                elif event.measurement_type == 'A':
+                    eligible = area[cells].sum()
+                    if eligible <= 0: continue
+                    frac = min(amount / eligible, 1.0)
+                else:
+                    frac = min(amount, 1.0)
+                # Remove and send back to age zero #
+                cut = area[cells] * frac * perc
+                area[cells] -= cut
+                area[idx, 0] += cut.sum(axis=1)
+                taken = (cut * carbon[cells]).sum()
+                if event.measurement_type == 'M' and step >= self.first_demand_step: harvest += taken
+                harvest_m3 += (cut * volume[cells]).sum()
+            # Record the state after disturbances #
+            rows.append({'step':       step,
+                         'area':       area.sum(),
+                         'stock_m3':   (area * volume).sum(),
+                         'stock_tc':   (area * carbon).sum(),
+                         'demand_tc':  demand,
+                         'harvest_tc': harvest,
+                         'harvest_m3': harvest_m3})
+            # Grow one year older #
+            aged = numpy.zeros(area.shape)
+            aged[:, 1:]  = area[:, :-1]
+            aged[:, -1] += area[:, -1]
+            area = aged
+        # Summary #
+        df = pandas.DataFrame(rows)
+        df.insert(1, 'year', self.country.timestep_to_year(df['step']))
+        df['shortfall_tc'] = df['demand_tc'] - df['harvest_tc']
+        df['feasibility']  = (df['harvest_tc'] / df['demand_tc']).where(df['demand_tc'] > 0)
+        return df
+
+    @property_cached
+    def df(self):
+        """The projection with the demand of this runner as is."""
+        return self.project()
+
+    def screen(self, ratios):
+        """
+        Run the projection for several multipliers of the demand and
+        summarize each one in a row. The demand is feasible when the
+        lowest yearly feasibility stays close to one.
+        """
+        rows = []
+        for ratio in ratios:
+            df     = self.project(ratio)
+            future = df.query("step >= %i" % self.first_demand_step)
+            rows.append({'country':         self.country.iso2_code,
+                         'demand_ratio':    ratio,
+                         'min_feasibility': future['feasibility'].min(),
+                         'shortfall_tc':    future['shortfall_tc'].sum(),
+                         'final_stock_m3':  df['stock_m3'].iloc[-1],
+                         'feasible':        bool(future['feasibility'].min() > 0.99)})
+        return pandas.DataFrame(rows)
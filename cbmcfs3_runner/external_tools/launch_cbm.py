@@ -23,7 +23,6 @@ from plumbing.databases.access_database import AccessDatabase
 
 # Constants #
 toolbox_install_dir = Path("/Program Files (x86)/Operational-Scale CBM-CFS3/")
-aidb_path           = toolbox_install_dir + "admin/dbs/ArchiveIndex_Beta_Install.mdb"
 cbm_exes_path       = toolbox_install_dir + "admin/executables/"
 
 ###############################################################################
@@ -41,6 +40,7 @@ class LaunchCBM(object):
 
     all_paths = """
     /output/sit/project.mdb
+    /output/aidb/aidb.mdb
     /output/
     /output/cbm_tmp_dir/
     /output/cbm/project.mdb
@@ -51,7 +51,7 @@ class LaunchCBM(object):
         # Default attributes #
         self.parent = parent
         # Directories #
-        self.paths = AutoPaths(self.parent.data_dir, self.all_paths)
+        self.paths = AutoPaths(self.parent.work_dir, self.all_paths)
 
     @property
     def log(self): return self.parent.log
@@ -59,6 +59,18 @@ class LaunchCBM(object):
     def __call__(self):
         self.run_simulator()
 
+    def install_aidb(self):
+        """
+        Every runner gives CBM its own copy of the AIDB of its country,
+        since CBM writes to it. This way several runners can simulate at
+        the same time, instead of all sharing the AIDB of the installation.
+        The copy is skipped when the same AIDB is already there.
+        """
+        copied = self.parent.country.aidb.install(self.paths.aidb)
+        if copied: self.log.info("Copied the AIDB to '%s'." % self.paths.aidb)
+        else:      self.log.info("The AIDB at '%s' is already up to date." % self.paths.aidb)
+        self.parent.manifest.add_hash('aidb', self.parent.country.aidb.digest)
+
     def run_simulator(self):
         """Launch CBM and all its executables."""
         # Messages #
@@ -66,7 +78,7 @@ class LaunchCBM(object):
         self.log.debug("Database path '%s'." % self.paths.sit_mdb)
         # Arguments #
         kwargs = {
-            'aidb_path'                : str(aidb_path),
+            'aidb_path'                : str(self.paths.aidb),
             'project_path'             : str(self.paths.sit_mdb),
             'toolbox_installation_dir' : str(toolbox_install_dir),
             'cbm_exe_path'             : str(cbm_exes_path),
@@ -77,8 +89,13 @@ class LaunchCBM(object):
         }
         # Import #
         from cbm3_python.simulation import projectsimulator
-        # Use their module #
-        self.results_path = projectsimulator.run(**kwargs)
+        # Use their module in a child process that can be killed if it hangs #
+        watched = [self.paths.output_dir + "cbm_tmp_dir", self.paths.cbm_mdb.directory]
+        self.results_path = self.parent.supervisor.run_function('launch_cbm',
+                                                                projectsimulator.run,
+                                                                kwargs,
+                                                                logs    = [self.paths.log],
+                                                                watched = watched)
         # Success message #
         self.log.info("The CBM-CFS3 model run is completed.")
 
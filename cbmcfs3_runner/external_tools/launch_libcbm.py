@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+This is an alternative to `launch_cbm.py` that runs on Linux. You can
+switch a runner to it like this:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> runner = continent[('static_demand', 'LU', 0)]
+    >>> runner.simulator = 'libcbm'
+    >>> runner.run(verbose=True)
+"""
+
+# Built-in modules #
+import os
+
+# Third party modules #
+import numpy, pandas
+import simplejson as json
+
+# First party modules #
+from autopaths            import Path
+from autopaths.auto_paths import AutoPaths
+from autopaths.dir_path   import DirectoryPath
+from plumbing.cache       import property_cached
+from plumbing.common      import camel_to_snake
+
+# Internal modules #
+from cbmcfs3_runner.pump import libcbm_mapping
+
+# Where are the AIDBs in SQLite format, default case #
+libcbm_aidb_repo = DirectoryPath("~/repos/libcbm_aidb/")
+
+# But you can override that with an environment variable #
+if os.environ.get("CBMCFS3_AIDB"):
+    libcbm_aidb_repo = DirectoryPath(os.environ['CBMCFS3_AIDB'])
+
+###############################################################################
+class LaunchLibCBM(object):
+    """
+    This class will run the same prepared input CSV files that are given to
+    SIT, but through the `libcbm` python package instead of the Windows-only
+    CBM-CFS3 executables.
+
+    The results are converted to tables that have the same names and columns
+    as the ones found in the Microsoft Access database produced by CBM-CFS3.
+    They are stored as parquet files so that the `PostProcessor` can read
+    them through a `LibCBMDatabase` object instead of an `AccessDatabase`.
+
+    Note: with libcbm there is no "append" mode, so the spin-up uses
+    the same yield table as the simulation (`default_sit.yield_table_name`).
+    """
+
+    all_paths = """
+    /input/csv/
+    /input/libcbm/config.json
+    /output/libcbm/
+    /logs/libcbm_run.log
+    """
+
+    def __init__(self, parent):
+        # Default attributes #
+        self.parent = parent
+        # Directories #
+        self.paths = AutoPaths(self.parent.data_dir, self.all_paths)
+
+    @property
+    def log(self): return self.parent.log
+
+    def __call__(self):
+        self.create_config()
+        self.run_simulator()
+        self.write_tables()
+
+    #-------------------------------------------------------------------------#
+    @property
+    def aidb_path(self):
+        """The AIDB of the current country in the SQLite format."""
+        iso2_code = self.parent.country.iso2_code
+        # Special case for ZZ #
+        if iso2_code == 'ZZ': iso2_code = 'LU'
+        # Return #
+        return libcbm_aidb_repo + iso2_code + '/orig/aidb.db'
+
+    @property
+    def config(self):
+        """
+        The configuration that libcbm's SIT reader expects. The mapping
+        section is the same as the one we generate for the SIT plugin.
+        """
+        # The CSV files #
+        csv_dir   = self.paths.csv_dir
+        yields    = self.parent.default_sit.yield_table_name
+        as_csv    = lambda name: {'type': 'csv', 'params': {'path': str(csv_dir + name)}}
+        # The mapping is common with the Windows tool #
+        mapping = self.parent.default_sit.create_json.content['mapping_config']
+        # Return #
+        return {'import_config': {'ageclass':          as_csv('ageclass.csv'),
+                                  'classifiers':       as_csv('classifiers.csv'),
+                                  'disturbance_types': as_csv('disturbance_types.csv'),
+                                  'events':            as_csv('disturbance_events.csv'),
+                                  'inventory':         as_csv('inventory.csv'),
+                                  'transitions':       as_csv('transition_rules.csv'),
+                                  'yield':             as_csv(yields)},
+                'mapping_config': mapping}
+
+    def create_config(self):
+        """Write the JSON configuration file for libcbm."""
+        self.paths.config.write(json.dumps(self.config, indent=4, ignore_nan=True))
+
+    @property
+    def num_steps(self):
+        """
+        The number of time steps to simulate. Same as what SIT sets in the
+        'RunLength' of the project database, plus the optional extension
+        used by the `growth_only` scenario for instance.
+        """
+        events = pandas.read_csv(str(self.paths.csv_dir + 'disturbance_events.csv'))
+        result = int(events['step'].max())
+        extend = self.parent.middle_processor.num_steps_to_extend
+        if extend: result += extend
+        return result
+
+    @property_cached
+    def age_class_edges(self):
+        """
+        The oldest age of every age class, from the 'ageclass.csv' given to
+        SIT whose second column is the size of each class in years. Like in
+        CBM-CFS3, the first class has a size of zero and holds only age zero,
+        and the last class also holds all the older stands.
+        """
+        df    = pandas.read_csv(str(self.paths.csv_dir + 'ageclass.csv'))
+        sizes = df.iloc[:, 1].astype(float).values
+        return numpy.cumsum(sizes)
+
+    def age_class_of(self, ages):
+        """The `age_class_id` of each age, numbered from zero."""
+        edges  = self.age_class_edges
+        result = numpy.searchsorted(edges, numpy.asarray(ages, dtype=float), side='left')
+        return numpy.minimum(result, len(edges) - 1)
+
+    #-------------------------------------------------------------------------#
+    def run_simulator(self):
+        """Launch libcbm in the current process."""
+        # Messages #
+        self.log.info("Launching the libcbm model.")
+        self.log.debug("AIDB path '%s'." % self.aidb_path)
+        # Import #
+        from libcbm.input.sit import sit_cbm_factory
+        from libcbm.model.cbm import cbm_simulator
+        # Load the inputs #
+        self.sit = sit_cbm_factory.load_sit(str(self.paths.config), str(self.aidb_path))
+        classifiers, self.inventory = sit_cbm_factory.initialize_inventory(self.sit)
+        # Same seed as the one given to CBM-CFS3 so that reruns are comparable #
+        seed   = self.parent.middle_processor.random_seed
+        random = numpy.random.RandomState(seed).rand
+        # Run #
+        with sit_cbm_factory.initialize_cbm(self.sit) as cbm:
+            self.results, reporting_func = cbm_simulator.create_in_memory_reporting_func()
+            processor = sit_cbm_factory.create_sit_rule_based_processor(self.sit, cbm,
+                                                                        random_func=random)
+            cbm_simulator.simulate(cbm,
+                                   n_steps              = self.num_steps,
+                                   classifiers          = classifiers,
+                                   inventory            = self.inventory,
+                                   pool_codes           = self.sit.defaults.get_pools(),
+                                   flux_indicator_codes = self.sit.defaults.get_flux_indicators(),
+                                   pre_dynamics_func    = processor.pre_dynamics_func,
+                                   reporting_func       = reporting_func)
+        # Success message #
+        self.log.info("The libcbm model run is completed.")
+
+    #-------------------------------------------------------------------------#
+    @property_cached
+    def stands(self):
+        """
+        One row per stand and time step with the classifier values as names,
+        the area, the age and the disturbance applied.
+        The `user_defd_class_set_id` is one number per unique combination
+        of classifiers, like in the CBM-CFS3 output.
+        """
+        # Classifier values are given as ids #
+        df = self.results.classifiers.copy()
+        names = self.parent.country.classifiers.names
+        ids   = [c for c in df.columns if c not in ('identifier', 'timestep')]
+        for col in ids: df[col] = df[col].map(self.sit.classifier_value_names[col])
+        df = df.rename(columns=dict(zip(ids, names)))
+        # Number each unique combination of classifiers #
+        df['user_defd_class_set_id'] = df.groupby(names, sort=True).ngroup() + 1
+        # Add state variables #
+        state = self.results.state[['identifier', 'timestep', 'age', 'land_class']]
+        df = df.merge(state, on=['identifier', 'timestep'])
+        area = self.results.area[['identifier', 'timestep', 'area']]
+        df = df.merge(area, on=['identifier', 'timestep'])
+        # Add the disturbance applied, mapped back to the user's names #
+        params = self.results.parameters[['identifier', 'timestep', 'disturbance_type']]
+        df = df.merge(params, on=['identifier', 'timestep'])
+        sit_to_default = self.sit.disturbance_id_map
+        default_to_sit = {v: k for k, v in sit_to_default.items()}
+        df['dist_type_name'] = df['disturbance_type'].map(default_to_sit).astype(str)
+        # Spatial units, the inventory rows are numbered from one #
+        spu = self.inventory['spatial_unit'].values
+        df['spuid'] = spu[df['identifier'].values - 1]
+        # Return #
+        return df.rename(columns={'timestep': 'time_step', 'land_class': 'land_class_id'})
+
+    @property_cached
+    def class_set_ids(self):
+        """The unique combinations of classifiers."""
+        cols = ['user_defd_class_set_id'] + self.parent.country.classifiers.names
+        return self.stands[cols].drop_duplicates()
+
+    #-------------------------------------------------------------------------#
+    def to_pool_indicators(self):
+        """Equivalent of the 'tblPoolIndicators' table."""
+        # Rename the pools #
+        pools = self.results.pools.rename(columns=camel_to_snake)
+        mapping = libcbm_mapping.pools.dropna().set_index('libcbm')['cbmcfs3']
+        pools = pools.rename(columns=mapping)
+        pools = pools.rename(columns={'timestep': 'time_step'})
+        # Add the class set #
+        keys = ['identifier', 'time_step']
+        cols = keys + ['user_defd_class_set_id', 'spuid', 'land_class_id']
+        df = pools.merge(self.stands[cols], on=keys)
+        # Sum all stands of a given class set #
+        index = ['user_defd_class_set_id', 'time_step', 'spuid', 'land_class_id']
+        values = [c for c in mapping.values if c in df.columns]
+        df = df.groupby(index)[values].sum().reset_index()
+        df.insert(0, 'pool_ind_id', range(1, len(df) + 1))
+        # Return #
+        return df
+
+    def to_flux_indicators(self):
+        """
+        Equivalent of the 'tblFluxIndicators' table. Like in CBM-CFS3,
+        the fluxes of the annual processes of all stands are reported on
+        rows with a `dist_type_id` of zero, and the fluxes caused by a
+        disturbance on rows with the type of that disturbance.
+        """
+        # Rename the fluxes #
+        flux = self.results.flux.rename(columns=camel_to_snake)
+        keys = ['identifier', 'timestep']
+        dist = [c for c in flux.columns if c.startswith('disturbance_')]
+        proc = [c for c in flux.columns if c not in dist + keys]
+        # Split every stand in an annual process row and a disturbance row #
+        params = self.results.parameters[keys + ['disturbance_type']]
+        flux   = flux.merge(params, on=keys)
+        annual = flux.assign(disturbance_type=0, **{c: 0.0 for c in dist})
+        caused = flux.query('disturbance_type > 0').assign(**{c: 0.0 for c in proc})
+        flux   = pandas.concat([annual, caused], ignore_index=True)
+        flux   = flux.rename(columns=lambda n: n.replace('disturbance_', '', 1))
+        flux = flux.rename(columns={'timestep': 'time_step',
+                                    'type':             'dist_type_id',
+                                    'd_o_m_production': 'dom_production',
+                                    'c_o2_production':  'co2_production'})
+        # Add the class set #
+        keys = ['identifier', 'time_step']
+        cols = keys + ['user_defd_class_set_id', 'spuid']
+        df = flux.merge(self.stands[cols], on=keys)
+        # Sum all stands of a given class set #
+        index  = ['user_defd_class_set_id', 'time_step', 'dist_type_id', 'spuid']
+        values = [c for c in df.columns if c not in index + ['identifier']]
+        df = df.groupby(index)[values].sum().reset_index()
+        df.insert(0, 'flux_ind_id', range(1, len(df) + 1))
+        # Return #
+        return df
+
+    def to_dist_indicators(self):
+        """Equivalent of the 'tblDistIndicators' table."""
+        # Only disturbed stands #
+        df = self.stands.query('disturbance_type > 0')
+        # The products come from the flux table #
+        flux = self.results.flux.rename(columns=camel_to_snake)
+        flux = flux.rename(columns={'timestep': 'time_step'})
+        flux['dist_product'] = (flux['disturbance_soft_production'] +
+                                flux['disturbance_hard_production'] +
+                                flux['disturbance_d_o_m_production'])
+        df = df.merge(flux[['identifier', 'time_step', 'dist_product']],
+                      on=['identifier', 'time_step'])
+        # Sum #
+        index = ['dist_type_id', 'time_step', 'user_defd_class_set_id', 'spuid']
+        df = df.rename(columns={'disturbance_type': 'dist_type_id', 'area': 'dist_area'})
+        df = df.groupby(index)[['dist_area', 'dist_product']].sum().reset_index()
+        df.insert(0, 'dist_ind_id', range(1, len(df) + 1))
+        # Return #
+        return df
+
+    def to_age_indicators(self):
+        """
+        Equivalent of the 'tblAgeIndicators' table.
+        The biomass is in tons of carbon per hectare.
+        """
+        # Total biomass per stand #
+        pools = self.results.pools.rename(columns=camel_to_snake)
+        pools = pools.rename(columns={'timestep': 'time_step'})
+        bmass = [c for c in pools.columns if c.startswith(('softwood_', 'hardwood_'))
+                 and not c.endswith('_snag')]
+        pools['biomass'] = pools[bmass].sum(axis=1)
+        df = self.stands.merge(pools[['identifier', 'time_step', 'biomass']],
+                               on=['identifier', 'time_step'])
+        # Age classes #
+        df['age_class_id'] = self.age_class_of(df['age'])
+        df['age_x_area']   = df['age'] * df['area']
+        # Sum #
+        index = ['user_defd_class_set_id', 'time_step', 'spuid', 'age_class_id', 'land_class_id']
+        df = df.groupby(index)[['area', 'biomass', 'age_x_area']].sum().reset_index()
+        # Area weighted average age and biomass per hectare #
+        df['ave_age'] = df['age_x_area'] / df['area']
+        df['biomass'] = df['biomass']    / df['area']
+        df = df.drop(columns='age_x_area')
+        df.insert(0, 'age_ind_id', range(1, len(df) + 1))
+        # Return #
+        return df
+
+    def to_disturbance_type(self):
+        """Equivalent of the 'tblDisturbanceType' table."""
+        df = pandas.read_csv(str(self.paths.csv_dir + 'disturbance_types.csv'))
+        # The description is in 'name', or 'dist_desc_input' in some countries #
+        col = 'dist_desc_input' if 'dist_desc_input' in df.columns else 'name'
+        df  = df[['dist_type_name', col]].rename(columns={col: 'description'})
+        df['dist_type_name'] = df['dist_type_name'].astype(str)
+        sit_to_default = {str(k): v for k, v in self.sit.disturbance_id_map.items()}
+        df['dist_type_id'] = df['dist_type_name'].map(sit_to_default)
+        return df[['dist_type_id', 'dist_type_name', 'description']]
+
+    def to_user_defd_tables(self):
+        """
+        Equivalent of the three tables 'tblUserDefdClasses',
+        'tblUserDefdSubclasses' and 'tblUserDefdClassSetValues'
+        from which the `PostProcessor` rebuilds the classifiers.
+        """
+        # The classifier names #
+        mapping = self.parent.country.classifiers.mapping
+        classes = pandas.DataFrame({'user_defd_class_id': range(1, len(mapping) + 1),
+                                    'class_desc':         list(mapping)})
+        # Long format of the class sets #
+        sets = self.class_set_ids.melt(id_vars    = 'user_defd_class_set_id',
+                                       var_name   = 'class_desc',
+                                       value_name = 'user_defd_sub_class_name')
+        sets = sets.merge(classes, on='class_desc')
+        # Number each classifier value within its classifier #
+        sets['user_defd_subclass_id'] = (sets.groupby('user_defd_class_id')
+                                             ['user_defd_sub_class_name']
+                                             .transform(lambda s: pandas.factorize(s)[0] + 1))
+        # Split #
+        index = ['user_defd_class_id', 'user_defd_subclass_id']
+        subclasses = sets[index + ['user_defd_sub_class_name']].drop_duplicates()
+        set_values = sets[['user_defd_class_set_id'] + index]
+        # Return #
+        return classes, subclasses, set_values
+
+    #-------------------------------------------------------------------------#
+    def write_tables(self):
+        """Convert the results and write every table to the output directory."""
+        # Message #
+        self.log.info("Converting libcbm results to CBM-CFS3 tables.")
+        # Compute #
+        classes, subclasses, set_values = self.to_user_defd_tables()
+        tables = {'tblPoolIndicators':         self.to_pool_indicators(),
+                  'tblFluxIndicators':         self.to_flux_indicators(),
+                  'tblDistIndicators':         self.to_dist_indicators(),
+                  'tblAgeIndicators':          self.to_age_indicators(),
+                  'tblDisturbanceType':        self.to_disturbance_type(),
+                  'tblUserDefdClasses':        classes,
+                  'tblUserDefdSubclasses':     subclasses,
+                  'tblUserDefdClassSetValues': set_values}
+        # Write #
+        self.paths.libcbm_dir.create(safe=True)
+        for name, df in tables.items():
+            df.reset_index(drop=True).to_parquet(str(self.paths.libcbm_dir + name.lower() + '.parquet'))
+
+    @property_cached
+    def generated_database(self):
+        """The output tables, accessible like an Access database."""
+        return LibCBMDatabase(self.paths.libcbm_dir)
+
+    @property
+    def tail(self):
+        """Shortcut: view the end of the log file."""
+        return self.paths.log.tail()
+
+###############################################################################
+class LibCBMDatabase(object):
+    """
+    Mimics the way we access tables inside an `AccessDatabase` object,
+    but reads the parquet files written by `LaunchLibCBM` instead.
+    Like in MS Access, table names are case insensitive.
+    """
+
+    def __init__(self, directory):
+        self.directory = DirectoryPath(directory)
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.directory)
+
+    def __contains__(self, key):
+        return self.path_of(key).exists
+
+    def __getitem__(self, key):
+        return pandas.read_parquet(str(self.path_of(key)))
+
+    def path_of(self, key):
+        return Path(self.directory + key.lower() + '.parquet')
+
+    @property
+    def tables(self):
+        return [f.prefix for f in self.directory.flat_files if f.extension == 'parquet']
+
+    @property
+    def md5(self):
+        """A hash of all the tables together."""
+        import hashlib
+        result = hashlib.md5()
+        for f in sorted(self.directory.flat_files, key=str): result.update(f.md5.encode())
+        return result.hexdigest()
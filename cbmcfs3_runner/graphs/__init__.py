@@ -6,11 +6,23 @@ Written by Lucas Sinclair and Paul Rougieux.
 
 JRC biomass Project.
 Unit D1 Bioeconomy.
+
+To regenerate only the graphs whose data changed, using several processes:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> from cbmcfs3_runner.graphs import render_many
+    >>> render_many([c.graphs for c in continent], processes=8)
 """
 
 # Built-in modules #
+import hashlib, inspect, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 # Third party modules #
+import pandas
+
+# First party modules #
+from autopaths import Path
 
 ###############################################################################
 class Graphs(object):
@@ -20,12 +32,28 @@ class Graphs(object):
     def __iter__(self): return iter(self.instances)
     def __len__(self):  return len(self.instances)
 
-    def __init__(self):
+    def __init__(self, parent=None):
+        self.parent    = parent
         self.instances = []
 
     def __call__(self, *args, **kwargs):
         return [i(*args, **kwargs) for i in self.instances]
 
+    def render(self, rerun=False, processes=None):
+        """
+        Plot only the graphs whose input data changed since they were
+        last drawn. With `processes` greater than one, the work is done
+        in a pool of worker processes.
+        """
+        return render_many([self], rerun=rerun, processes=processes)
+
+    @property
+    def owner_key(self):
+        """A tuple that lets another process find the same object."""
+        p = self.parent
+        if hasattr(p, 'num'): return ('runner', p.scenario.short_name, p.country.iso2_code, p.num)
+        return ('country', p.iso2_code)
+
 ###############################################################################
 def load_graphs_from_module(parent, submodule):
     """
@@ -38,10 +66,88 @@ def load_graphs_from_module(parent, submodule):
     graph_instances = [g(parent)    for g in graph_classes]
     graph_names     = [g.short_name for g in graph_instances]
     # Create a container object #
-    graphs = Graphs()
+    graphs = Graphs(parent)
     # Set its attributes #
     for name, instance in zip(graph_names, graph_instances):
         setattr(graphs, name, instance)
         graphs.instances.append(instance)
     # Return result #
-    return graphs
\ No newline at end of file
+    return graphs
+
+###############################################################################
+def fingerprint(graph):
+    """
+    A hash of everything that determines how a graph looks: the source
+    code of its class and the data it plots. Returns None if the data
+    can't be hashed, in which case the graph is always redrawn.
+    """
+    # The code #
+    result = hashlib.md5()
+    for cls in type(graph).__mro__:
+        if cls.__module__.startswith('cbmcfs3_runner'):
+            result.update(inspect.getsource(cls).encode())
+    # The data #
+    names = [n for n in ('data', 'data_raw') if hasattr(type(graph), n)]
+    if not names: return None
+    data = getattr(graph, names[0])
+    if not isinstance(data, (pandas.DataFrame, pandas.Series)): return None
+    result.update(str(list(getattr(data, 'columns', [data.name]))).encode())
+    result.update(pandas.util.hash_pandas_object(data, index=True).values.tobytes())
+    # Return #
+    return result.hexdigest()
+
+def render_graph(graph, rerun=False):
+    """
+    Plot one graph unless the PDF exists and its fingerprint, stored
+    next to it, is unchanged. Returns True if the graph was drawn.
+    """
+    # The sidecar file #
+    sidecar = Path(graph.path + '.md5')
+    # Compare #
+    current = fingerprint(graph)
+    if not rerun and graph.path.exists and current is not None:
+        if sidecar.exists and sidecar.contents == current: return False
+    # Plot #
+    graph.plot()
+    # Record #
+    if current is not None: sidecar.write(current)
+    else:                   sidecar.remove()
+    return True
+
+def resolve(key):
+    """Find a graphs container from its owner key, used inside the workers."""
+    from cbmcfs3_runner.core.continent import continent
+    if key[0] == 'runner': return continent.get_runner(*key[1:]).graphs
+    return continent.countries[key[1]].graphs
+
+def render_owner(key, names, rerun):
+    """Entry point of a worker process, renders the graphs of one owner."""
+    # Must be chosen before pyplot is imported #
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot
+    # Render #
+    graphs = resolve(key)
+    result = {}
+    for name in names:
+        result[name] = render_graph(graphs[name], rerun)
+        pyplot.close('all')
+    return key, result
+
+def render_many(containers, rerun=False, processes=None):
+    """
+    Render the graphs of many containers, for instance all countries.
+    Each task handles all the graphs of one owner so that the data they
+    share is only loaded once per process. Returns a dictionary of owner
+    keys to dictionaries of graph names and whether they were redrawn.
+    """
+    # Serial #
+    if processes is None: processes = multiprocessing.cpu_count()
+    if processes <= 1:
+        return {g.owner_key: {i.short_name: render_graph(i, rerun) for i in g}
+                for g in containers}
+    # Parallel #
+    tasks = [(g.owner_key, [i.short_name for i in g]) for g in containers]
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(render_owner, key, names, rerun) for key, names in tasks]
+        return dict(f.result() for f in futures)
@@ -27,12 +27,24 @@ class InventoryFacet(Graph):
     year_selection = lambda self, years: max(years)
     color = brewer2mpl.get_map('Dark2', 'qualitative', 3).mpl_colors[0]
 
+    # Change these to re-bin the graph without discretizing again #
+    bin_width = None
+    age_min   = 0.0
+    age_max   = None
+
+    def bins(self, inventory):
+        """The bins of an inventory, with the bin width and range of this graph."""
+        if self.bin_width is None and self.age_max is None and not self.age_min:
+            return inventory.bins_per_year
+        return inventory.rebinned(self.width, self.age_min, self.age_max)
+
     @property
     def data(self):
-        return self.parent.post_processor.inventory.bins_per_year
+        return self.bins(self.parent.post_processor.inventory)
 
     @property
     def width(self):
+        if self.bin_width is not None: return self.bin_width
         return self.parent.post_processor.inventory.bin_width
 
     @property
@@ -130,6 +142,7 @@ class InventoryDiscrepancy(InventoryFacet):
 
     @property
     def width(self):
+        if self.bin_width is not None: return self.bin_width
         return self.parent.scenarios['static_demand'][0].post_processor.inventory.bin_width
 
     @property
@@ -139,8 +152,8 @@ class InventoryDiscrepancy(InventoryFacet):
         # Data #
         static = self.parent.scenarios['static_demand'][-1].post_processor
         calibr = self.parent.scenarios['calibration'][-1].post_processor
-        static = static.inventory.bins_per_year.set_index(cols)
-        calibr = calibr.inventory.bins_per_year.set_index(cols)
+        static = self.bins(static.inventory).set_index(cols)
+        calibr = self.bins(calibr.inventory).set_index(cols)
         # Subtract #
         return abs(static - calibr).reset_index()
 
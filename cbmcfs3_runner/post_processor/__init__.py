@@ -9,28 +9,54 @@ Unit D1 Bioeconomy.
 """
 
 # Built-in modules #
+import os, weakref
 
 # Third party modules #
+import pandas
 
 # First party modules #
-from plumbing.databases.access_database import AccessDatabase
+from plumbing.common      import camel_to_snake
 from plumbing.cache       import property_cached
 from autopaths.auto_paths import AutoPaths
 
 # Internal modules #
+from cbmcfs3_runner.core.metrics                import property_measured
+from cbmcfs3_runner.core.cache_manager          import property_managed
+from cbmcfs3_runner.core.connections            import connection_pool
+from cbmcfs3_runner.pump.dataframes             import merge_partials
 from cbmcfs3_runner.post_processor.csv_maker    import CSVMaker
+from cbmcfs3_runner.post_processor.class_sets   import ClassSetLookup
 from cbmcfs3_runner.post_processor.harvest      import Harvest
 from cbmcfs3_runner.post_processor.inventory    import Inventory
 from cbmcfs3_runner.post_processor.products     import Products
 from cbmcfs3_runner.post_processor.ipcc         import Ipcc
 
+# By default the output tables are loaded in one go #
+default_chunk_steps = None
+
+# But for big countries you can process them a few time steps at a time #
+if os.environ.get("CBMCFS3_CHUNK_STEPS"):
+    default_chunk_steps = int(os.environ['CBMCFS3_CHUNK_STEPS'])
+
 ###############################################################################
 class PostProcessor(object):
     """
     Provides access to the Access database.
     Computes aggregates and joins to facilitate analysis.
+
+    Set `chunk_steps` to a number of time steps (or the environment
+    variable `CBMCFS3_CHUNK_STEPS`) to have the biggest aggregations
+    read the output tables one partition of time steps at a time.
+    The harvest, the stocks, the IPCC pools, `Inventory.bef_ft`, the age
+    store and the CSV exports go through `partitions` or `aggregate`.
+    The properties `flux_indicators`, `pool_indicators`,
+    `Inventory.age_indicators` and `Inventory.simulated` still hold a
+    whole table in memory, they are kept for interactive use only.
     """
 
+    # On Linux, how many rows of the mdbtools export are parsed at once #
+    export_chunk_rows = 500000
+
     all_paths = """
     /output/cbm/project.mdb
     """
@@ -38,6 +64,7 @@ class PostProcessor(object):
     def __init__(self, parent):
         # Default attributes #
         self.parent = parent
+        self.chunk_steps = default_chunk_steps
         # Directories #
         self.paths = AutoPaths(self.parent.data_dir, self.all_paths)
 
@@ -49,14 +76,149 @@ class PostProcessor(object):
         """Remove spaces and slashes from column names."""
         return name.lower().replace(' ', '_').replace('/','_')
 
-    @property
+    @property_cached
     def database(self):
-        """The CBM database, after the model is run."""
-        database = AccessDatabase(self.paths.mdb)
-        database.convert_col_names_to_snake = True
+        """
+        The CBM database, after the model is run. When the runner used
+        libcbm, the tables come from parquet files with the same schema.
+        The Access database handle is shared through the connection pool
+        and released when this object is closed or garbage collected.
+        """
+        if self.parent.simulator == 'libcbm':
+            return self.parent.launch_libcbm.generated_database
+        database, token = connection_pool.acquire(self.paths.mdb)
+        self.release_handle = weakref.finalize(self, connection_pool.release, token)
         return database
 
-    @property_cached
+    def close(self):
+        """Release the handle on the database, it is reopened if needed."""
+        if 'database' not in self.__dict__.get('__cache__', {}): return
+        del self.database
+        if hasattr(self, 'release_handle'): self.release_handle()
+
+    def read(self, table, columns=None, time_steps=None, class_sets=None):
+        """
+        Load only part of a table from the output database.
+
+        * `columns` is a list of column names in snake case.
+        * `time_steps` is a tuple of the first and last time step to keep,
+          either bound can be None.
+        * `class_sets` is a list of `user_defd_class_set_id` to keep.
+
+        On Windows the selection is done by the database engine in SQL.
+        On Linux, mdbtools can only export whole tables, so we only parse
+        the columns requested and filter the rows `export_chunk_rows` at a
+        time, never holding more than the selection and one chunk. Each
+        call still goes through the whole export, so many partitions cost
+        time but not memory.
+        With libcbm, the parquet reader does both.
+        """
+        database = self.database
+        # Parquet files #
+        if self.parent.simulator == 'libcbm':
+            filters = []
+            if time_steps is not None:
+                first, last = time_steps
+                if first is not None: filters.append(('time_step', '>=', first))
+                if last  is not None: filters.append(('time_step', '<=', last))
+            if class_sets is not None:
+                filters.append(('user_defd_class_set_id', 'in', list(class_sets)))
+            return pandas.read_parquet(str(database.path_of(table)),
+                                       columns = columns,
+                                       filters = filters or None)
+        # Access database on Windows #
+        if os.name != "posix":
+            return self.read_via_query(database, table, columns, time_steps, class_sets)
+        # Access database on Linux #
+        usecols = None
+        if columns is not None: usecols = lambda c: camel_to_snake(c) in columns
+        chunks = database.table_as_df_via_mdbtools(table, usecols=usecols,
+                                                   chunksize=self.export_chunk_rows)
+        parts  = [self.filter_rows(df.rename(columns=camel_to_snake), time_steps, class_sets)
+                  for df in chunks]
+        # Return #
+        if not parts: return pandas.DataFrame(columns=columns)
+        return pandas.concat(parts, ignore_index=True)
+
+    @staticmethod
+    def filter_rows(df, time_steps, class_sets):
+        """Keep the rows of `df` selected like in `read`."""
+        if time_steps is not None:
+            first, last = time_steps
+            if first is not None: df = df.loc[df['time_step'] >= first]
+            if last  is not None: df = df.loc[df['time_step'] <= last]
+        if class_sets is not None:
+            df = df.loc[df['user_defd_class_set_id'].isin(list(class_sets))]
+        return df
+
+    def read_via_query(self, database, table, columns, time_steps, class_sets):
+        """Build an SQL query with the real column names of the table."""
+        # Real names in the database, e.g. `UserDefdClassSetID` #
+        real = {camel_to_snake(c.column_name): c.column_name
+                for c in database.own_cursor.columns(table=table)}
+        quote = lambda snake: '[%s]' % real[snake]
+        # Select #
+        select = '*' if columns is None else ', '.join(quote(c) for c in columns)
+        query  = "SELECT %s FROM [%s]" % (select, table)
+        # Where #
+        conditions = []
+        if time_steps is not None:
+            first, last = time_steps
+            if first is not None: conditions.append("%s >= %i" % (quote('time_step'), first))
+            if last  is not None: conditions.append("%s <= %i" % (quote('time_step'), last))
+        if class_sets is not None:
+            ids = ', '.join(str(int(i)) for i in class_sets)
+            conditions.append("%s IN (%s)" % (quote('user_defd_class_set_id'), ids))
+        if conditions: query += " WHERE " + " AND ".join(conditions)
+        # Execute #
+        df = pandas.read_sql(query, database.own_conn)
+        return df.rename(columns=camel_to_snake)
+
+    @property
+    def last_time_step(self):
+        """
+        In the calibration scenario we stop at the base year, so there is
+        no point in loading the rows that come after. Otherwise None.
+        """
+        if self.parent.scenario.short_name != 'calibration': return None
+        country = self.parent.country
+        return int(country.year_to_timestep(country.base_year))
+
+    #-------------------------------------------------------------------------#
+    def time_step_ranges(self, table, last=None):
+        """
+        The list of (first, last) time steps of each partition of a table,
+        optionally stopping at time step `last`.
+        A single partition covering everything when not chunking.
+        """
+        if not self.chunk_steps: return [(None, last)]
+        steps = self.read(table, ['time_step'])['time_step']
+        first = int(steps.min())
+        stop  = int(steps.max())
+        if last is not None: stop = min(stop, last)
+        return [(start, min(start + self.chunk_steps - 1, stop))
+                for start in range(first, stop + 1, self.chunk_steps)]
+
+    def partitions(self, table, columns=None, last=None):
+        """Yield the table piece by piece, see `time_step_ranges`."""
+        for time_steps in self.time_step_ranges(table, last):
+            yield self.read(table, columns, time_steps=time_steps)
+
+    def aggregate(self, table, index, values, columns=None, prepare=None, last=None):
+        """
+        Sum the `values` columns of a table grouped by `index`, one
+        partition at a time. Only the partial sums of each partition
+        are kept in memory, and they are merged at the end.
+        The optional `prepare` function is applied to each partition
+        before grouping, for instance to add the classifiers.
+        """
+        partials = []
+        for df in self.partitions(table, columns, last):
+            if prepare is not None: df = prepare(df)
+            partials.append(df.groupby(index, observed=True)[values].sum())
+        return merge_partials(partials, index, values)
+
+    @property_measured
     def classifiers(self):
         """
         Creates a mapping between 'user_defd_class_set_id'
@@ -109,7 +271,7 @@ class PostProcessor(object):
         """Shortcut to the country's conversion coefficients."""
         return self.parent.country.coefficients
 
-    @property_cached
+    @property_managed
     def classifiers_coefs(self):
         """
         A join between the coefficients and the classifiers table.
@@ -122,6 +284,14 @@ class PostProcessor(object):
         """
         return self.classifiers.left_join(self.coefficients, 'forest_type')
 
+    @property_cached
+    def class_sets(self):
+        """
+        The `classifiers_coefs` table compiled to dense arrays, used to add
+        classifiers and coefficients to any output table without a join.
+        """
+        return ClassSetLookup(self.classifiers_coefs)
+
     @property_cached
     def classifiers_mapping(self):
         return self.parent.country.classifiers.mapping
@@ -135,13 +305,13 @@ class PostProcessor(object):
         c.remove('user_defd_class_set_id')
         return c
 
-    @property_cached
+    @property_managed
     def disturbance_type(self):
         columns_of_interest = ['dist_type_id', 'dist_type_name', 'description']
         df = self.database['tbldisturbancetype']
         return df[columns_of_interest]
 
-    @property_cached
+    @property_managed
     def disturbances(self):
         """
         Load the disturbance table (input_data.disturbance_events)
@@ -182,36 +352,34 @@ class PostProcessor(object):
         # Return result #
         return df
 
-    @property_cached
+    @property_measured
     def flux_indicators(self):
         """
         Load the flux indicators table add dist_type_name, classifiers and
-        coefficients.
+        coefficients. This is the whole table in memory, the pipeline
+        itself only reads it by partitions, see `aggregate`.
         """
         # Load tables #
         flux_indicators  = self.database['tblFluxIndicators']
         disturbance_type = self.database['tblDisturbanceType']
-        coefficients     = self.classifiers_coefs
-        # Perform two joins #
+        # Join the small table and add the classifiers and coefficients #
         df = flux_indicators.left_join(disturbance_type, 'dist_type_id')
-        df = df.left_join(coefficients, 'user_defd_class_set_id')
+        df = self.class_sets.enrich(df)
         # Return #
         return df
 
-    @property_cached
+    @property_measured
     def pool_indicators(self):
-        """Load the pool indicators table, add classifiers."""
-        # Load tables #
-        pool  = self.database["tblPoolIndicators"]
-        clifr = self.classifiers
-        # Set indexes #
-        index = 'user_defd_class_set_id'
-        pool  = pool.set_index(index)
-        clifr = clifr.set_index(index)
-        # Join #
-        df = pool.join(clifr)
-        # Remove index column user_defd_class_set_id
-        df = df.reset_index(drop=True)
+        """
+        Load the pool indicators table, add classifiers. This is the whole
+        table in memory, the pipeline itself only reads it by partitions.
+        """
+        # Load table #
+        pool = self.database["tblPoolIndicators"]
+        # Add classifiers #
+        df = self.class_sets.enrich(pool, self.classifiers_names)
+        # Remove column user_defd_class_set_id
+        df = df.drop(columns='user_defd_class_set_id').reset_index(drop=True)
         return df
 
     # Do not cache since it can be re-computed trivially from the above
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+The simulated area by age is discretized once, in cells of 0.1 years,
+and saved next to the other outputs of the runner. Any bin width or age
+range can then be obtained without going back to the CBM output:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> inv = continent[('static_demand', 'LU', 0)].post_processor.inventory
+    >>> print(inv.age_store.rebin(5.0))
+    >>> print(inv.age_store.rebin(10.0, age_min=20.0, age_max=120.0))
+"""
+
+# Built-in modules #
+
+# Third party modules #
+import numpy, pandas
+
+# First party modules #
+from autopaths.auto_paths import AutoPaths
+from plumbing.cache       import property_cached
+
+# Internal modules #
+from cbmcfs3_runner.post_processor.bin_discretizer import CBM_PRECISION
+from cbmcfs3_runner.post_processor.bin_discretizer import discretize_groups, rebin_cumulative
+
+###############################################################################
+class AgeStore(object):
+    """
+    Keeps, for every group of the simulated inventory (e.g. time step and
+    forest type), the cumulative sum of the area over cells of
+    `precision` years. The file is a compressed numpy archive with one
+    array per group column, the length of each group and the cumulative
+    sums. The names and types of the group columns are saved too, so that
+    loading gives back the same data frame, and a file made with other
+    group columns is computed again. It is removed with the rest of the
+    output when the runner is run again.
+    """
+
+    all_paths = """
+    /output/inventory/age_cells.npz
+    """
+
+    precision = CBM_PRECISION
+
+    def __init__(self, parent):
+        # Default attributes #
+        self.parent    = parent
+        self.inventory = parent
+        # Directories #
+        self.paths = AutoPaths(self.inventory.parent.parent.data_dir, self.all_paths)
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.paths.npz)
+
+    @property
+    def group_cols(self): return self.inventory.group_cols
+
+    @property
+    def sum_col(self): return self.inventory.sum_col
+
+    #-------------------------------------------------------------------------#
+    def partitions(self):
+        """
+        Only the columns needed from 'tblAgeIndicators', with the group
+        columns added, one partition of time steps at a time.
+        """
+        post_processor = self.inventory.parent
+        columns = ['time_step', 'user_defd_class_set_id', self.inventory.bin_col, self.sum_col]
+        added   = [c for c in self.group_cols if c not in columns]
+        for df in post_processor.partitions('tblAgeIndicators', columns):
+            yield post_processor.class_sets.enrich(df, added)
+
+    def discretize(self, df):
+        return discretize_groups(df, self.group_cols, self.sum_col,
+                                 self.inventory.bin_col, precision=self.precision)
+
+    def combine(self, results):
+        """
+        Put together the groups discretized in separate partitions, which
+        never share a group since the time step is one of the group columns.
+        """
+        # An empty table still gives one empty partition #
+        kept = [r for r in results if len(r[0])]
+        if not kept: return results[0]
+        results = kept
+        # Extend the shorter cumulative sums with their last value #
+        width = max(cumulative.shape[1] for _, _, cumulative in results)
+        pad   = lambda c: numpy.pad(c, ((0, 0), (0, width - c.shape[1])), mode='edge')
+        groups     = pandas.concat([g for g, _, _ in results], ignore_index=True)
+        length     = numpy.concatenate([l for _, l, _ in results])
+        cumulative = numpy.concatenate([pad(c) for _, _, c in results])
+        # Same order as if grouped in one go #
+        order = groups.sort_values(self.group_cols, kind='stable').index.to_numpy()
+        return groups.iloc[order].reset_index(drop=True), length[order], cumulative[order]
+
+    def compute(self):
+        """
+        Discretize the simulated inventory and save the result. When the
+        time step is a group column, each partition is discretized on its
+        own and only the projected columns of one partition are in memory.
+        """
+        if 'time_step' in self.group_cols:
+            groups, length, cumulative = self.combine([self.discretize(df)
+                                                       for df in self.partitions()])
+        else:
+            groups, length, cumulative = self.discretize(pandas.concat(list(self.partitions())))
+        # Plain arrays, so that the file is read without pickle #
+        arrays = {'group_cols': numpy.asarray(self.group_cols)}
+        for col in self.group_cols: arrays.update(self.save_column(col, groups[col]))
+        self.paths.npz.directory.create_if_not_exists()
+        numpy.savez_compressed(str(self.paths.npz), length=length,
+                               cumulative=cumulative, **arrays)
+        return groups, length, cumulative
+
+    @staticmethod
+    def save_column(col, series):
+        """The arrays that describe one group column, categories included."""
+        result = {'dtype_' + col: numpy.asarray(str(series.dtype))}
+        if isinstance(series.dtype, pandas.CategoricalDtype):
+            categories = series.cat.categories
+            result['group_' + col]      = series.cat.codes.values
+            result['categories_' + col] = numpy.asarray(categories.tolist())
+            result['cat_dtype_' + col]  = numpy.asarray(str(categories.dtype))
+            result['ordered_' + col]    = numpy.asarray(series.cat.ordered)
+        else:
+            result['group_' + col] = numpy.asarray(series.tolist())
+        return result
+
+    @staticmethod
+    def load_column(col, archive):
+        """The opposite of `save_column`."""
+        dtype  = str(archive['dtype_' + col])
+        values = archive['group_' + col]
+        if dtype == 'category':
+            categories = pandas.Index(archive['categories_' + col].tolist(),
+                                      dtype=str(archive['cat_dtype_' + col]))
+            return pandas.Categorical.from_codes(values, categories=categories,
+                                                 ordered=bool(archive['ordered_' + col]))
+        return pandas.Series(values.tolist(), dtype=dtype)
+
+    def is_fresh(self, archive):
+        """The file was made with the same group columns as we have now."""
+        if 'group_cols' not in archive.files: return False
+        return archive['group_cols'].tolist() == list(self.group_cols)
+
+    def load(self):
+        """Read the arrays back from the file, or None if it is stale."""
+        with numpy.load(str(self.paths.npz)) as archive:
+            if not self.is_fresh(archive): return None
+            groups = pandas.DataFrame({col: self.load_column(col, archive)
+                                       for col in self.group_cols})
+            return groups, archive['length'], archive['cumulative']
+
+    @property_cached
+    def arrays(self):
+        """The groups, their lengths and the cumulative sums, computed only once."""
+        result = self.load() if self.paths.npz.exists else None
+        if result is None: result = self.compute()
+        return result
+
+    @property
+    def groups(self): return self.arrays[0]
+
+    @property
+    def cumulative(self): return self.arrays[2]
+
+    #-------------------------------------------------------------------------#
+    @property
+    def vectors(self):
+        """The discretized vector of every group, as in `Inventory.grouped_vectors`."""
+        groups, length, cumulative = self.arrays
+        cells  = numpy.diff(cumulative, axis=1)
+        result = groups.copy()
+        result[self.sum_col] = [cells[i, :n] for i, n in enumerate(length)]
+        return result
+
+    def rebin(self, bin_width=None, age_min=0.0, age_max=None):
+        """
+        Bins of any width, indexed on the group columns, with the columns
+        ['age_start', 'age_end', sum_col] like `Inventory.grouped_bins`.
+        """
+        if bin_width is None: bin_width = self.inventory.bin_width
+        groups, length, cumulative = self.arrays
+        starts, ends, sums, keep = rebin_cumulative(cumulative, length, bin_width,
+                                                    age_min, age_max, self.precision)
+        # One row per group and bin #
+        rows, cols = numpy.nonzero(keep)
+        df = groups.iloc[rows].reset_index(drop=True)
+        df['age_start']  = starts[cols]
+        df['age_end']    = ends[cols]
+        df[self.sum_col] = sums[rows, cols]
+        return df.set_index(self.group_cols)
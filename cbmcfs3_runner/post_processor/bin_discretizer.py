@@ -128,3 +128,73 @@ def binner(vector, sum_col, bin_width):
     all_bins = generate_bins(vector, bin_width)
     # Make data frame #
     return pandas.DataFrame(all_bins, columns=['age_start', 'age_end', sum_col])
+
+###############################################################################
+###############################################################################
+###############################################################################
+def discretize_groups(df, group_cols, sum_col, bin_col,
+                      bin_width = CBM_BIN_WIDTH,
+                      precision = CBM_PRECISION):
+    """
+    The same as calling `aggregator` on every group, but for all rows at
+    once. Every row is spread uniformly over the cells of its bin, by
+    adding its height at the left edge and removing it at the right edge
+    of a difference array. Returns the groups, the number of cells used
+    by each group and the cumulative sum of the cells, starting with a
+    column of zeros, so that the area between any two ages is a simple
+    subtraction.
+    """
+    # Number each group, in the same order as `groupby` #
+    grouped = df.groupby(group_cols)
+    codes   = grouped.ngroup().to_numpy()
+    groups  = grouped.size().index.to_frame(index=False)
+    # Edges in cells, like in `bin_to_discrete` #
+    radius = int(numpy.round(bin_width / 2 / precision))
+    center = numpy.round(df[bin_col].to_numpy(dtype=float) / precision).astype(int)
+    left   = numpy.maximum(center - radius, 0)
+    right  = center + radius
+    height = df[sum_col].to_numpy(dtype=float) / (right - left)
+    # Difference array, one row per group #
+    num_cells = int(right.max()) if len(right) else 0
+    delta = numpy.zeros((len(groups), num_cells + 1))
+    numpy.add.at(delta, (codes, left),   height)
+    numpy.add.at(delta, (codes, right), -height)
+    cells = numpy.cumsum(delta, axis=1)[:, :-1]
+    # How long the vector of each group would be #
+    length = numpy.zeros(len(groups), dtype=int)
+    numpy.maximum.at(length, codes, right)
+    # Cumulative sums with a leading zero #
+    cumulative = numpy.zeros((len(groups), num_cells + 1))
+    cumulative[:, 1:] = numpy.cumsum(cells, axis=1)
+    return groups, length, cumulative
+
+def rebin_cumulative(cumulative, length, bin_width,
+                     age_min   = 0.0,
+                     age_max   = None,
+                     precision = CBM_PRECISION):
+    """
+    Starting from the cumulative sums made by `discretize_groups`, sum
+    the cells in bins of any width, for all groups at once. Without
+    `age_max`, each group gets bins up to the end of its own vector like
+    `generate_bins` does. With `age_max`, every group gets the same bins
+    and the ages outside the range are left out.
+    Returns the start of the bins, their end and a 2D array of sums.
+    """
+    # Everything in cells #
+    num_cells = cumulative.shape[1] - 1
+    width     = int(numpy.round(bin_width / precision))
+    first     = int(numpy.round(age_min / precision))
+    last      = num_cells if age_max is None else int(numpy.round(age_max / precision))
+    # The edges #
+    starts = numpy.arange(first, max(last, first + 1), width)
+    ends   = starts + width
+    if age_max is not None: ends = numpy.minimum(ends, last)
+    # Sums #
+    sums = (cumulative[:, numpy.clip(ends,   0, num_cells)] -
+            cumulative[:, numpy.clip(starts, 0, num_cells)])
+    # Each group stops where its vector stops, but always has one bin #
+    if age_max is None:
+        keep = (starts[None, :] < length[:, None]) | (starts[None, :] == first)
+    else:
+        keep = numpy.ones(sums.shape, dtype=bool)
+    return starts * precision, ends * precision, sums, keep
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+"""
+
+# Built-in modules #
+
+# Third party modules #
+import numpy, pandas
+
+# First party modules #
+
+# Internal modules #
+
+###############################################################################
+class ClassSetLookup(object):
+    """
+    The classifiers (and coefficients) of every `user_defd_class_set_id`
+    compiled once into dense arrays indexed by the class set id.
+
+    Adding these columns to a big output table is then a positional
+    `take` instead of a hash join. Categorical columns are stored as
+    their integer codes so the result shares the same categories.
+    Every array has one extra element at the end, used for the ids that
+    are not found, exactly like a left join would produce NaNs.
+    """
+
+    key = 'user_defd_class_set_id'
+
+    def __init__(self, table):
+        # Check #
+        ids = table[self.key].values.astype(int)
+        if len(numpy.unique(ids)) != len(ids):
+            raise ValueError("The class set table has duplicated '%s'." % self.key)
+        # Position of each id in the arrays, -1 when absent #
+        self.size     = len(ids)
+        self.position = numpy.full(ids.max() + 1 if len(ids) else 1, -1)
+        self.position[ids] = numpy.arange(len(ids))
+        # The columns in the same order as the table #
+        self.columns = [c for c in table.columns if c != self.key]
+        self.arrays  = {}
+        self.dtypes  = {}
+        for col in self.columns:
+            series = table[col]
+            self.dtypes[col] = series.dtype
+            if isinstance(series.dtype, pandas.CategoricalDtype):
+                values = numpy.append(series.cat.codes.values, -1)
+            elif series.dtype.kind in 'iufb':
+                values = numpy.append(series.values.astype(float), numpy.nan)
+            else:
+                values = numpy.append(series.values.astype(object), None)
+            self.arrays[col] = values
+
+    def __repr__(self):
+        return '%s object with %i class sets' % (self.__class__, self.size)
+
+    def positions(self, ids):
+        """Row numbers for the given ids, the last row when missing."""
+        ids   = numpy.asarray(ids)
+        valid = (ids >= 0) & (ids < len(self.position))
+        pos   = numpy.full(len(ids), -1)
+        pos[valid] = self.position[ids[valid].astype(int)]
+        # Missing ids point to the extra element at the end #
+        pos[pos == -1] = self.size
+        return pos
+
+    def enrich(self, df, columns=None):
+        """
+        Return a copy of `df` with the class set columns added on the
+        right, same result as `df.left_join(table, 'user_defd_class_set_id')`.
+        """
+        # Default #
+        if columns is None: columns = self.columns
+        # Positions #
+        pos     = self.positions(df[self.key].values)
+        missing = (pos == self.size).any()
+        # Take #
+        new = {}
+        for col in columns:
+            values = self.arrays[col].take(pos)
+            dtype  = self.dtypes[col]
+            if isinstance(dtype, pandas.CategoricalDtype):
+                new[col] = pandas.Categorical.from_codes(values, dtype=dtype)
+            elif dtype.kind in 'iub' and not missing:
+                new[col] = values.astype(dtype)
+            else:
+                new[col] = values
+        # Return #
+        new = pandas.DataFrame(new, index=df.index)
+        return pandas.concat([df, new], axis=1)
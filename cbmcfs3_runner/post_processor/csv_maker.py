@@ -63,16 +63,22 @@ class CSVMaker(object):
         Export cbm output inventory area by age classes.
         Data used by the land use change models LUISA and FUSION.
         """
-        df = self.parent.inventory.age_indicators
-        df.to_csv(str(self.paths.inventory_age), index=False)
+        parts = self.parent.inventory.age_indicator_parts()
+        self.write_parts(parts, self.paths.inventory_age)
 
     def export_inventory_simulated(self):
         """
         Export cbm output inventory area by age classes.
         Data used by the land use change models LUISA and FUSION.
         """
-        df = self.parent.inventory.simulated
-        df.to_csv(str(self.paths.inventory_simulated), index=False)
+        parts = self.parent.inventory.simulated_parts()
+        self.write_parts(parts, self.paths.inventory_simulated)
+
+    @staticmethod
+    def write_parts(parts, path):
+        """Append data frames one after the other to the same CSV file."""
+        for i, df in enumerate(parts):
+            df.to_csv(str(path), index=False, mode='a' if i else 'w', header=not i)
 
     def export_ipcc_agg(self):
         """
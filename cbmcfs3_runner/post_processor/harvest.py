@@ -14,10 +14,12 @@ Unit D1 Bioeconomy.
 import numpy
 
 # First party modules #
-from plumbing.cache import property_cached
 from autopaths.auto_paths import AutoPaths
 
 # Internal modules #
+from cbmcfs3_runner.core.metrics import property_measured
+from cbmcfs3_runner.core.cache_manager import property_managed
+from cbmcfs3_runner.pump.dataframes import merge_partials
 
 ###############################################################################
 class Harvest(object):
@@ -43,7 +45,84 @@ class Harvest(object):
         self.country = self.parent.parent.country
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    # The finest grain needed by any of the tables below #
+    finest_index = ['dist_type_id',
+                    'dist_type_name',
+                    'time_step',
+                    'status',
+                    'forest_type',
+                    'region',
+                    'management_type',
+                    'management_strategy',
+                    'conifers_broadleaves']
+
+    # Not real grouping variables only here to keep them in the final table #
+    secondary_index = ['density']
+
+    # The flux columns that are summed #
+    flux_cols = ['soft_production', 'hard_production', 'dom_production',
+                 'co2_production', 'merch_litter_input', 'oth_litter_input']
+
+    # The columns derived from the fluxes, all are additive #
+    derived_cols = ['tc', 'prov_carbon', 'vol_merch', 'vol_sub_merch',
+                    'vol_snags', 'vol_forest_residues']
+
+    @property_measured
+    def finest(self):
+        """
+        The flux indicators grouped once at the finest grain that any
+        harvest or product table needs. All the other tables are rollups
+        of this one, so the big flux table is only scanned once.
+        The volumes are computed here, row by row with the density,
+        so that they can simply be summed in coarser groupings.
+        """
+        # The grouping and the columns needed from the flux table #
+        index   = self.finest_index + self.secondary_index
+        columns = ['dist_type_id', 'time_step', 'user_defd_class_set_id'] + self.flux_cols
+        # Group each partition of the flux table #
+        partials = []
+        for ungrouped in self.parent.partitions('tblFluxIndicators', columns):
+            # Add the disturbance names, classifiers and density #
+            ungrouped = ungrouped.left_join(self.parent.disturbance_type, 'dist_type_id')
+            ungrouped = self.parent.class_sets.enrich(ungrouped, self.parent.classifiers_names + ['density'])
+            # Check that we don't produce NaNs #
+            # See ~/repos/examples/python_modules/pandas/join_and_produce_nan.py
+            # Check for NaNs coming from a join tables to avoid using them in an aggregation
+            # index (currently ES, HU have some in the secondary_index) #
+            assert not ungrouped[self.finest_index].isna().any().any()
+            # Then group #
+            grouped = ungrouped.groupby(index, observed=True)[self.flux_cols].sum()
+            # Check conservation of total mass against the ungrouped table #
+            is_equal = numpy.testing.assert_allclose
+            is_equal(ungrouped['soft_production'].sum(), grouped['soft_production'].sum())
+            is_equal(ungrouped['hard_production'].sum(), grouped['hard_production'].sum())
+            partials.append(grouped)
+        # Merge the partitions #
+        df = merge_partials(partials, index, self.flux_cols)
+        # Create new columns #
+        df['tc']                  = df['soft_production'] + df['hard_production']
+        df['prov_carbon']         = df['soft_production'] + df['hard_production'] + df['dom_production']
+        df['vol_merch']           = (df['tc'] * 2)             / df['density']
+        df['vol_sub_merch']       = (df['co2_production'] * 2) / df['density']
+        df['vol_snags']           = (df['dom_production'] * 2) / df['density']
+        df['vol_forest_residues'] = ((df['merch_litter_input'] + df['oth_litter_input']) * 2) / df['density']
+        # Return #
+        return df
+
+    def rollup(self, index, columns=None):
+        """
+        Sum the `finest` table over any coarser set of index columns.
+        By default all flux and derived columns are summed.
+        """
+        if columns is None: columns = self.flux_cols + self.derived_cols
+        return (self.finest
+                .groupby(index, observed=True)
+                [columns]
+                .sum()
+                .reset_index())
+
+    #-------------------------------------------------------------------------#
+    @property_measured
     def check(self):
         """
         Converts flux indicators in tons of carbon to harvested
@@ -58,55 +137,15 @@ class Harvest(object):
 
         Columns are: ['dist_type_id', 'dist_type_name', 'time_step', 'status', 'forest_type',
                       'management_type', 'management_strategy', 'conifers_broadleaves',
-                      'dom_production', 'co2_production', 'merch_litter_input', 'oth_litter_input',
-                      'density', 'soft_production', 'hard_production', 'tc', 'vol_merch',
-                      'vol_sub_merch', 'vol_snags', 'vol_forest_residues']
+                      'density', 'soft_production', 'hard_production', 'dom_production',
+                      'co2_production', 'merch_litter_input', 'oth_litter_input',
+                      'tc', 'prov_carbon', 'vol_merch', 'vol_sub_merch', 'vol_snags',
+                      'vol_forest_residues']
         """
-        # First ungrouped #
-        ungrouped = self.parent.flux_indicators
-        # The index we will use for grouping #
-        index = ['dist_type_id',
-                 'dist_type_name',
-                 'time_step',
-                 'status',
-                 'forest_type',
-                 'management_type',
-                 'management_strategy',
-                 'conifers_broadleaves']
-        # Not real grouping variables only here to keep them in the final table
-        secondary_index = ['density']
-        # Check that we don't produce NaNs #
-        # See ~/repos/examples/python_modules/pandas/join_and_produce_nan.py
-        # Check for NaNs coming from a join tables to avoid using them in an aggregation
-        # index (currently ES, HU have some in the secondary_index) #
-        assert not ungrouped[index].isna().any().any()
-        # Then group #
-        df = (ungrouped
-              .groupby(index + secondary_index, observed=True)
-              .agg({'soft_production':    'sum',
-                    'hard_production':    'sum',
-                    'dom_production' :    'sum',
-                    'co2_production' :    'sum',
-                    'merch_litter_input': 'sum',
-                    'oth_litter_input':   'sum'
-                    })
-              .reset_index())
-        # Check conservation of total mass #
-        flux_raw = self.parent.database['tblFluxIndicators']
-        is_equal = numpy.testing.assert_allclose
-        is_equal(flux_raw['soft_production'].sum(), df['soft_production'].sum())
-        is_equal(flux_raw['hard_production'].sum(), df['hard_production'].sum())
-        # Create new columns #
-        df['tc']                  = df['soft_production'] + df['hard_production']
-        df['prov_carbon']         = df['soft_production'] + df['hard_production'] + df['dom_production']
-        df['vol_merch']           = (df['tc'] * 2)             / df['density']
-        df['vol_sub_merch']       = (df['co2_production'] * 2) / df['density']
-        df['vol_snags']           = (df['dom_production'] * 2) / df['density']
-        df['vol_forest_residues'] = ((df['merch_litter_input'] + df['oth_litter_input']) * 2) / df['density']
-        # Return #
-        return df
+        index = [c for c in self.finest_index if c != 'region']
+        return self.rollup(index + self.secondary_index)
 
-    @property_cached
+    @property_managed
     def prop_sub_merch_snags(self):
         """
         Proportion of sub merchantable and snags compared to merchantable.
@@ -115,18 +154,11 @@ class Harvest(object):
         and generally refers to branches. It is represented by the CO2
         pool in the CBM output (hackish).
         """
-        # Load #
-        df = self.check.copy()
         # Aggregate on classifier and dist_type_name only
         # i.e. aggregate over the time step
         index = self.classifiers_silv.copy()
         index += ['dist_type_name']
-        df = (df
-              .groupby(index, observed=True)
-              .agg({'vol_merch':     'sum',
-                    'vol_sub_merch': 'sum',
-                    'vol_snags':     'sum'})
-              .reset_index())
+        df = self.rollup(index, ['vol_merch', 'vol_sub_merch', 'vol_snags'])
         # New columns #
         df['prop_sub_merch'] = df['vol_sub_merch'] / df['vol_merch']
         df['prop_snags']     = df['vol_snags']     / df['vol_merch']
@@ -134,7 +166,7 @@ class Harvest(object):
         return df
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_measured
     def provided_volume(self):
         """
         Based on Roberto's query `Harvest summary check` visible in the original calibration database.
@@ -147,22 +179,16 @@ class Harvest(object):
         only volumes ('M').
         """
         # Compute #
-        df = (self.check
-              .set_index('dist_type_id')
-              .groupby(['dist_type_id',
-                        'dist_type_name',
-                        'time_step',
-                        'status',
-                        'forest_type',
-                        'management_type',
-                        'management_strategy'], observed=True)
-              .agg({'vol_merch':           'sum',
-                    'vol_snags':           'sum',
-                    'vol_sub_merch':       'sum',
-                    'vol_forest_residues': 'sum',
-                    'prov_carbon':         'sum',
-                    'tc':                  'sum'})
-              .reset_index())
+        index = ['dist_type_id',
+                 'dist_type_name',
+                 'time_step',
+                 'status',
+                 'forest_type',
+                 'management_type',
+                 'management_strategy']
+        columns = ['vol_merch', 'vol_snags', 'vol_sub_merch',
+                   'vol_forest_residues', 'prov_carbon', 'tc']
+        df = self.rollup(index, columns)
         # Add the total volume column #
         df['tot_vol'] = df['vol_merch'] + df['vol_sub_merch'] + df['vol_snags']
         # Add the measurement type (used only as a filter later for joining) #
@@ -171,7 +197,7 @@ class Harvest(object):
         return df
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_measured
     def provided_area(self):
         """
         Load area disturbed from the table 'TblDistIndicators'
@@ -184,16 +210,16 @@ class Harvest(object):
         only areas ('A').
         """
         # Load #
-        dist_indicators  = self.parent.database['TblDistIndicators']
-        disturbance_type = self.parent.database['tblDisturbanceType']
+        columns = ['dist_type_id', 'time_step', 'user_defd_class_set_id',
+                   'dist_area', 'dist_product']
+        dist_indicators  = self.parent.read('TblDistIndicators', columns)
+        disturbance_type = self.parent.disturbance_type
         # First ungrouped #
         ungrouped = (dist_indicators
                      .set_index('dist_type_id')
                      .join(disturbance_type.set_index('dist_type_id'))
-                     .reset_index()
-                     .set_index('user_defd_class_set_id')
-                     .join(self.parent.classifiers.set_index('user_defd_class_set_id'))
                      .reset_index())
+        ungrouped = self.parent.class_sets.enrich(ungrouped, self.parent.classifiers_names)
         # The index we will use for grouping #
         index = ['dist_type_id',
                  'dist_type_name',
@@ -288,7 +314,7 @@ class Harvest(object):
         return df
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_managed
     def exp_prov_by_volume(self):
         """
         "Measurement_type == 'M'"
@@ -302,7 +328,7 @@ class Harvest(object):
         return self.compute_expected_provided(df, 'M', 'prov_carbon')
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_managed
     def exp_prov_by_area(self):
         """
         Same as above but for "Measurement_type == 'A'"
@@ -327,10 +353,11 @@ class Harvest(object):
         numpy.testing.assert_allclose(processed, raw, rtol=1e-03)
         # Check provided area #
         processed = area['provided'].sum()
-        raw       = self.parent.database['TblDistIndicators']['dist_area'].sum()
+        raw       = self.parent.read('TblDistIndicators', ['dist_area'])['dist_area'].sum()
         numpy.testing.assert_allclose(processed, raw, rtol=1e-03)
         # Check provided volume #
         processed = volu['provided'].sum()
-        raw       = self.parent.database['TblFluxIndicators']
+        columns   = ['soft_production', 'hard_production', 'dom_production']
+        raw       = self.parent.read('TblFluxIndicators', columns)
         raw       = raw['soft_production'].sum() + raw['hard_production'].sum() + raw['dom_production'].sum()
         numpy.testing.assert_allclose(processed, raw, rtol=1e-03)
\ No newline at end of file
@@ -11,10 +11,12 @@ Unit D1 Bioeconomy.
 # Built-in modules #
 
 # Third party modules #
-import pandas, numpy
+import numpy, pandas
 
 # Internal modules #
-from .bin_discretizer import aggregator, binner
+from cbmcfs3_runner.core.metrics import property_measured
+from cbmcfs3_runner.core.cache_manager import property_managed
+from cbmcfs3_runner.post_processor.age_store import AgeStore
 
 # First party modules #
 from plumbing.cache import property_cached
@@ -39,7 +41,7 @@ class Inventory(object):
         self.country = self.parent.parent.country
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_measured
     def age_indicators(self):
         """
         CBM output table containing the forest area by age class.
@@ -57,20 +59,25 @@ class Inventory(object):
              'area', 'biomass', 'dom', 'ave_age', 'forest_type', 'status', 'region',
              'management_type', 'management_strategy', 'climatic_unit',
              'conifers_broadleaves', 'id', 'density', 'harvest_gr']
+
+        This is the whole table in memory, the pipeline uses
+        `age_indicator_parts` instead.
         """
-        # Load table #
-        age_indicators = self.parent.database["tblAgeIndicators"]
-        classifr_coefs = self.parent.classifiers_coefs
-        # Join
-        df = (age_indicators
-              .left_join(classifr_coefs, on='user_defd_class_set_id')
-              )
-        # Place classifiers first
-        df = df.set_index(self.parent.classifiers_names).reset_index()
-        return df
+        return pandas.concat(list(self.age_indicator_parts()), ignore_index=True)
+
+    def age_indicator_parts(self):
+        """
+        Same as `age_indicators` but one partition of time steps at a
+        time, see `PostProcessor.chunk_steps`.
+        """
+        for df in self.parent.partitions('tblAgeIndicators'):
+            # Add classifiers and coefficients #
+            df = self.parent.class_sets.enrich(df)
+            # Place classifiers first
+            yield df.set_index(self.parent.classifiers_names).reset_index()
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_managed
     def bef_ft(self):
         """
         Stands for "Biomass Expansion Factor, by Forest Type", we think.
@@ -81,21 +88,15 @@ class Inventory(object):
         TODO: replace sums by a reshape in long format and the use of
         grouping variables.
         """
-        # Join #
-        df = self.parent.pool_indicators
         # Sum for everyone #
-        cols_sum = {'sw_merch'  : 'sum',
-                    'sw_foliage': 'sum',
-                    'sw_other'  : 'sum',
-                    'hw_merch'  : 'sum',
-                    'hw_foliage': 'sum',
-                    'hw_other'  : 'sum',
-                    'sw_coarse' : 'sum',
-                    'sw_fine'   : 'sum',
-                    'hw_coarse' : 'sum',
-                    'hw_fine'   : 'sum'}
-        # Group and aggregate #
-        df = df.groupby("forest_type").agg(cols_sum).reset_index()
+        pools = ['sw_merch', 'sw_foliage', 'sw_other',
+                 'hw_merch', 'hw_foliage', 'hw_other',
+                 'sw_coarse', 'sw_fine', 'hw_coarse', 'hw_fine']
+        # Add the forest type and aggregate, by partitions #
+        index = ['forest_type']
+        df = self.parent.aggregate('tblPoolIndicators', index, pools,
+                                   columns = ['time_step', 'user_defd_class_set_id'] + pools,
+                                   prepare = lambda d: self.parent.class_sets.enrich(d, index))
         # Make new columns #
         df['tot_merch']  = df.sw_merch   + df.hw_merch
         df['tot_abg']    = df.sw_merch   + df.hw_merch   + \
@@ -110,7 +111,7 @@ class Inventory(object):
         return df
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_managed
     def simulated(self):
         """
         Update the inventory based on the simulation output contained in
@@ -122,9 +123,21 @@ class Inventory(object):
              'management_strategy', 'climatic_unit', 'conifers_broadleaves', 'ave_age',
              'time_step', 'area', 'biomass', 'bef_tot', 'db', 'merch_c_ha',
              'Merch_Vol_ha']
+
+        This is the whole table in memory, the pipeline uses
+        `simulated_parts` instead.
         """
+        return pandas.concat(list(self.simulated_parts()), ignore_index=True)
+
+    def simulated_parts(self):
+        """Same as `simulated` but one partition of time steps at a time."""
+        bef_ft = self.bef_ft
+        for df in self.age_indicator_parts(): yield self.simulate(df, bef_ft)
+
+    def simulate(self, df, bef_ft):
+        """Make the simulated inventory from part of the age indicators."""
         # Join #
-        df = self.age_indicators.left_join(self.bef_ft, on='forest_type')
+        df = df.left_join(bef_ft, on='forest_type')
         # Select only some columns #
         columns_of_interest  = ['ave_age', 'time_step', 'area', 'biomass', 'bef_tot', 'density']
         columns_of_interest += list(self.parent.classifiers.columns)
@@ -146,6 +159,11 @@ class Inventory(object):
     # The bin width we will use when recreating bins #
     bin_width = 20.0
 
+    @property_cached
+    def age_store(self):
+        """The area by age in cells of 0.1 years, saved to disk once."""
+        return AgeStore(self)
+
     @property
     def grouped_vectors(self):
         """
@@ -167,24 +185,10 @@ class Inventory(object):
             9           1          OC  [1.0, 0.0, 0.3, 0.0, 0.0, ...
             ...         ...        ... ...
         """
-        # Group #
-        grouped = self.simulated.groupby(self.group_cols)
-        # Iterate #
-        result = []
-        for col_values, df in grouped:
-            # Keep the current values of the group columns #
-            current = dict(zip(self.group_cols, col_values))
-            # Compute a discrete numpy vector #
-            current[self.sum_col] = aggregator(df, self.sum_col, self.bin_col)
-            # Make a series and append #
-            result.append(pandas.Series(current))
-        # Put all series into a data frame #
-        result = pandas.DataFrame(result)
-        # Return #
-        return result
+        return self.age_store.vectors
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_measured
     def grouped_bins(self):
         """Using the vectorized version, recreate bins and average values.
 
@@ -201,44 +205,37 @@ class Inventory(object):
                          FS                40.0     60.0   979.168979
                 ...     ...                 ...      ...          ...
         """
-        # Load the vector version #
-        df = self.grouped_vectors
-        # Empty data frame to contain result #
-        result  = pandas.DataFrame()
-        # Iterate #
-        for i, row in df.iterrows():
-            # Compute a data frame containing the recreated bins #
-            current = binner(row[self.sum_col], self.sum_col, self.bin_width)
-            # Keep the current values of the group columns as an index #
-            col_values = [row[col] for col in self.group_cols]
-            current = current.assign(**dict(zip(self.group_cols, col_values)))
-            current = current.set_index(self.group_cols)
-            # Append #
-            result = result.append(current)
-        # Return #
-        return result
+        return self.age_store.rebin(self.bin_width)
 
     #-------------------------------------------------------------------------#
     def check_conservation(self):
         """Assert that total area of forest is conserved after
         successive steps of discretization and rebinning."""
         # Compute #
-        df1 = self.simulated
-        df2 = self.grouped_bins
+        parts = self.parent.partitions('tblAgeIndicators', ['time_step', self.sum_col])
+        total = sum(df[self.sum_col].sum() for df in parts)
+        df2   = self.grouped_bins
         all_close = numpy.testing.assert_allclose
         # Check #
-        all_close(df1[self.sum_col].sum(), df2[self.sum_col].sum())
+        all_close(total, df2[self.sum_col].sum())
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_managed
     def bins_per_year(self):
         """Same as grouped_bins but with the TimeStep swtiched to years.
         The four important class attributes are:
             * group_cols, sum_col, bin_col, bin_width
         Adapting these variables will modify the behavior of this final data frame.
         """
-        # Load the vector version #
-        df = self.grouped_bins.reset_index()
+        return self.rebinned()
+
+    def rebinned(self, bin_width=None, age_min=0.0, age_max=None):
+        """
+        Same as `bins_per_year` but with any bin width and age range,
+        taken from the age store without discretizing again.
+        """
+        # Load the binned version #
+        df = self.age_store.rebin(bin_width, age_min, age_max).reset_index()
         # Add year and remove TimeStep #
         df['year'] = self.country.timestep_to_year(df['time_step'])
         df = df.drop('time_step', axis=1)
@@ -251,7 +248,7 @@ class Inventory(object):
         return df
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_measured
     def sum_merch_stock(self):
         """
         Total biomass *stock* in tons of carbon directly from the
@@ -264,19 +261,14 @@ class Inventory(object):
 
         Columns are: ['year', 'forest_type', 'conifers_broadleaves', 'mass']
         """
-        # Load data #
-        df    = self.parent.database['tblPoolIndicators']
-        clifr = self.parent.classifiers.set_index("user_defd_class_set_id")
         # Our index #
         index = ['time_step', 'forest_type', 'conifers_broadleaves']
-        # Join #
-        df = (df
-              .set_index('user_defd_class_set_id')
-              .join(clifr)
-              .groupby(index)
-              .agg({'hw_merch': 'sum',
-                    'sw_merch': 'sum'})
-              .reset_index())
+        pools = ['hw_merch', 'sw_merch']
+        # Add the two classifiers we need and sum, by partitions #
+        df = self.parent.aggregate('tblPoolIndicators', index, pools,
+                                   columns = ['time_step', 'user_defd_class_set_id'] + pools,
+                                   prepare = lambda d: self.parent.class_sets.enrich(d, index[1:]),
+                                   last    = self.parent.last_time_step)
         # Add year and remove TimeStep #
         df['year'] = self.country.timestep_to_year(df['time_step'])
         df = df.drop('time_step', axis=1)
@@ -299,25 +291,16 @@ class Inventory(object):
         return df
     
 # addedd 18/05/2021   
-    @property_cached
+    @property_measured
     def sum_agb_stock(self):
-        # Load data #
-        df    = self.parent.database['tblPoolIndicators']
-        clifr = self.parent.classifiers.set_index("user_defd_class_set_id")
         # Our index #
         index = ['time_step', 'forest_type', 'conifers_broadleaves']
-        # Join #
-        df = (df
-              .set_index('user_defd_class_set_id')
-              .join(clifr)
-              .groupby(index)
-              .agg({'hw_merch': 'sum',
-                    'sw_merch': 'sum',
-                    'hw_other': 'sum',
-                    'sw_other': 'sum',
-                    'hw_foliage': 'sum',
-                    'sw_foliage': 'sum'})
-              .reset_index())
+        pools = ['hw_merch', 'sw_merch', 'hw_other', 'sw_other', 'hw_foliage', 'sw_foliage']
+        # Add the two classifiers we need and sum, by partitions #
+        df = self.parent.aggregate('tblPoolIndicators', index, pools,
+                                   columns = ['time_step', 'user_defd_class_set_id'] + pools,
+                                   prepare = lambda d: self.parent.class_sets.enrich(d, index[1:]),
+                                   last    = self.parent.last_time_step)
         # Add year and remove TimeStep #
         df['year'] = self.country.timestep_to_year(df['time_step'])
         df = df.drop('time_step', axis=1)
@@ -17,10 +17,12 @@ import pandas
 from plumbing.cache import property_cached
 
 # Internal modules #
+from cbmcfs3_runner.core.metrics import property_measured
+from cbmcfs3_runner.core.cache_manager import property_managed
 from cbmcfs3_runner import module_dir
 
 # Internal modules
-from cbmcfs3_runner.pump.dataframes import multi_index_pivot
+from cbmcfs3_runner.pump.dataframes import multi_index_pivot, merge_partials
 
 ###############################################################################
 class Ipcc(object):
@@ -74,46 +76,56 @@ class Ipcc(object):
         # Return #
         return df
 
-    @property_cached
+    @property_measured
     def pool_indicators_long(self):
         """
         Aggregate the pool indicators table along the 5 IPCC pools
         Keep the details of each stand separate
         i.e. each possible combination of classifiers remains in the data.
+
+        The pool table is melted and aggregated one partition of time
+        steps at a time, see `PostProcessor.chunk_steps`.
         """
         classifiers_names = self.parent.classifiers_names
-        # Load pools #
-        df = self.parent.pool_indicators_long
-        # Load output inventory area #
-        columns_of_interest = classifiers_names + ['time_step', 'area']
-        inv = self.parent.inventory.age_indicators[columns_of_interest]
-        # Add the 5 IPCC pools to the table #
-        df = df.left_join(self.ipcc_pool_mapping, on=['pool'])
-        # Explicitly name NA values before grouping #
-        df['ipcc_pool'] = df['ipcc_pool'].fillna('not_available')
         # Aggregate total carbon weight along the 5 IPCC pools #
-        # Change ipcc_pool column to a factor variable
-        df['ipcc_pool'] = df['ipcc_pool'].astype('category')
-        index = classifiers_names + ['ipcc_pool', 'time_step', 'year']
-        # Group by and aggregate #
-        df = (df
-              .groupby(index, observed=True)
-              .agg({'tc':sum})
-              .reset_index()
-              )
+        index = classifiers_names + ['ipcc_pool', 'time_step']
+        partials = [self.ipcc_partial(df, index)
+                    for df in self.parent.partitions('tblPoolIndicators')]
+        df = merge_partials(partials, index, ['tc'])
+        # Add year #
+        df.insert(len(index), 'year', self.country.timestep_to_year(df['time_step']))
         # Aggregate the inventory
         # i.e. sum the area for all ages
         index = classifiers_names + ['time_step']
-        inv_agg = (inv
-                   .groupby(index, observed=True)
-                   .agg({'area':sum})
-                   .reset_index())
+        columns = ['time_step', 'user_defd_class_set_id', 'area']
+        enrich  = lambda d: self.parent.class_sets.enrich(d, classifiers_names)
+        inv_agg = self.parent.aggregate('tblAgeIndicators', index, ['area'],
+                                        columns = columns,
+                                        prepare = enrich)
         # Add the area column to the pool table
         df = df.left_join(inv_agg, on=index)
         # Return #
         return df
 
-    @property_cached
+    def ipcc_partial(self, pool, index):
+        """Melt one partition of the pool table and sum it by IPCC pool."""
+        classifiers_names = self.parent.classifiers_names
+        # Add classifiers #
+        df = self.parent.class_sets.enrich(pool, classifiers_names)
+        df = df.drop(columns='user_defd_class_set_id')
+        # Pivot to a long format #
+        additional_ids = ['spuid', 'land_class_id', 'pool_ind_id']
+        df = df.melt(id_vars    = classifiers_names + additional_ids + ['time_step'],
+                     var_name   = 'pool',
+                     value_name = 'tc')
+        # Add the 5 IPCC pools to the table #
+        df = df.left_join(self.ipcc_pool_mapping, on=['pool'])
+        # Explicitly name NA values before grouping #
+        df['ipcc_pool'] = df['ipcc_pool'].fillna('not_available')
+        # Group by and aggregate #
+        return df.groupby(index, observed=True)[['tc']].sum()
+
+    @property_managed
     def carbon_stock_long(self):
         """
         Aggregate the pool indicators table over the whole country
@@ -162,7 +174,7 @@ class Ipcc(object):
         # Return #
         return df
 
-    @property_cached
+    @property_managed
     def net_co2_emissions_removals(self):
         """Net CO2 emissions/removals over the whole country."""
         df = self.carbon_stock_change
@@ -175,7 +187,7 @@ class Ipcc(object):
         # Return #
         return df
 
-    @property_cached
+    @property_managed
     def pool_indicators(self):
         """
         Pivot the pool indicators table to a wider format with
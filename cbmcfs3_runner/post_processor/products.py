@@ -11,14 +11,15 @@ Unit D1 Bioeconomy.
 # Built-in modules #
 
 # Third party modules #
-import numpy
-import re
+import pandas
 
 # First party modules #
 from plumbing.cache import property_cached
 from autopaths.auto_paths import AutoPaths
 
 # Internal modules #
+from cbmcfs3_runner.core.metrics import property_measured
+from cbmcfs3_runner.core.cache_manager import property_managed
 
 ###############################################################################
 class Products(object):
@@ -43,10 +44,10 @@ class Products(object):
         return self.parent.parent.country.silviculture.treatments
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_measured
     def hwp_intermediate(self):
         """
-        Intermediate table based on `post_processor.harvest.check`.
+        Intermediate table based on `post_processor.harvest.finest`.
         Joins disturbance id from the silviculture table.
         to allocate specific disturbances to specific wood products.
         TODO: make this work for historical disturbances as well.
@@ -63,11 +64,11 @@ class Products(object):
         # Take only a few columns #
         silv = self.silviculture[join_index + ['hwp']]
         silv = silv.set_index(join_index)
+        # Only the grain we need, before joining #
+        columns = ['vol_merch', 'vol_sub_merch', 'vol_snags', 'tc']
+        df = self.parent.harvest.rollup(join_index + ['time_step'], columns)
         # Join #
-        df = (self.parent.harvest.check
-              .reset_index()
-              .set_index(join_index)
-              .join(silv))
+        df = df.set_index(join_index).join(silv)
         # 'hwp' rows with NaNs will be thrown away by the aggregation below
         # Otherwise to prevent any rows to be NA,
         # i.e. to force all rows to have a value,
@@ -83,127 +84,154 @@ class Products(object):
         return df
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_managed
+    def wide(self):
+        """
+        One row per time step and one column per volume component and
+        HWP category, named like 'vol_sub_merch_irw_b'.
+        Missing combinations are filled with zero.
+        """
+        return pivot_components(self.hwp_intermediate, ['time_step'])
+
+    def category(self, hwp):
+        """The columns of one HWP category only, with the time step."""
+        cols = [c for c in self.wide.columns if c.endswith('_' + hwp)]
+        return self.wide[['time_step'] + cols]
+
+    @property_managed
     def irw_b(self):
         """Harvest volumes of Industrial Round Wood Broadleaves."""
-        df = (self.hwp_intermediate
-              .query('hwp == "irw_b"')
-              .rename(columns={'vol_merch':     'vol_merch_irw_b',
-                               'vol_sub_merch': 'vol_sub_merch_irw_b',
-                               'vol_snags':     'vol_snags_irw_b',
-                               'tc':            'tc_irw_b'}))
-        # Drop HWP column
-        # because it doesn't make sense anymore below when we join different products together
-        df = df.drop('hwp', axis = 1)
-        # Return #
-        return df
+        return self.category('irw_b')
 
-    #-------------------------------------------------------------------------#
-    @property_cached
+    @property_managed
     def irw_c(self):
         """Harvest volumes of Industrial Round Wood Coniferous."""
-        df = (self.hwp_intermediate
-              .query('hwp == "irw_c"')
-              .rename(columns={'vol_merch':     'vol_merch_irw_c',
-                               'vol_sub_merch': 'vol_sub_merch_irw_c',
-                               'vol_snags':     'vol_snags_irw_c',
-                               'tc':            'tc_irw_c'}))
-        df = df.drop('hwp', axis = 1)
-        # Return #
-        return df
+        return self.category('irw_c')
 
-    #-------------------------------------------------------------------------#
-    @property_cached
+    @property_managed
     def fw_b(self):
         """Harvest volumes of Fuel Wood Broadleaves."""
-        df = (self.hwp_intermediate
-              .query('hwp == "fw_b"')
-              .rename(columns={'vol_merch':     'vol_merch_fw_b',
-                               'vol_sub_merch': 'vol_sub_merch_fw_b',
-                               'vol_snags':     'vol_snags_fw_b',
-                               'tc':            'tc_fw_b'}))
-        # Return #
-        return df
-
-    #-------------------------------------------------------------------------#
-    @property_cached
-    def fw_b_total(self):
-        """
-        Harvest volumes of Fuel Wood Broadleaves
-        Join Industrial Round Wood co-products: 'vol_sub_merch_irw_b' and 'vol_snags_irw_b'
-        into the fuel wood total.
-        """
-        df = self.irw_b.outer_join(self.fw_b, 'time_step')
-        df['tot_vol_fw_b'] = sum([df['vol_merch_fw_b'],
-                                  df['vol_sub_merch_fw_b'],
-                                  df['vol_snags_fw_b'],
-                                  df['vol_sub_merch_irw_b'],
-                                  df['vol_snags_irw_b']])
-        df = df[['time_step',
-                 'vol_merch_fw_b', 'vol_sub_merch_fw_b', 'vol_snags_fw_b',
-                 'vol_sub_merch_irw_b', 'vol_snags_irw_b',
-                 'tot_vol_fw_b']]
-        # Return #
-        return df
+        return self.category('fw_b')
 
-    #-------------------------------------------------------------------------#
-    @property_cached
+    @property_managed
     def fw_c(self):
         """Harvest volumes of Fuel Wood Coniferous."""
-        df = (self.hwp_intermediate
-              .query('hwp == "fw_c"')
-              .rename(columns={'vol_merch':     'vol_merch_fw_c',
-                               'vol_sub_merch': 'vol_sub_merch_fw_c',
-                               'vol_snags':     'vol_snags_fw_c',
-                               'tc':            'tc_fw_c'}))
-        # Return #
-        return df
+        return self.category('fw_c')
 
     #-------------------------------------------------------------------------#
-    @property_cached
-    def fw_c_total(self):
+    def fw_total(self, suffix):
         """
-        Harvest volumes of Fuel Wood Coniferous
-        Join Industrial Round Wood co-products.
+        Harvest volumes of Fuel Wood including the Industrial Round Wood
+        co-products 'vol_sub_merch_irw_x' and 'vol_snags_irw_x'.
         """
-        df = self.irw_c.outer_join(self.fw_c, 'time_step')
-        df['tot_vol_fw_c'] = numpy.where(df['vol_merch_fw_c'] >= 0,
-                                         sum([df['vol_merch_fw_c'],
-                                              df['vol_sub_merch_fw_c'],
-                                              df['vol_snags_fw_c'],
-                                              df['vol_sub_merch_irw_c'],
-                                              df['vol_snags_irw_c']]),
-                                         sum([df['vol_sub_merch_irw_c'],
-                                              df['vol_snags_irw_c']]))
-        # Select columns of interest #
-        df = df[['time_step',
-                 'vol_merch_fw_c','vol_sub_merch_fw_c','vol_snags_fw_c',
-                 'vol_sub_merch_irw_c','vol_snags_irw_c',
-                 'tot_vol_fw_c']]
-        # Return #
-        return df
+        df  = add_totals(self.wide)
+        fw  = 'fw_' + suffix
+        irw = 'irw_' + suffix
+        cols = ['vol_merch_' + fw, 'vol_sub_merch_' + fw, 'vol_snags_' + fw,
+                'vol_sub_merch_' + irw, 'vol_snags_' + irw, 'tot_vol_' + fw]
+        return df[['time_step'] + cols]
+
+    @property_managed
+    def fw_b_total(self):
+        """Harvest volumes of Fuel Wood Broadleaves with co-products."""
+        return self.fw_total('b')
+
+    @property_managed
+    def fw_c_total(self):
+        """Harvest volumes of Fuel Wood Coniferous with co-products."""
+        return self.fw_total('c')
 
     #-------------------------------------------------------------------------#
-    @property_cached
+    @property_managed
     def hwp(self):
         """
         Volumes of Harvested Wood Products (HWP, in cubic meters
         Matching the product description available in the economic model
         and in the FAOSTAT historical data.
 
-        Join "vol_merch" columns from "irw_b" and "irw_c"
-        to the total columns from "fw_b_total" and "fw_c_total",
-        using the time step as an index.
+        One column per HWP category. Fuel wood includes the co-products of
+        the industrial round wood of the same type, see `hwp_table`.
         """
-        df = (self.irw_c
-              .set_index('time_step')[['vol_merch_irw_c']]
-              .join(self.irw_b.set_index('time_step')[['vol_merch_irw_b']])
-              .join(self.fw_c_total.set_index('time_step')[['tot_vol_fw_c']])
-              .join(self.fw_b_total.set_index('time_step')[['tot_vol_fw_b']])
-              .reset_index())
+        df = hwp_table(self.hwp_intermediate, ['time_step'])
         # Add year #
         df['year'] = self.parent.parent.country.timestep_to_year(df['time_step'])
-        # Rename columns to standard IRW and FW product names
-        df = df.rename(columns=lambda x: re.sub(r'vol_merch_|tot_vol_',r'', x))
         # Return #
-        return df
\ No newline at end of file
+        return df
+
+###############################################################################
+# The components of volume that are summed for each category #
+components = ['vol_merch', 'vol_sub_merch', 'vol_snags', 'tc']
+
+# Sub-merchantable and snags of the first go to the second with the same suffix #
+co_products = {'irw': 'fw'}
+
+def pivot_components(df, index):
+    """
+    Pivot the long table of volumes per HWP category to a wide table.
+    Works for any set of categories and any index, such as
+    ['time_step'] for one runner or ['country', 'time_step'] for many.
+    """
+    df = df.pivot_table(index   = index,
+                        columns = 'hwp',
+                        values  = components,
+                        aggfunc = 'sum',
+                        fill_value = 0.0)
+    df.columns = [comp + '_' + hwp for comp, hwp in df.columns]
+    return df.reset_index()
+
+def add_totals(wide):
+    """
+    Add a 'tot_vol_x' column for every category that receives co-products,
+    that is its own three volume components plus the sub-merchantable and
+    snags of the category that produces them.
+    """
+    wide = wide.copy()
+    hwps = [c[len('vol_merch_'):] for c in wide.columns if c.startswith('vol_merch_')]
+    for source, sink in co_products.items():
+        for hwp in hwps:
+            if not hwp.startswith(sink + '_'): continue
+            src = source + hwp[len(sink):]
+            for col in ('vol_merch_', 'vol_sub_merch_', 'vol_snags_'):
+                for h in (hwp, src):
+                    if col + h not in wide: wide[col + h] = 0.0
+            wide['tot_vol_' + hwp] = (wide['vol_merch_'     + hwp] +
+                                      wide['vol_sub_merch_' + hwp] +
+                                      wide['vol_snags_'     + hwp] +
+                                      wide['vol_sub_merch_' + src] +
+                                      wide['vol_snags_'     + src])
+    return wide
+
+def hwp_table(intermediate, index):
+    """
+    The final HWP table with one column per category: the merchantable
+    volume for categories that produce co-products, and the total volume
+    for categories that receive them (or merchantable only for others).
+    """
+    wide = add_totals(pivot_components(intermediate, index))
+    hwps = sorted(c[len('vol_merch_'):] for c in wide.columns if c.startswith('vol_merch_'))
+    result = wide[index].copy()
+    for hwp in hwps:
+        total = 'tot_vol_' + hwp
+        result[hwp] = wide[total] if total in wide else wide['vol_merch_' + hwp]
+    return result
+
+def hwp_many(runners):
+    """
+    The HWP table of many runners in one pass, with a 'country' column.
+    The intermediate tables are stacked and pivoted only once.
+    """
+    # Stack #
+    frames = []
+    for runner in runners:
+        df = runner.post_processor.products.hwp_intermediate.copy()
+        df.insert(0, 'country', runner.country.iso2_code)
+        frames.append(df)
+    stacked = pandas.concat(frames, ignore_index=True)
+    # Compute #
+    df = hwp_table(stacked, ['country', 'time_step'])
+    # Add year, each country has its own start year #
+    countries  = {r.country.iso2_code: r.country for r in runners}
+    df['year'] = pandas.concat([countries[code].timestep_to_year(group['time_step'])
+                                for code, group in df.groupby('country')])
+    # Return #
+    return df
@@ -9,8 +9,10 @@ Unit D1 Bioeconomy.
 """
 
 # Built-in modules #
+import re
 
 # Third party modules #
+import pandas
 
 # First party modules #
 from autopaths.auto_paths import AutoPaths
@@ -19,6 +21,9 @@ from plumbing.cache       import property_cached
 # Internal modules #
 from cbmcfs3_runner.pre_processor.dist_filter import DisturbanceFilter
 from cbmcfs3_runner.pre_processor.dist_maker  import DisturbanceMaker
+from cbmcfs3_runner.pre_processor.compaction  import compact_events, compact_inventory
+from cbmcfs3_runner.stdrd_import_tool.create_xls import CreateXLS, sheet_copy_path
+from cbmcfs3_runner.pump.schemas import schemas
 
 ###############################################################################
 class PreProcessor(object):
@@ -35,12 +40,23 @@ class PreProcessor(object):
     /input/csv/transition_rules.csv
     /input/csv/yields.csv
     /input/csv/historical_yields.csv
+    /input/xls/default_tables.xls
     """
 
     # Default case #
     unchanged = ['ageclass', 'inventory', 'classifiers', 'types',
                  'yields', 'historical_yields']
 
+    # Merge the disturbance events that only differ by their amount #
+    # Scenarios can switch this on, it changes the files given to SIT #
+    compact_events = False
+
+    # Merge the inventory records that only differ by their area #
+    compact_inventory = False
+
+    # Multiply the volumes of both yield tables by this ratio #
+    yield_multiplier = 1.0
+
     def __init__(self, parent):
         # Default attributes #
         self.parent  = parent
@@ -55,9 +71,17 @@ class PreProcessor(object):
         # Some files don't change so take them straight from orig_data #
         for file in self.unchanged:
             self.parent.country.orig_data.paths[file].copy(self.paths[file])
+        # Optionally change the growth #
+        if self.yield_multiplier != 1.0:
+            for file in ('yields', 'historical_yields'): self.scale_yields(self.paths[file])
+        # Optionally rewrite the inventory with fewer records #
+        if self.compact_inventory:
+            inventory = self.compacted_inventory()
+            inventory.to_csv(str(self.paths.inventory), index=False)
         # Other files are special and need changing #
         # Generate disturbances (dynamic function) and write those #
         dist = self.disturbance_events()
+        if self.compact_events: dist = self.compacted_events(dist)
         dist.to_csv(str(self.paths.events), index=False)
         # Rename columns of the transition rules 
         # To prevent a SIT error on import 
@@ -65,6 +89,50 @@ class PreProcessor(object):
         #    A column named '_1' already belongs to this DataTable.
         transition = self.parent.country.orig_data.transition_rules
         transition.to_csv(str(self.paths.transition), index=False)
+        # Fast copies of the sheets, for the runs that use libcbm too #
+        self.save_sheet_copies()
+
+    def save_sheet_copies(self):
+        """
+        Save every table of the first excel file as parquet, see
+        `sheet_copy_path`. Columns that mix numbers and strings can't be
+        stored that way, in which case there is no copy of that sheet.
+        """
+        sheets = {v: k for k, v in CreateXLS.file_name_to_sheet_name.items()}
+        sheets['Growth'] = self.parent.default_sit.yield_table_name.replace('.csv', '')
+        self.paths.xls_dir.create_if_not_exists()
+        for sheet_name, file_name in sheets.items():
+            df   = pandas.read_csv(str(self.paths[file_name]))
+            path = sheet_copy_path(self.paths.default_tables, sheet_name)
+            try:
+                df.to_parquet(str(path), index=False)
+            except (TypeError, ValueError):
+                path.remove()
+
+    def compacted_events(self, dist):
+        """Fewer events make both SIT and CBM faster."""
+        result = compact_events(dist)
+        msg = "Compacted %i disturbance events into %i."
+        self.parent.log.info(msg % (len(dist), len(result)))
+        return result
+
+    def scale_yields(self, path):
+        """Multiply the volume columns 'vol0', 'vol1', etc. of a yield table."""
+        df   = pandas.read_csv(str(path))
+        cols = [c for c in df.columns if re.match(r'(?i)^vol\d+$', c)]
+        df[cols] = df[cols] * self.yield_multiplier
+        df.to_csv(str(path), index=False)
+
+    def compacted_inventory(self):
+        """
+        Fewer inventory records make fewer stands for CBM. Starts from the
+        inventory already copied to the runner, in case it was changed.
+        """
+        df     = schemas['inventory'].read(self.paths.inventory)
+        result = compact_inventory(df)
+        msg = "Compacted %i inventory records into %i (ratio %.2f)."
+        self.parent.log.info(msg % (len(df), len(result), len(result) / len(df)))
+        return result
 
     #--------------------------- Different events ----------------------------#
     def events_hist(self):
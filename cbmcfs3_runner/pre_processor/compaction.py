@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+"""
+
+# Built-in modules #
+import re
+
+# Third party modules #
+import numpy, pandas
+
+# First party modules #
+
+# Internal modules #
+from cbmcfs3_runner.pump.schemas import classifier_pattern
+
+###############################################################################
+def compact(df, value, check_by):
+    """
+    Merge the rows of `df` that are identical in every column except
+    `value`, by summing `value`. The order of the columns and of the first
+    appearance of each row is kept. Missing values count as identical.
+
+    The sum of `value` within each group of `check_by` is checked to be
+    the same before and after.
+    """
+    # Everything else is a key #
+    keys = [c for c in df.columns if c != value]
+    # Group #
+    result = (df
+              .groupby(keys, sort=False, dropna=False, observed=True)
+              [value]
+              .sum()
+              .reset_index())
+    # Same column order #
+    result = result[list(df.columns)]
+    # Check conservation #
+    before = df.groupby(check_by, dropna=False, observed=True)[value].sum()
+    after  = result.groupby(check_by, dropna=False, observed=True)[value].sum()
+    numpy.testing.assert_allclose(after.loc[before.index].values, before.values)
+    # Return #
+    return result
+
+###############################################################################
+def compact_events(df):
+    """
+    Disturbance events that target the same stands in the same way
+    (classifiers, disturbance type, age windows, sort type, efficiency,
+    measurement type, step...) are merged into one by summing the amounts.
+
+    Only areas (A) and merchantable carbon (M) can be added. The amount
+    of a proportion (P) is a fraction of the eligible stands, two events
+    of 0.6 are not one event of 1.2, so these rows are left as they are.
+    """
+    check_by = ['step', 'dist_type_name', 'measurement_type']
+    # Give every proportion a key of its own so that it is never merged #
+    is_prop = (df['measurement_type'] == 'P').values
+    df = df.assign(_row = numpy.where(is_prop, numpy.arange(len(df)), -1))
+    result = compact(df, 'amount', check_by).drop(columns='_row')
+    # Check the proportions went through untouched #
+    after = (result['measurement_type'] == 'P').values
+    assert after.sum() == is_prop.sum()
+    numpy.testing.assert_array_equal(result.loc[after, 'amount'].values,
+                                     df.loc[is_prop, 'amount'].values)
+    # Return #
+    return result
+
+def compact_inventory(df):
+    """
+    Inventory records that are identical in every column except area
+    (classifiers, age, delay, unfcccl, historical and last disturbance)
+    are merged into one by summing the areas. The total area of each
+    set of classifiers is checked to be conserved.
+    Expects the original column names '_1', '_2', etc.
+    """
+    check_by = [c for c in df.columns if re.match(classifier_pattern, c)]
+    return compact(df, 'area', check_by)
+
+def reduction_ratios(countries):
+    """
+    For every country, how many inventory records would remain after
+    compaction. A ratio of 0.25 means four times fewer stands.
+    """
+    rows = []
+    for country in countries:
+        before = country.orig_data['inventory']
+        after  = compact_inventory(before)
+        rows.append({'country': country.iso2_code,
+                     'before':  len(before),
+                     'after':   len(after),
+                     'ratio':   len(after) / len(before) if len(before) else 1.0})
+    return pandas.DataFrame(rows)
@@ -30,6 +30,8 @@ class DisturbanceMaker(object):
         self.parent  = parent
         self.runner  = parent.parent
         self.country = parent.parent.country
+        # Can be replaced by a perturbed copy, see the ensemble scenario #
+        self.silviculture = self.country.silviculture
 
     # Artificially increase or decrease the demand by this ratio #
     irw_artificial_ratio = 1.0
@@ -80,7 +82,7 @@ class DisturbanceMaker(object):
             combinations of classifiers and disturbance ids for each HWP and year.
         """
         # Load #
-        harv_prop = self.country.silviculture.harvest_proportion
+        harv_prop = self.silviculture.harvest_proportion
         gftm_irw  = self.gftm_irw_proxy
         # Join #
         df = gftm_irw.left_join(harv_prop, 'hwp')
@@ -126,7 +128,7 @@ class DisturbanceMaker(object):
         # Now use this table to generate fuel wood disturbances
         # The suffix will serve to re-use some of the IRW columns
         # in case of missing FW harvest proportion data
-        harvest_proportion = self.country.silviculture.harvest_proportion
+        harvest_proportion = self.silviculture.harvest_proportion
         df = (df
               .set_index('hwp')
               .join(harvest_proportion.set_index('hwp'), lsuffix='_irw')
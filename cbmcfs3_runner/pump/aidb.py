@@ -22,11 +22,27 @@ from plumbing.databases.access_database import AccessDatabase
 
 # Internal modules #
 from cbmcfs3_runner.pump.dataframes import multi_index_pivot
+from cbmcfs3_runner.pump.aidb_store import aidb_store, file_lock
+from cbmcfs3_runner.pump.aidb_tables import aidb_tables
 
 # Constants #
 default_path = "C:/Program Files (x86)/Operational-Scale CBM-CFS3/Admin/DBs/ArchiveIndex_Beta_Install.mdb"
 default_path = Path(default_path)
 
+# Held by whoever switches the AIDB of the installation and runs SIT on it #
+lock_path = Path(str(default_path) + '.lock')
+
+###############################################################################
+def installation_lock(path=lock_path):
+    """
+    Exclusive lock, across processes, on the AIDB of the installation.
+    The standard import tool can only read that one file, so a runner must
+    hold this lock from the moment it switches the AIDB until SIT is done,
+    otherwise another runner could replace the file under it (which also
+    fails on Windows while the file is open).
+    """
+    return file_lock(path)
+
 ###############################################################################
 class AIDB(object):
     """
@@ -48,9 +64,28 @@ class AIDB(object):
     def __repr__(self):
         return "%s object at '%s'" % (self.__class__, self.paths.aidb)
 
+    @property
+    def digest(self):
+        """The MD5 of this AIDB, many countries share the same one."""
+        return aidb_store.digest(self.paths.aidb)
+
+    def store(self):
+        """Put this AIDB in the content addressed store, returns the MD5."""
+        return aidb_store.add(self.paths.aidb)
+
+    def install(self, dest):
+        """Copy this AIDB to `dest` unless it is already there."""
+        return aidb_store.install(self.store(), dest)
+
     def switch(self):
-        default_path.remove()
-        self.paths.aidb.copy(default_path)
+        """
+        Replace the global AIDB of the CBM-CFS3 installation, for the GUI
+        and for SIT. Nothing happens when the installed file is already the
+        right one. When running SIT afterwards, hold `installation_lock`
+        until it is done, see `Runner.run_cbmcfs3`. CBM-CFS3 itself uses
+        the runner's own copy, see `LaunchCBM`.
+        """
+        return self.install(default_path)
 
     @property_cached
     def database(self):
@@ -58,11 +93,18 @@ class AIDB(object):
         database.convert_col_names_to_snake = True
         return database
 
+    def table(self, name):
+        """
+        A table of this AIDB, shared with the other countries that have the
+        same content, see `pump/aidb_tables.py`. Don't modify it in place.
+        """
+        return aidb_tables.get(self, name)
+
     @property_cached
     def dm_table(self):
         """Main disturbance matrix."""
         # Load #
-        df = self.database['tblDM']
+        df = self.table('tblDM')
         # Rename #
         df = df.rename(columns={       "name": "dist_desc_dm",
                                 "description": "dist_desc_long"})
@@ -73,7 +115,7 @@ class AIDB(object):
     def source(self):
         """Name of source pools."""
         # Load #
-        df = self.database['tblSourceName']
+        df = self.table('tblSourceName')
         # Rename #
         df = df.rename(columns={        'row': 'dm_row',
                                 'description': 'row_pool'})
@@ -84,7 +126,7 @@ class AIDB(object):
     def sink(self):
         """Name of sink pools."""
         # Load #
-        df = self.database['tblSinkName']
+        df = self.table('tblSinkName')
         # Rename #
         df = df.rename(columns={     'column': 'dm_column',
                                 'description': 'column_pool'})
@@ -95,7 +137,7 @@ class AIDB(object):
     def lookup(self):
         """Proportion by source and sink."""
         # Load #
-        df = self.database['tblDMValuesLookup']
+        df = self.table('tblDMValuesLookup')
         # Return #
         return df
 
@@ -103,7 +145,7 @@ class AIDB(object):
     def dist_type_default(self):
         """Link between dist_type_id and dist_desc_aidb."""
         # Load #
-        df = self.database['tbldisturbancetypedefault']
+        df = self.table('tbldisturbancetypedefault')
         # Rename #
         df = df.rename(columns = {'dist_type_name': 'dist_desc_aidb'})
         # Return #
@@ -120,7 +162,7 @@ class AIDB(object):
         Shape in the EU AIDB: 110180 rows × 6 columns
         """
         # Load #
-        df = self.database['tbldmassociationdefault']
+        df = self.table('tbldmassociationdefault')
         # Rename #
         # TODO, check if dist_type_id is exactly the correct name
         df = df.rename(columns = {'default_disturbance_type_id': 'dist_type_id',
@@ -155,7 +197,7 @@ class AIDB(object):
         Shape in the EU aidb: 920 rows × 6 columns
         """
         # Load #
-        df = self.database['tbldmassociationspudefault']
+        df = self.table('tbldmassociationspudefault')
         # Rename
         # TODO check if dist_type_id is exactly the correct name
         df = df.rename(columns = {'default_disturbance_type_id': 'dist_type_id',
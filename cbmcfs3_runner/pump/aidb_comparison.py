@@ -47,7 +47,7 @@ class CompareAIDB(object):
         >>> c = cbmcfs3_continent.countries['AT']
         >>> comp = CompareAIDB(c)
         >>> print(comp.libcbm_aidb.db.read_df('slow_mixing_rate'))
-        >>> print(comp.cbmcfs3_aidb.database['tblSlowAGtoBGTransferRate'])
+        >>> print(comp.cbmcfs3_aidb.table('tblSlowAGtoBGTransferRate'))
 
     Or use the comparison methods:
 
@@ -79,7 +79,7 @@ class CompareAIDB(object):
 
     def compare_table(self, table_name):
         df1 = self.libcbm_aidb.db.read_df(table_name)
-        df2 = self.cbmcfs3_aidb.database[table_name]
+        df2 = self.cbmcfs3_aidb.table(table_name)
 
     def load_turnover_parameters(self):
         """Return a data frame comparing turnover parameters between cbmcfs3 and libcbm
@@ -96,7 +96,7 @@ class CompareAIDB(object):
         lib_turnover  = eco_lib.merge(turn_lib, how='inner')
 
         # Load cbmcfs3 turnover
-        cfs3_turnover = self.cbmcfs3_aidb.database['tblecoboundarydefault']
+        cfs3_turnover = self.cbmcfs3_aidb.table('tblecoboundarydefault')
         
         # Combine the two
         index = ['eco_boundary_id', 'eco_boundary_name']
@@ -159,7 +159,7 @@ class CompareAIDB(object):
         decay_lib = decay_lib[['pool_id', 'code', 'base_decay_rate', 'reference_temp', 'q10', 'prop_to_atmosphere', 'max_rate']]
         
         #cbmcfs3
-        decay_cfs = self.cbmcfs3_aidb.database['tbldomparametersdefault']
+        decay_cfs = self.cbmcfs3_aidb.table('tbldomparametersdefault')
         decay_cbm = decay_cfs.merge(cbmcfs3_pools, how ='inner', on="soil_pool_id")
         decay_cbm = decay_cbm[['pool_id', 'code', 'organic_matter_decay_rate', 'reference_temp',   'q10','max_decay_rate_soft',  'max_decay_rate_hard',  'prop_to_atmosphere' ]]
            
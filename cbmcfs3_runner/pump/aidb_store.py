@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+Every distinct AIDB is kept once in a directory, named after the MD5 of
+its content. By default the store is inside the data directory, but you
+can put it elsewhere with an environment variable:
+
+    $ export CBMCFS3_AIDB_STORE="/fast/disk/aidb_store/"
+
+To see which countries share the same AIDB:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> from cbmcfs3_runner.pump.aidb_store import aidb_store
+    >>> print(aidb_store.report(continent))
+"""
+
+# Built-in modules #
+import os, time, hashlib, shutil, threading, contextlib
+
+# Third party modules #
+import pandas
+import simplejson as json
+
+# First party modules #
+from autopaths          import Path
+from autopaths.dir_path import DirectoryPath
+
+# Internal modules #
+
+# Where the store is, default case #
+store_dir = DirectoryPath(os.environ.get("CBMCFS3_DATA", "~/repos/cbmcfs3_data/"))
+store_dir = DirectoryPath(store_dir + 'aidb_store/')
+
+# But you can override that with an environment variable #
+if os.environ.get("CBMCFS3_AIDB_STORE"):
+    store_dir = DirectoryPath(os.environ['CBMCFS3_AIDB_STORE'])
+
+###############################################################################
+def md5_of(path, block_size=2**20):
+    """The MD5 of a file, read one block at a time."""
+    result = hashlib.md5()
+    with open(str(path), 'rb') as handle:
+        for block in iter(lambda: handle.read(block_size), b''): result.update(block)
+    return result.hexdigest()
+
+@contextlib.contextmanager
+def file_lock(path, poll_interval=1.0):
+    """
+    Exclusive lock across processes, held as long as the `with` block
+    runs. The file at `path` is created if needed and left in place.
+    """
+    handle = open(str(path), 'a+')
+    try:
+        # Windows #
+        if os.name == 'nt':
+            import msvcrt
+            while True:
+                try:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(poll_interval)
+        # Other platforms #
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        yield path
+    finally:
+        # Closing the file releases the lock #
+        handle.close()
+
+def write_json(content, path):
+    """Write a JSON file atomically, through a temporary file of this process."""
+    tmp = str(path) + '.%i.tmp' % os.getpid()
+    with open(tmp, 'w') as handle: json.dump(content, handle, indent=4)
+    os.replace(tmp, str(path))
+
+###############################################################################
+class AIDBStore(object):
+    """
+    A content addressed store of AIDB files. Hashing an AIDB of several
+    hundred megabytes is slow, so the digests are remembered in an index
+    file along with the size and modification time of the file they were
+    computed from. A file that changes (e.g. `fix_all_aidbs.py`) is
+    simply hashed again. Many processes share the index, so it is
+    read, updated and written back while holding a lock file.
+    """
+
+    def __init__(self, base_dir=store_dir):
+        self.base_dir = DirectoryPath(base_dir)
+        self.lock     = threading.RLock()
+
+    def __repr__(self):
+        return '%s object in "%s"' % (self.__class__, self.base_dir)
+
+    @property
+    def index_path(self):
+        return Path(self.base_dir + 'index.json')
+
+    @property
+    def lock_path(self):
+        return Path(self.base_dir + 'index.lock')
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Hold the lock of this store, against threads and other processes."""
+        self.base_dir.create_if_not_exists()
+        with self.lock, file_lock(self.lock_path): yield
+
+    #-------------------------------------------------------------------------#
+    def load_index(self):
+        if not self.index_path.exists: return {}
+        with open(str(self.index_path)) as handle: return json.load(handle)
+
+    def save_index(self, index):
+        self.base_dir.create_if_not_exists()
+        write_json(index, self.index_path)
+
+    def digest(self, path):
+        """The MD5 of a file, from the index if it didn't change since."""
+        key  = os.path.realpath(str(path))
+        stat = os.stat(key)
+        with self.locked():
+            entry = self.load_index().get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry['md5']
+        # Hashing is slow, other processes can use the index meanwhile #
+        md5 = md5_of(key)
+        with self.locked():
+            index = self.load_index()
+            index[key] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'md5': md5}
+            self.save_index(index)
+        return md5
+
+    #-------------------------------------------------------------------------#
+    def path_of(self, md5):
+        return Path(self.base_dir + md5 + '.mdb')
+
+    def add(self, path):
+        """Put a file in the store if it is not there already. Returns its MD5."""
+        md5  = self.digest(path)
+        dest = self.path_of(md5)
+        if dest.exists: return md5
+        # Copy under a temporary name first, so a copy is never half done #
+        self.base_dir.create_if_not_exists()
+        tmp = str(dest) + '.%i.tmp' % os.getpid()
+        shutil.copyfile(str(path), tmp)
+        os.replace(tmp, str(dest))
+        return md5
+
+    def install(self, md5, dest):
+        """
+        Make `dest` a copy of the stored AIDB with the given MD5. Nothing
+        is copied when `dest` already has the same content.
+        Returns True if a copy was made.
+        """
+        dest = Path(dest)
+        if dest.exists and self.digest(dest) == md5: return False
+        dest.directory.create_if_not_exists()
+        tmp = str(dest) + '.%i.tmp' % os.getpid()
+        shutil.copyfile(str(self.path_of(md5)), tmp)
+        os.replace(tmp, str(dest))
+        return True
+
+    #-------------------------------------------------------------------------#
+    def report(self, countries):
+        """One row per country with the MD5 of its AIDB and who shares it."""
+        rows = [{'country': c.iso2_code,
+                 'md5':     c.aidb.digest,
+                 'size_mb': os.path.getsize(str(c.aidb.paths.aidb)) / 1024 / 1024}
+                for c in countries if c.aidb.paths.aidb.exists]
+        df = pandas.DataFrame(rows)
+        if df.empty: return df
+        df['shared_by'] = df.groupby('md5')['country'].transform('count')
+        return df.sort_values(['md5', 'country']).reset_index(drop=True)
+
+    def clean(self, keep):
+        """Remove the stored files whose MD5 is not in `keep`."""
+        keep = set(keep)
+        for f in self.base_dir.flat_files:
+            if f.extension != 'mdb': continue
+            if f.prefix not in keep: f.remove()
+
+# A single instance shared by all #
+aidb_store = AIDBStore()
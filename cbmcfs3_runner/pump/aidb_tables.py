@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+Most tables of the AIDB are the same in every country. This cache keeps
+a single copy of each distinct table in memory, and a parquet copy next
+to the AIDB store, so that loading `tbldmassociationdefault` for all
+countries reads it from the Access database only once. For instance:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> from cbmcfs3_runner.pump.aidb_tables import aidb_tables
+    >>> for c in continent: c.aidb.dm_assoc_default
+    >>> print(aidb_tables.stats)
+
+The data frames returned are shared between countries, never modify
+them in place.
+"""
+
+# Built-in modules #
+import os, hashlib, threading
+
+# Third party modules #
+import pandas
+import simplejson as json
+
+# First party modules #
+from autopaths          import Path
+from autopaths.dir_path import DirectoryPath
+
+# Internal modules #
+from cbmcfs3_runner.pump.aidb_store import aidb_store, file_lock, write_json
+
+###############################################################################
+def content_md5(df):
+    """A hash of the column names, types and values of a data frame."""
+    result = hashlib.md5()
+    result.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    result.update(pandas.util.hash_pandas_object(df, index=False).values.tobytes())
+    return result.hexdigest()
+
+###############################################################################
+class AIDBTableCache(object):
+    """
+    Maps every (AIDB file, table name) to the hash of the table content.
+    The mapping is saved in an index file so the next session knows which
+    parquet copy to load without opening the Access database at all.
+    Several processes can add to that file at the same time, so each new
+    entry is merged into what is on disk while holding a lock file.
+    """
+
+    def __init__(self, store=aidb_store):
+        self.store    = store
+        self.base_dir = DirectoryPath(store.base_dir + 'tables/')
+        self.frames   = {}
+        self.index    = None
+        self.lock     = threading.RLock()
+        # Statistics #
+        self.hits   = 0
+        self.copies = 0
+        self.reads  = 0
+        self.shared = 0
+
+    def __repr__(self):
+        return '%s object with %i tables in memory' % (self.__class__, len(self.frames))
+
+    @property
+    def index_path(self):
+        return Path(self.base_dir + 'index.json')
+
+    @property
+    def lock_path(self):
+        return Path(self.base_dir + 'index.lock')
+
+    def copy_path(self, md5):
+        return Path(self.base_dir + md5 + '.parquet')
+
+    #-------------------------------------------------------------------------#
+    def read_index(self):
+        if not self.index_path.exists: return {}
+        with open(str(self.index_path)) as handle: return json.load(handle)
+
+    def load_index(self, refresh=False):
+        """The index, read once per process unless `refresh` is set."""
+        if self.index is None or refresh: self.index = self.read_index()
+        return self.index
+
+    def remember(self, key, md5):
+        """Add one entry to the index on disk, keeping those of other processes."""
+        self.base_dir.create_if_not_exists()
+        with file_lock(self.lock_path):
+            index = self.read_index()
+            index[key] = md5
+            write_json(index, self.index_path)
+        self.index = index
+
+    def save_copy(self, df, md5):
+        """Tables with columns that mix types can't be saved, they stay in memory."""
+        path = self.copy_path(md5)
+        if path.exists: return
+        self.base_dir.create_if_not_exists()
+        tmp = Path(str(path) + '.%i.tmp' % os.getpid())
+        try:
+            df.to_parquet(str(tmp), index=False)
+        except (TypeError, ValueError):
+            tmp.remove()
+            return
+        os.replace(str(tmp), str(path))
+
+    #-------------------------------------------------------------------------#
+    def get(self, aidb, table):
+        """The content of `table` in the AIDB object given."""
+        key = aidb.digest + '/' + table.lower()
+        with self.lock:
+            md5 = self.load_index().get(key)
+            # Maybe another process added it since we read the index #
+            if md5 is None: md5 = self.load_index(refresh=True).get(key)
+            # Already in memory #
+            if md5 in self.frames:
+                self.hits += 1
+                return self.frames[md5]
+            # Already saved by a previous session #
+            if md5 is not None and self.copy_path(md5).exists:
+                self.copies += 1
+                self.frames[md5] = pandas.read_parquet(str(self.copy_path(md5)))
+                return self.frames[md5]
+            # Read from the Access database #
+            self.reads += 1
+            df  = aidb.database[table]
+            md5 = content_md5(df)
+            # Another country has the same table #
+            if md5 in self.frames:
+                self.shared += 1
+                df = self.frames[md5]
+            else:
+                self.frames[md5] = df
+                self.save_copy(df, md5)
+            # Remember for next time #
+            self.remember(key, md5)
+            return df
+
+    def clear(self):
+        """Forget the tables in memory, the copies on disk stay."""
+        with self.lock: self.frames = {}
+
+    @property
+    def stats(self):
+        return {'in_memory': len(self.frames),
+                'hits':      self.hits,
+                'copies':    self.copies,
+                'reads':     self.reads,
+                'shared':    self.shared,
+                'size_mb':   sum(int(df.memory_usage(deep=True).sum())
+                                 for df in self.frames.values()) / 1024 / 1024}
+
+# A single instance shared by all #
+aidb_tables = AIDBTableCache()
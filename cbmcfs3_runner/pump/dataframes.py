@@ -43,6 +43,18 @@ def multi_index_pivot(df, columns=None, values=None):
     # Return #
     return df
 
+#-----------------------------------------------------------------------------#
+def merge_partials(partials, index, values):
+    """
+    Combine grouped sums that were computed separately on each partition
+    of a table. When the partitions share some groups, their sums are
+    added together. Each partial must be indexed by the `index` columns.
+    """
+    if not partials:       return pandas.DataFrame(columns=index + values)
+    if len(partials) == 1: return partials[0].reset_index()
+    df = pandas.concat(partials)
+    return df.groupby(level=index, observed=True)[values].sum().reset_index()
+
 
 ##########################################################
 # Functions applied to many countries within a scenarios #
@@ -11,12 +11,14 @@ Unit D1 Bioeconomy.
 # Built-in modules #
 
 # Third party modules #
-import pandas
 
 # First party modules #
 from autopaths.auto_paths import AutoPaths
 from plumbing.cache import property_cached
 
+# Internal modules #
+from cbmcfs3_runner.pump.schemas import schemas
+
 ###############################################################################
 class FusionData(object):
     """
@@ -45,7 +47,7 @@ class FusionData(object):
         self.paths = AutoPaths(self.parent.data_dir, self.all_paths)
 
     def __getitem__(self, item):
-        return pandas.read_csv(str(self.paths[item]))
+        return schemas[item].read(self.paths[item])
 
     @property_cached
     def inventory_aws(self):
@@ -9,6 +9,7 @@ Unit D1 Bioeconomy.
 """
 
 # Built-in modules #
+import os
 
 # Third party modules #
 import pandas
@@ -19,6 +20,7 @@ from plumbing.cache import property_cached
 from plumbing.common import camel_to_snake
 
 # Internal modules #
+from cbmcfs3_runner.stdrd_import_tool.create_xls import CreateXLS, sheet_copy_path
 
 ###############################################################################
 class InputData(object):
@@ -28,6 +30,7 @@ class InputData(object):
     """
 
     all_paths = """
+    /input/csv/
     /input/xls/default_tables.xls
     /input/xls/append_tables.xls
     """
@@ -53,11 +56,34 @@ class InputData(object):
 
     #-------------------------- Other methods --------------------------------#
     def get_sheet(self, name):
-        """Get a specific sheet in the first excel."""
-        df = self.xls.parse(name)
+        """
+        Get a specific sheet in the first excel.
+        Read the parquet copy of the sheet when there is one that is at
+        least as recent as the CSV it was made from. Older runs only have
+        the excel.
+        Runs that never call SIT, such as libcbm ones, have no excel at
+        all, in which case the CSV the sheet is made from is read.
+        """
+        copy = sheet_copy_path(self.paths.default, name)
+        if   self.copy_is_fresh(copy, name): df = pandas.read_parquet(str(copy))
+        elif self.paths.default.exists:     df = self.xls.parse(name)
+        else:                               df = pandas.read_csv(str(self.csv_path(name)))
         df = df.rename(columns=camel_to_snake)
         return df
 
+    def csv_path(self, name):
+        """The CSV file that the sheet `name` of the first excel is made from."""
+        files = {v: k + '.csv' for k, v in CreateXLS.file_name_to_sheet_name.items()}
+        files['Growth'] = self.parent.default_sit.yield_table_name
+        return self.paths.csv_dir + files[name]
+
+    def copy_is_fresh(self, copy, name):
+        """The excel can be written after the copy, but never the CSV."""
+        if not copy.exists: return False
+        source = self.csv_path(name)
+        if not source.exists: return True
+        return os.path.getmtime(str(copy)) >= os.path.getmtime(str(source))
+
     #-------------------------- Specific sheets ------------------------------#
     @property_cached
     def disturbance_events(self):
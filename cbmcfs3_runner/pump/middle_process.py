@@ -53,7 +53,7 @@ class MiddleProcessor(object):
         # Default attributes #
         self.parent = parent
         # Directories #
-        self.paths = AutoPaths(self.parent.data_dir, self.all_paths)
+        self.paths = AutoPaths(self.parent.work_dir, self.all_paths)
 
     def __call__(self):
         # Set the seed to be always the same #
@@ -11,13 +11,13 @@ Unit D1 Bioeconomy.
 # Built-in modules #
 
 # Third party modules #
-import pandas
 
 # First party modules #
 from autopaths.auto_paths import AutoPaths
 from plumbing.cache import property_cached
 
 # Internal modules #
+from cbmcfs3_runner.pump.schemas import schemas
 
 ###############################################################################
 class OrigData(object):
@@ -44,7 +44,7 @@ class OrigData(object):
         self.paths = AutoPaths(self.parent.data_dir, self.all_paths)
 
     def __getitem__(self, item):
-        return pandas.read_csv(str(self.paths[item]))
+        return schemas[item].read(self.paths[item])
 
     #-------------------------- Inventory ------------------------------#
     @property_cached
@@ -84,8 +84,8 @@ class OrigData(object):
          'Vol19', 'Vol20', 'Vol21', 'Vol22', 'Vol23', 'Vol24', 'Vol25', 'Vol26',
          'Vol27', 'Vol28', 'Vol29', 'Vol30']
         """
-        # Load #
-        df = self['yields']
+        # Load, these are only read so classifiers can be categoricals #
+        df = schemas['yields'].read(self.paths.yields, categorical=True)
         # Rename classifiers #
         df = df.rename(columns = self.parent.classifiers.mapping)
         # Return #
@@ -94,8 +94,8 @@ class OrigData(object):
     @property_cached
     def historical_yields(self):
         """Historical yield taken from the original CSV file."""
-        # Load #
-        df = self['historical_yields']
+        # Load, these are only read so classifiers can be categoricals #
+        df = schemas['historical_yields'].read(self.paths.historical_yields, categorical=True)
         # Rename classifiers #
         df = df.rename(columns = self.parent.classifiers.mapping)
         # Return #
@@ -139,14 +139,9 @@ class OrigData(object):
     def disturbance_types(self):
         """
         Load disturbance types from the calibration database.
-        Change dist_type_name to a string.
+        The dist_type_name is a string, see the schema.
         """
-        # Load #
-        df = self['disturbance_types']
-        # Cast to string #
-        df['dist_type_name'] = df['dist_type_name'].astype('str')
-        # Return #
-        return df
+        return self['disturbance_types']
 
     @property_cached
     def disturbance_events(self):
@@ -164,17 +159,13 @@ class OrigData(object):
     def disturbance_events_raw(self):
         """
         Load disturbance_events from the calibration database.
-        Change dist_type_name to a string and step to an integer.
+        The dist_type_name and classifiers are strings and step is an
+        integer, see the schema.
         """
         # Load #
         df = self['disturbance_events']
-        # Make step an integer #
-        df['step'] = df['step'].astype(int)
         # Rename classifiers #
         df = df.rename(columns = self.parent.classifiers.mapping)
-        # Change variables to string to harmonize data types #
-        df['dist_type_name'] = df['dist_type_name'].astype('str')
-        df['climatic_unit'] = df['climatic_unit'].astype('str')
         # Return #
         return df
 
@@ -182,7 +173,7 @@ class OrigData(object):
     def transition_rules(self):
         """
         Load transition_rules from the calibration database.
-        Change dist_type_name to a string.
+        The dist_type_name and classifiers are strings, see the schema.
 
         Transition rules describe the transition between one particular set
         of classifiers and another set of classifiers. They are used for example
@@ -191,7 +182,7 @@ class OrigData(object):
 
         Note on column renaming:
         The transition rules table contains duplicated column names.
-        By default pandas leaves the columns that appear first as-is:
+        Like pandas, the schema reader leaves the columns that appear first as-is:
             ['_1', '_2', '_3', '_4', '_5', '_6', '_7']
         and renames the duplicated columns that way:
             ['_1.1', '_2.1', '_3.1', '_4.1', '_5.1', '_6.1', '_7.1']
@@ -207,9 +198,6 @@ class OrigData(object):
         mapping = self.parent.classifiers.mapping + '_dest'
         mapping.index = self.parent.classifiers.mapping.index + '.1'
         df = df.rename(columns=mapping)
-        # Change variable to strings to harmonize data types #
-        df['dist_type_name'] = df['dist_type_name'].astype('str')
-        df['climatic_unit'] = df['climatic_unit'].astype('str')
         # Return #
         return df
 
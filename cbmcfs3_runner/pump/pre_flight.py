@@ -6,40 +6,275 @@ Written by Lucas Sinclair and Paul Rougieux.
 
 JRC biomass Project.
 Unit D1 Bioeconomy.
+
+You can check the inputs of a runner without running it like this:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> runner = continent[('static_demand', 'LU', 0)]
+    >>> runner.pre_processor()
+    >>> print(runner.pre_flight.problems)
 """
 
 # Built-in modules #
+import re, time
 
 # Third party modules #
-import pandas
+import numpy, pandas
 
 # First party modules #
 
 # Internal modules #
+from cbmcfs3_runner.pump.schemas import schemas, classifier_pattern
+
+###############################################################################
+class PreFlightError(Exception):
+    """Raised when the inputs would make SIT or CBM fail."""
+    reason = 'pre_flight'
 
 ###############################################################################
 class PreFlight(object):
     """
-    This class will check the input data for inconsistencies.
+    This class will check the input data for inconsistencies, before
+    the minutes spent in SIT and CBM are wasted on a run that will fail.
+    Every rule is a method that looks at the CSVs given to SIT, all
+    loaded once in memory, and returns a list of problems. A problem is
+    the name of the rule, the file concerned, how many values are wrong
+    and a few examples of them.
     """
 
+    # The rules in the order they are run #
+    rules = ['check_for_nan',
+             'classifier_values',
+             'inventory_has_yields',
+             'events_have_types',
+             'types_are_associated',
+             'associations_in_aidb',
+             'events_in_matrix',
+             'measurement_types',
+             'sort_and_measurement',
+             'negative_amounts']
+
+    # The AIDB table and column that contain the names of each association #
+    aidb_names = {
+        'MapAdminBoundary':   ('tblAdminBoundaryDefault',        'admin_boundary_name'),
+        'MapEcoBoundary':     ('tblEcoBoundaryDefault',          'eco_boundary_name'),
+        'MapSpecies':         ('tblSpeciesTypeDefault',          'species_type_name'),
+        'MapDisturbanceType': ('tblDisturbanceTypeDefault',      'dist_type_name'),
+        'MapNonForestType':   ('tblAfforestationPreTypeDefault', 'name'),
+    }
+
     def __init__(self, parent):
         # Default attributes #
-        self.parent = parent
-        self.runner = parent
+        self.parent  = parent
+        self.runner  = parent
+        self.country = parent.country
 
     def __call__(self):
-        self.check_for_nan()
+        """Run every rule and stop the runner if any problem is found."""
+        start    = time.time()
+        problems = self.problems
+        self.runner.log.info("Pre-flight checks took %.2f seconds." % (time.time() - start))
+        if problems.empty: return
+        msg = "The input data has %i problems:\n%s"
+        raise PreFlightError(msg % (len(problems), problems.to_string(index=False)))
 
-    def check_for_nan(self):
-        """This method will catch any 'NaN' presents in the input."""
-        # The object that will run next #
-        create_xls = self.runner.default_sit.create_xls
+    #-------------------------------------------------------------------------#
+    @property
+    def create_xls(self):
+        """The object that will run next."""
+        return self.runner.default_sit.create_xls
+
+    def load_tables(self):
+        """Read every CSV given to SIT once, with the types of the schemas."""
+        create_xls = self.create_xls
         # Check there are CSVs #
         if create_xls.paths.csv_dir.empty:
-            raise Exception("No CSVs present to generate the XLS.")
-        # Go over each file #
-        for file_name in create_xls.file_name_to_sheet_name:
-            assert create_xls.paths[file_name].exists
-            df = pandas.read_csv(create_xls.paths[file_name])
-            assert not df.isna().any().any()
\ No newline at end of file
+            raise PreFlightError("No CSVs present to generate the XLS.")
+        # Same list of files as the excel #
+        names = list(create_xls.file_name_to_sheet_name) + ['yields', 'historical_yields']
+        tables = {}
+        for name in names:
+            path = create_xls.paths[name]
+            if name in create_xls.file_name_to_sheet_name and not path.exists:
+                raise PreFlightError("The input file '%s' is missing." % path)
+            if path.exists: tables[name] = schemas[name].read(path)
+        return tables
+
+    @property
+    def problems(self):
+        """A data frame with one row per problem found, empty if all is well."""
+        self.tables = self.load_tables()
+        rows = [p for rule in self.rules for p in getattr(self, rule)()]
+        columns = ['rule', 'file', 'count', 'examples']
+        return pandas.DataFrame(rows, columns=columns)
+
+    @staticmethod
+    def problem(rule, file, bad):
+        """Format a problem from the wrong values found."""
+        bad = pandas.Series(bad).astype(str).unique()
+        return {'rule': rule, 'file': file, 'count': len(bad), 'examples': list(bad[:5])}
+
+    @staticmethod
+    def classifier_columns(df):
+        return [c for c in df.columns if re.match(classifier_pattern, c)]
+
+    #-------------------------------------------------------------------------#
+    def check_for_nan(self):
+        """This method will catch any 'NaN' presents in the input."""
+        result = []
+        for name in self.create_xls.file_name_to_sheet_name:
+            df = self.tables[name]
+            na = df.isna().any()
+            if na.any(): result.append(self.problem('check_for_nan', name, na.index[na]))
+        return result
+
+    def classifier_values(self):
+        """
+        Every classifier value used in the other files has to be defined in
+        'classifiers.csv'. The wildcard '?' is allowed except in the inventory.
+        """
+        result = []
+        # The valid values of each classifier #
+        df = self.tables['classifiers']
+        df = df[df['classifier_value_id'] != '_CLASSIFIER']
+        valid = df.groupby('classifier_number')['classifier_value_id'].agg(set).to_dict()
+        # Check each file #
+        for name in ('inventory', 'yields', 'historical_yields',
+                     'disturbance_events', 'transition_rules'):
+            if name not in self.tables: continue
+            df = self.tables[name]
+            for col in self.classifier_columns(df):
+                number  = int(float(col.lstrip('_').split('.')[0]))
+                allowed = valid.get(number, set())
+                if name != 'inventory': allowed = allowed | {'?'}
+                values  = df[col].astype(str)
+                bad     = values[~values.isin(allowed)]
+                if len(bad): result.append(self.problem('classifier_values', name + ':' + col, bad))
+        return result
+
+    def inventory_has_yields(self):
+        """Every combination of classifiers in the inventory needs a yield curve."""
+        result = []
+        inventory = self.tables['inventory']
+        cols      = self.classifier_columns(inventory)
+        stands    = inventory[cols].astype(str).drop_duplicates()
+        for name in ('yields', 'historical_yields'):
+            if name not in self.tables: continue
+            curves = self.tables[name]
+            common = [c for c in cols if c in curves.columns]
+            curves = curves[common].astype(str).drop_duplicates()
+            # One boolean per stand and curve, narrowed one classifier at a time #
+            match = numpy.ones((len(stands), len(curves)), dtype=bool)
+            for col in common:
+                s = stands[col].to_numpy(dtype=object)[:, None]
+                c = curves[col].to_numpy(dtype=object)[None, :]
+                match &= (s == c) | (c == '?')
+            missing = stands[~match.any(axis=1)]
+            if len(missing):
+                bad = missing.apply(lambda r: ' '.join(r), axis=1)
+                result.append(self.problem('inventory_has_yields', name, bad))
+        return result
+
+    def events_have_types(self):
+        """Disturbances and transitions can only use the types defined."""
+        result = []
+        types = set(self.tables['disturbance_types']['dist_type_name'].astype(str))
+        for name in ('disturbance_events', 'transition_rules'):
+            values = self.tables[name]['dist_type_name'].astype(str)
+            bad    = values[~values.isin(types)]
+            if len(bad): result.append(self.problem('events_have_types', name, bad))
+        return result
+
+    @property
+    def type_descriptions(self):
+        """The 'dist_type_name' and its description in 'disturbance_types.csv'."""
+        df  = self.tables['disturbance_types']
+        col = 'dist_desc_input' if 'dist_desc_input' in df.columns else 'name'
+        return df[['dist_type_name', col]].rename(columns={col: 'dist_desc_input'})
+
+    def types_are_associated(self):
+        """Every disturbance type needs a name in the AIDB in 'associations.csv'."""
+        mapping = self.country.associations.map_disturbance
+        descs   = self.type_descriptions['dist_desc_input'].astype(str)
+        bad     = descs[~descs.isin(mapping['dist_desc_input'])]
+        if len(bad): return [self.problem('types_are_associated', 'associations', bad)]
+        return []
+
+    @property
+    def aidb(self):
+        """Only the runs that use CBM-CFS3 read this AIDB."""
+        if self.runner.simulator != 'cbmcfs3':  return None
+        if not self.country.aidb.paths.aidb.exists: return None
+        return self.country.aidb
+
+    def associations_in_aidb(self):
+        """The names on the AIDB side of 'associations.csv' must exist there."""
+        if self.aidb is None: return []
+        result = []
+        df = self.country.associations.df
+        for key, (table, column) in self.aidb_names.items():
+            names = df.loc[df['A'] == key, 'C'].astype(str)
+            if names.empty: continue
+            known = set(self.aidb.table(table)[column].astype(str))
+            bad   = names[~names.isin(known)]
+            if len(bad): result.append(self.problem('associations_in_aidb', key, bad))
+        return result
+
+    def events_in_matrix(self):
+        """
+        Every disturbance used has to reach a disturbance matrix, going
+        through the association, the default type and the default matrix.
+        """
+        if self.aidb is None: return []
+        # Each default type must have a single default matrix #
+        try:
+            assoc = self.aidb.dm_assoc_default_short
+        except AssertionError:
+            df  = self.aidb.dm_assoc_default.query("annual_order < 2")
+            num = df.groupby('dist_type_id')['dmid'].nunique()
+            bad = num.index[num > 1]
+            return [self.problem('events_in_matrix', 'tbldmassociationdefault', bad)]
+        # Chain the small tables #
+        df = self.type_descriptions
+        df = df.merge(self.country.associations.map_disturbance, on='dist_desc_input', how='left')
+        df = df.merge(self.aidb.dist_type_default[['dist_type_id', 'dist_desc_aidb']],
+                      on='dist_desc_aidb', how='left')
+        df = df.merge(assoc, on='dist_type_id', how='left')
+        # Only the types actually used #
+        used = set(self.tables['disturbance_events']['dist_type_name'].astype(str))
+        df   = df[df['dist_type_name'].astype(str).isin(used)]
+        bad  = df.loc[df['dmid'].isna(), 'dist_type_name']
+        if len(bad): return [self.problem('events_in_matrix', 'disturbance_events', bad)]
+        return []
+
+    def measurement_types(self):
+        """The only measurement types are area (A), proportion (P) and carbon (M)."""
+        df  = self.tables['disturbance_events']
+        bad = df.loc[~df['measurement_type'].isin(['A', 'P', 'M']), 'measurement_type']
+        if len(bad): return [self.problem('measurement_types', 'disturbance_events', bad)]
+        return []
+
+    def sort_and_measurement(self):
+        """
+        The combinations of sort type and measurement type that CBM refuses.
+        Random sort (6) with merchantable carbon targets (M) gives the famous
+        'Illegal target type for RANDOM sort'. Proportions (P) can't be above one.
+        """
+        result = []
+        df = self.tables['disturbance_events']
+        # Random sort #
+        selector = (df['sort_type'] == 6) & (df['measurement_type'] == 'M')
+        bad = df.loc[selector, 'dist_type_name']
+        if len(bad): result.append(self.problem('sort_and_measurement', 'disturbance_events', bad))
+        # Proportions #
+        selector = (df['measurement_type'] == 'P') & (df['amount'] > 1.0)
+        bad = df.loc[selector, 'amount']
+        if len(bad): result.append(self.problem('sort_and_measurement', 'disturbance_events', bad))
+        return result
+
+    def negative_amounts(self):
+        """No disturbance can remove a negative amount."""
+        df  = self.tables['disturbance_events']
+        bad = df.loc[df['amount'] < 0, 'amount']
+        if len(bad): return [self.problem('negative_amounts', 'disturbance_events', bad)]
+        return []
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+The data types of the CSV files that we read for every country, so that
+the same column always comes out with the same type regardless of what
+values happen to be in it. Use it like this:
+
+    >>> from cbmcfs3_runner.pump.schemas import schemas
+    >>> df = schemas['disturbance_events'].read(path)
+
+Only the columns that matter are declared, the others are inferred.
+When the `pyarrow` package is available its CSV parser is used.
+"""
+
+# Built-in modules #
+import re, csv, warnings
+
+# Third party modules #
+import pandas
+
+# First party modules #
+
+# Internal modules #
+
+# The module `pyarrow` is optional #
+try:
+    import pyarrow, pyarrow.csv
+except ImportError:
+    pyarrow = None
+
+# Classifier columns are named '_1', '_2', etc. and '_1.1' when duplicated #
+classifier_pattern = r'^_\d+(\.\d+)?$'
+
+###############################################################################
+def unique_names(names):
+    """
+    Rename duplicated column names the same way `pandas.read_csv` does.
+    For instance ['_1', '_2', '_1'] becomes ['_1', '_2', '_1.1'].
+    """
+    result, seen = [], {}
+    for name in names:
+        if name in seen:
+            seen[name] += 1
+            result.append('%s.%i' % (name, seen[name]))
+        else:
+            seen[name] = 0
+            result.append(name)
+    return result
+
+def read_header(path):
+    """The column names in the first line of a CSV file."""
+    with open(str(path), newline='') as handle: return next(csv.reader(handle))
+
+###############################################################################
+class Schema(object):
+    """
+    The expected type of the columns of one CSV file.
+    Types are one of 'str', 'int', 'float' or 'bool'.
+    Classifier columns are always strings, and optionally categoricals.
+    """
+
+    arrow_types  = {'str': 'string', 'int': 'int64', 'float': 'float64', 'bool': 'bool_'}
+    pandas_types = {'str': 'object', 'int': 'int64', 'float': 'float64', 'bool': 'bool'}
+
+    def __init__(self, name, columns=None, patterns=None):
+        # Default attributes #
+        self.name     = name
+        self.columns  = columns  or {}
+        self.patterns = patterns or {}
+        # Classifiers #
+        self.patterns[classifier_pattern] = 'str'
+
+    def __repr__(self):
+        return '%s object for "%s"' % (self.__class__, self.name)
+
+    def dtype_of(self, column):
+        """The declared type of a column or None if it should be inferred."""
+        if column in self.columns: return self.columns[column]
+        for pattern, dtype in self.patterns.items():
+            if re.match(pattern, column): return dtype
+        return None
+
+    def declared(self, names):
+        """The declared types of the columns that are present."""
+        return {n: self.dtype_of(n) for n in names if self.dtype_of(n) is not None}
+
+    #-------------------------------------------------------------------------#
+    def read(self, path, categorical=False):
+        """
+        Load the CSV at `path` into a data frame with the declared types.
+        If some values don't match the schema, the file is parsed again
+        with type inference and a warning with a report is issued.
+        Set `categorical` to get the classifier columns as categoricals.
+        """
+        names = unique_names(read_header(path))
+        df    = None
+        # Fast path #
+        if pyarrow is not None:
+            try:
+                df = self.read_arrow(path, names)
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                df = None
+        # Slow path with a report #
+        if df is None:
+            df = self.read_pandas(path, names)
+        # Categoricals #
+        if categorical:
+            for col in df.columns:
+                if re.match(classifier_pattern, col): df[col] = df[col].astype('category')
+        # Return #
+        return df
+
+    def read_arrow(self, path, names):
+        types   = {n: getattr(pyarrow, self.arrow_types[t])()
+                   for n, t in self.declared(names).items()}
+        read    = pyarrow.csv.ReadOptions(column_names=names, skip_rows=1)
+        convert = pyarrow.csv.ConvertOptions(column_types=types,
+                                             strings_can_be_null=True)
+        table   = pyarrow.csv.read_csv(str(path), read_options=read, convert_options=convert)
+        return table.to_pandas()
+
+    def read_pandas(self, path, names):
+        # Strings can't fail #
+        declared = self.declared(names)
+        strings  = {n: str for n, t in declared.items() if t == 'str'}
+        df = pandas.read_csv(str(path), header=0, names=names, dtype=strings)
+        # The other types are checked and converted #
+        report = self.validate(df)
+        for col, dtype in declared.items():
+            if dtype == 'str' or col in report['column'].values: continue
+            df[col] = df[col].astype(self.pandas_types[dtype])
+        # Warn #
+        if not report.empty:
+            msg = "The file '%s' doesn't match the '%s' schema:\n%s"
+            warnings.warn(msg % (path, self.name, report.to_string(index=False)))
+        # Return #
+        return df
+
+    def validate(self, df):
+        """
+        A report with one row for every declared column of `df` that
+        can't be converted to its type, with a few offending values.
+        """
+        rows = []
+        for col, dtype in self.declared(df.columns).items():
+            if dtype == 'str': continue
+            values = df[col].dropna()
+            # Values that can't be converted #
+            if dtype == 'bool':
+                bad = values[~values.isin([True, False])]
+            else:
+                numbers = pandas.to_numeric(values, errors='coerce')
+                invalid = numbers.isna()
+                if dtype == 'int': invalid |= (numbers % 1 != 0)
+                bad = values[invalid]
+            # Integers and booleans can't be missing #
+            missing = len(df) - len(values) if dtype != 'float' else 0
+            if bad.empty and not missing: continue
+            rows.append({'column':   col,
+                         'expected': dtype,
+                         'found':    str(df[col].dtype),
+                         'invalid':  len(bad),
+                         'missing':  missing,
+                         'examples': list(bad.astype(str).unique()[:5])})
+        columns = ['column', 'expected', 'found', 'invalid', 'missing', 'examples']
+        return pandas.DataFrame(rows, columns=columns)
+
+###############################################################################
+# The inventory of a country, in the `export` and `fusion` directories #
+inventory = Schema('inventory',
+                   columns = {'using_id': 'bool',
+                              'area':     'float'})
+
+# The disturbances to apply #
+disturbance_events = Schema('disturbance_events',
+                            columns = {'using_id':         'bool',
+                                       'dist_type_name':   'str',
+                                       'measurement_type': 'str',
+                                       'sort_type':        'int',
+                                       'step':             'int'})
+
+# The names of the disturbances #
+disturbance_types = Schema('disturbance_types',
+                           columns = {'dist_type_name': 'str',
+                                      'name':           'str'})
+
+# Transitions between classifiers, which are present twice #
+transition_rules = Schema('transition_rules',
+                          columns = {'using_id':       'bool',
+                                     'dist_type_name': 'str'})
+
+# Growth curves, the volume columns are 'vol0', 'vol1', etc. #
+yields = Schema('yields', patterns = {r'(?i)^vol\d+$': 'float'})
+
+# The definition of the classifiers #
+classifiers = Schema('classifiers',
+                     columns = {'classifier_number':   'int',
+                                'classifier_value_id': 'str',
+                                'name':                'str'})
+
+# The silviculture treatments #
+silv_treatments = Schema('silv_treatments',
+                         columns = {'dist_type_name': 'str',
+                                    'man_nat':        'str'})
+
+# The mapping of names between the input files and the AIDB #
+associations = Schema('associations',
+                      columns = {'A': 'str', 'B': 'str', 'C': 'str'})
+
+# Conversion from tons of carbon to cubic meters #
+coefficients = Schema('coefficients',
+                      columns = {'id':          'int',
+                                 'forest_type': 'str',
+                                 'density':     'float'})
+
+# Every schema by the name of the file it applies to #
+schemas = {'inventory':          inventory,
+           'back_inventory_aws': inventory,
+           'disturbance_events': disturbance_events,
+           'disturbance_types':  disturbance_types,
+           'transition_rules':   transition_rules,
+           'yields':             yields,
+           'historical_yields':  yields,
+           'classifiers':        classifiers,
+           'ageclass':           Schema('ageclass'),
+           'treatments':         silv_treatments,
+           'associations':       associations,
+           'coefficients':       coefficients}
@@ -11,6 +11,7 @@ Unit D1 Bioeconomy.
 # Built-in modules #
 
 # Third party modules #
+import pandas
 
 # First party modules #
 import autopaths
@@ -23,6 +24,10 @@ from tqdm import tqdm
 # Internal modules #
 from cbmcfs3_runner.reports.scenario import ScenarioReport
 from cbmcfs3_runner.pump.dataframes import concat_as_df
+from cbmcfs3_runner.core.metrics import hotspots
+from cbmcfs3_runner.post_processor.products import hwp_many
+from cbmcfs3_runner.core.executor import run_many
+from cbmcfs3_runner.core.supervisor import permanent_reasons
 
 ###############################################################################
 class Scenario(object):
@@ -54,10 +59,15 @@ class Scenario(object):
     def __repr__(self):
         return '%s object with %i runners' % (self.__class__, len(self))
 
-    def __call__(self, verbose=False):
-        for code, steps in tqdm(self.runners.items()):
-            for runner in steps:
-                runner(interrupt_on_error=False, verbose=verbose)
+    def __call__(self, verbose=False, processes=1):
+        """Run every runner, optionally several at a time in separate processes."""
+        if processes > 1:
+            run_many((r for steps in self.runners.values() for r in steps),
+                     processes=processes, verbose=verbose)
+        else:
+            for code, steps in tqdm(self.runners.items()):
+                for runner in steps:
+                    runner(interrupt_on_error=False, verbose=verbose)
         self.compile_log_tails()
 
     @property
@@ -74,13 +84,65 @@ class Scenario(object):
     def report(self):
         return ScenarioReport(self)
 
-    def compile_log_tails(self, step=-1):
+    @property
+    def status(self):
+        """The rows of the status index that concern this scenario."""
+        df = self.continent.status_index.df
+        return df[df['scenario'] == self.short_name].reset_index(drop=True)
+
+    def failed_runners(self, step=-1, skip_reasons=permanent_reasons):
+        """
+        The runners that did not complete their last run. Those that
+        failed for a reason in `skip_reasons`, which would fail again
+        (e.g. 'invalid_disturbances'), are left out. Pass an empty set
+        to get all of them.
+        """
+        result = []
+        for steps in self.runners.values():
+            runner = steps[step]
+            status = runner.status or {}
+            if runner.map_value >= 1.0: continue
+            if status.get('failure_reason') in skip_reasons: continue
+            result.append(runner)
+        return result
+
+    def compile_log_tails(self, step=-1, only_failed=False):
+        """
+        Write a summary of the status of every runner, followed by the
+        tails of the log files. Set `only_failed` to only read the logs
+        of the runners that did not complete.
+        """
+        runners = [r[step] for r in self.runners.values() if r[step]]
+        if only_failed: runners = [r for r in runners if r.map_value < 1.0]
         summary = self.paths.summary
         summary.open(mode='w')
         summary.handle.write("# Summary of all log file tails\n\n")
-        summary.handle.writelines(r[step].tail for r in self.runners.values() if r[step])
+        status = self.status
+        if not status.empty:
+            cols = ['runner', 'status', 'stage', 'error_class', 'failure_reason']
+            summary.handle.write(status[cols].to_markdown(index=False) + "\n\n")
+        summary.handle.writelines(r.tail for r in runners)
         summary.close()
 
+    def metrics_hotspots(self, step=-1):
+        """
+        A table of all pipeline stages ranked by the total time they took
+        across every country of this scenario.
+        """
+        return hotspots(r[step] for r in self.runners.values())
+
+    def hwp(self, step=-1):
+        """The harvested wood products of every country stacked together."""
+        return hwp_many([r[step] for r in self.runners.values()])
+
+    def screen_demand(self, ratios=(1.0,), step=-1):
+        """
+        Check with the surrogate projector if the demand of every country
+        can be harvested, for several multipliers of that demand.
+        """
+        return pandas.concat([r[step].surrogate.screen(ratios) for r in self.runners.values()],
+                             ignore_index=True)
+
     # ------------------------------ Others ----------------------------------#
     def make_csv_zip(self, csv_name, dest_dir):
         """
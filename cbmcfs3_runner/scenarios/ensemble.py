@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+Typically you would use this scenario like this:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> scenario = continent.scenarios['ensemble']
+    >>> scenario(processes=8)
+    >>> print(scenario.statistics('LU', 'sum_merch_stock', processes=8))
+"""
+
+# Built-in modules #
+from concurrent.futures import ProcessPoolExecutor
+
+# Third party modules #
+import numpy, pandas
+
+# First party modules #
+from plumbing.cache import property_cached
+
+# Internal modules #
+from cbmcfs3_runner.scenarios.base_scen import Scenario
+from cbmcfs3_runner.core.runner import Runner
+from cbmcfs3_runner.core.accumulator import Accumulator
+from cbmcfs3_runner.disturbances.silviculture import Silviculture
+
+###############################################################################
+# The outputs summarized, with the function to get them and their index #
+outputs = {
+    'sum_merch_stock':   (lambda r: r.post_processor.inventory.sum_merch_stock,
+                          ['year', 'forest_type', 'conifers_broadleaves']),
+    'carbon_stock_long': (lambda r: r.post_processor.ipcc.carbon_stock_long,
+                          ['ipcc_pool', 'time_step', 'year']),
+    'hwp':               (lambda r: r.post_processor.products.hwp,
+                          ['time_step', 'year']),
+}
+
+def member_statistics(scenario, iso2_code, name, nums):
+    """
+    Entry point of a worker process. Accumulates the given members
+    of one country and returns the accumulator to be merged.
+    """
+    from cbmcfs3_runner.core.continent import continent
+    scenario = continent.scenarios[scenario]
+    members  = scenario.runners[iso2_code]
+    return scenario.accumulate([members[i] for i in nums], name)
+
+###############################################################################
+class Ensemble(Scenario):
+    """
+    This scenario is similar to the `static_demand` scenario, except that
+    every country gets `num_members` runners instead of one. Each member
+    has its own random seed in CBM and, optionally, its own perturbation of:
+
+    * the demand coming from the economic model (`demand_sd`),
+    * the harvest correction factors of the silviculture (`corr_fact_sd`),
+      every row getting a different factor,
+    * the volumes of the yield curves (`yield_sd`).
+
+    Each perturbation is a multiplier drawn from a log-normal distribution
+    of median one with the given standard deviation of its logarithm.
+    The multipliers are reproducible since they only depend on the seed,
+    and they are always drawn in the same order (demand, yield, then
+    correction factors) so that switching one on does not change the others.
+
+    Note that the list of runners of a country holds the members and not
+    the steps like in other scenarios. The worker processes find the
+    scenario by its `short_name` in `continent.scenarios`. To change the
+    parameters, make a subclass with its own `short_name` in a new file of
+    this directory, it will then be loaded like every other scenario.
+    """
+
+    short_name = 'ensemble'
+
+    # Size of the ensemble #
+    num_members = 10
+
+    # The seed of the first member, the others follow #
+    base_seed = 1
+
+    # Standard deviations of the perturbations, zero to disable #
+    demand_sd    = 0.0
+    corr_fact_sd = 0.0
+    yield_sd     = 0.0
+
+    @property_cached
+    def runners(self):
+        """A dictionary of country codes as keys with a list of members as values."""
+        return {c.iso2_code: [self.make_member(c, i) for i in range(self.num_members)]
+                for c in self.continent}
+
+    def make_member(self, country, num):
+        """Create one runner and apply its perturbations."""
+        # Create #
+        runner = Runner(self, country, num)
+        seed   = self.base_seed + num
+        random = numpy.random.RandomState(seed)
+        draw   = lambda sd, size=None: numpy.exp(random.normal(0.0, sd, size))
+        # Seed of CBM #
+        runner.middle_processor.random_seed = seed
+        # The scalar multipliers always come first, in this order #
+        ratio  = draw(self.demand_sd)
+        growth = draw(self.yield_sd)
+        # Demand #
+        dist_maker = runner.pre_processor.disturbance_maker
+        dist_maker.irw_artificial_ratio = ratio
+        dist_maker.fw_artificial_ratio  = ratio
+        # Growth #
+        runner.pre_processor.yield_multiplier = growth
+        # Correction factors, on a copy that only this member sees #
+        if self.corr_fact_sd:
+            silviculture = Silviculture(country)
+            corr_fact    = silviculture.corr_fact.copy()
+            corr_fact['corr_fact'] *= draw(self.corr_fact_sd, len(corr_fact))
+            silviculture.corr_fact  = corr_fact
+            dist_maker.silviculture = silviculture
+        # Return #
+        return runner
+
+    @property
+    def perturbations(self):
+        """One row per member with the seed and the multipliers applied."""
+        rows = []
+        for iso2_code, members in self.runners.items():
+            for runner in members:
+                dist_maker = runner.pre_processor.disturbance_maker
+                perturbed  = dist_maker.silviculture is not runner.country.silviculture
+                rows.append({'country':          iso2_code,
+                             'member':           runner.num,
+                             'seed':             runner.middle_processor.random_seed,
+                             'demand_ratio':     dist_maker.irw_artificial_ratio,
+                             'yield_multiplier': runner.pre_processor.yield_multiplier,
+                             'corr_fact_perturbed': perturbed})
+        return pandas.DataFrame(rows)
+
+    #-------------------------------------------------------------------------#
+    def accumulate(self, members, name):
+        """
+        Add the output `name` of every member to an accumulator, one
+        member at a time, forgetting their post-processing afterwards.
+        Members that did not complete are skipped.
+        """
+        func, index = outputs[name]
+        result = None
+        for runner in members:
+            if runner.map_value < 1.0: continue
+            df = func(runner)
+            if result is None:
+                values = [c for c in df.select_dtypes('number').columns if c not in index]
+                result = Accumulator(index, values, seed=self.base_seed)
+            result.update(df)
+            del runner.post_processor
+        return result
+
+    def statistics(self, iso2_code, name, processes=1):
+        """
+        Mean, variance and quantiles of the output `name` (one of
+        the keys of `outputs`) across the members of one country.
+        """
+        members = self.runners[iso2_code]
+        # Serial #
+        if processes <= 1:
+            result = self.accumulate(members, name)
+        # Parallel, each worker takes a slice of the members #
+        else:
+            chunks = numpy.array_split(numpy.arange(len(members)), processes)
+            with ProcessPoolExecutor(processes) as pool:
+                futures = [pool.submit(member_statistics, self.short_name, iso2_code, name,
+                                       [int(i) for i in chunk])
+                           for chunk in chunks if len(chunk)]
+                partials = [f.result() for f in futures]
+            partials = [p for p in partials if p is not None]
+            result   = partials[0] if partials else None
+            for other in partials[1:]: result.merge(other)
+        # Return #
+        if result is None: return pandas.DataFrame()
+        return result.df
@@ -14,12 +14,12 @@ from __future__ import print_function
 # Built-in modules #
 
 # Third party modules #
-import pandas
 
 # First party modules #
 from plumbing.cache import property_cached
 
 # Internal modules #
+from cbmcfs3_runner.pump.schemas import schemas
 
 ###############################################################################
 class Associations(object):
@@ -40,7 +40,7 @@ class Associations(object):
     @property_cached
     def df(self):
         """Load the CSV that is 'associations.csv'."""
-        return pandas.read_csv(str(self.path))
+        return schemas['associations'].read(self.path)
 
     def key_to_rows(self, mapping_name):
         """
@@ -57,7 +57,7 @@ class CreateJSON(object):
         self.parent = parent
         self.runner = parent.parent
         # Automatically access paths based on a string of many subpaths #
-        self.paths = AutoPaths(self.runner.data_dir, self.parent.all_paths)
+        self.paths = AutoPaths(self.runner.work_dir, self.parent.all_paths)
 
     def __call__(self):
         self.paths.json.write(json.dumps(self.content, indent=4, ignore_nan=True))
@@ -68,7 +68,7 @@ class CreateJSON(object):
         config = self.template.copy()
         # Two main paths #
         config['output_path']           = self.parent.paths.mdb
-        csv_dir = self.parent.parent.data_dir + "input/csv/"      
+        csv_dir = self.runner.work_dir + "input/csv/"
         config['import_config']['ageclass_path'] = csv_dir + "ageclass.csv"
         config['import_config']['classifiers_path'] = csv_dir + "classifiers.csv"
         config['import_config']['disturbance_events_path'] = csv_dir + "disturbance_events.csv"
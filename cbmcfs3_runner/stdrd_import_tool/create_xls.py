@@ -14,10 +14,21 @@ Unit D1 Bioeconomy.
 import pandas, pyexcel
 
 # First party modules #
+from autopaths            import Path
 from autopaths.auto_paths import AutoPaths
 
 # Internal modules #
 
+###############################################################################
+def sheet_copy_path(xls_path, sheet_name):
+    """
+    Every sheet of the first excel file given to SIT is also saved by the
+    pre-processor as a parquet file next to it, so that we can read it
+    back quickly afterwards, even in runs that never build the excel.
+    For instance "input/xls/default_tables.DistEvents.parquet".
+    """
+    return Path(Path(xls_path).prefix_path + '.' + sheet_name + '.parquet')
+
 ###############################################################################
 class CreateXLS(object):
     """
@@ -51,7 +62,7 @@ class CreateXLS(object):
         self.parent = parent
         self.runner = parent.parent
         # Automatically access paths based on a string of many subpaths #
-        self.paths = AutoPaths(self.runner.data_dir, self.all_paths + self.parent.all_paths)
+        self.paths = AutoPaths(self.runner.work_dir, self.all_paths + self.parent.all_paths)
 
     def __call__(self):
         # Create an Excel Writer #
@@ -69,4 +80,4 @@ class CreateXLS(object):
         # Convert from XLSX to XLS #
         source = str(self.paths.tables_xlsx)
         dest   = str(self.paths.tables_xls)
-        pyexcel.save_book_as(file_name=source, dest_file_name=dest)
\ No newline at end of file
+        pyexcel.save_book_as(file_name=source, dest_file_name=dest)
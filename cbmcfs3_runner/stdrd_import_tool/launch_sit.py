@@ -98,7 +98,7 @@ class LaunchSIT(object):
         # Keep access to the parent object #
         self.parent = parent
         # Automatic paths object #
-        self.paths = AutoPaths(self.parent.data_dir, self.all_paths)
+        self.paths = AutoPaths(self.parent.work_dir, self.all_paths)
 
     def __call__(self):
         self.create_json()
@@ -122,7 +122,10 @@ class LaunchSIT(object):
         else:           cmd = (      '-c', self.create_json.paths.json)
         # Do it #
         self.log.info("Launching StandardImportToolPlugin.exe in %s." % self.short_name)
-        pbs3.Command("StandardImportToolPlugin.exe")(*cmd)
+        self.supervisor.run_process(self.stage_name,
+                                    ("StandardImportToolPlugin.exe",) + cmd,
+                                    logs    = [self.paths.SITLog],
+                                    watched = [self.paths.SITLog.directory])
         self.log.info("StandardImportToolPlugin has completed.")
 
     def move_log(self):
@@ -144,6 +147,11 @@ class LaunchSIT(object):
         """Convenience shortcut method."""
         return self.parent.log
 
+    @property
+    def supervisor(self):
+        """Kills SIT if it hangs, see `core/supervisor.py`."""
+        return self.parent.supervisor
+
     @property
     def tail(self):
         """Shortcut: view the end of the log file."""
@@ -158,6 +166,7 @@ class DefaultSIT(LaunchSIT):
 
     append = False
     short_name = "default_mode"
+    stage_name = "default_sit"
 
     all_paths = """
     /input/sit_config/default_config.json
@@ -180,6 +189,7 @@ class AppendSIT(LaunchSIT):
 
     append = True
     short_name = "append_mode"
+    stage_name = "append_sit"
 
     all_paths = """
     /input/sit_config/append_config.json
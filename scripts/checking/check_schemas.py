@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A script to check that the original CSV files of every country
+match the data types declared in `pump/schemas.py`.
+
+Typically you would run this file from a command line like this:
+
+    ipython3.exe -i -- /deploy/cbmcfs3_runner/scripts/checking/check_schemas.py
+"""
+
+# Built-in modules #
+
+# Third party modules #
+import pandas
+from tqdm import tqdm
+
+# First party modules #
+
+# Internal modules #
+from cbmcfs3_runner.core.continent import continent
+from cbmcfs3_runner.pump.schemas import schemas
+
+###############################################################################
+# Check every file of every country #
+reports = []
+for country in tqdm(continent.countries.values()):
+    for name, schema in schemas.items():
+        path = country.orig_data.paths.export_dir + name + '.csv'
+        if not path.exists: continue
+        df     = pandas.read_csv(str(path))
+        report = schema.validate(df)
+        report.insert(0, 'file',    name)
+        report.insert(0, 'country', country.iso2_code)
+        reports.append(report)
+
+# Print the problems #
+df = pandas.concat(reports, ignore_index=True)
+with pandas.option_context('display.max_rows', None, 'display.width', 200):
+    print(df if not df.empty else "All files match their schema.")
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A script to see by how much the number of inventory records of each
+country would be reduced by merging the records that only differ by area.
+To enable it, set `PreProcessor.compact_inventory` to True.
+
+Typically you would run this file from a command line like this:
+
+    ipython3.exe -i -- /deploy/cbmcfs3_runner/scripts/checking/inventory_compaction.py
+"""
+
+# Built-in modules #
+
+# Third party modules #
+import pandas
+
+# First party modules #
+
+# Internal modules #
+from cbmcfs3_runner.core.continent import continent
+from cbmcfs3_runner.pre_processor.compaction import reduction_ratios
+
+###############################################################################
+# Compute #
+df = reduction_ratios(continent)
+
+# Print the full table #
+with pandas.option_context('display.max_rows', None, 'display.width', 200):
+    print(df.sort_values('ratio'))
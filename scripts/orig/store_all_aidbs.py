@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A script to put the AIDB of every country in the content addressed store,
+so that identical AIDBs are kept only once, and show which countries
+share the same one.
+
+Typically you would run this file from a command line like this:
+
+     ipython3.exe -i -- /deploy/cbmcfs3_runner/scripts/orig/store_all_aidbs.py
+"""
+
+# Built-in modules #
+
+# Third party modules #
+from tqdm import tqdm
+
+# First party modules #
+
+# Internal modules #
+from cbmcfs3_runner.core.continent import continent
+from cbmcfs3_runner.pump.aidb_store import aidb_store
+
+###############################################################################
+if __name__ == '__main__':
+    # Store #
+    countries = [c for c in continent if c.aidb.paths.aidb.exists]
+    digests   = [c.aidb.store() for c in tqdm(countries)]
+    # Report #
+    df = aidb_store.report(countries)
+    print(df)
+    print("%i countries use %i distinct AIDBs." % (len(df), df['md5'].nunique()))
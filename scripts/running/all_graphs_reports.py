@@ -4,12 +4,15 @@
 """
 A script to regenerate all the graphs for every country object and every runner object as well (of the static demand scenario).
 
+Only the graphs whose data changed are redrawn, in parallel. Pass `--rerun` to force all of them.
+
 Typically you would run this file from a command line like this:
 
      ipython3.exe -i -- /deploy/cbmcfs3_runner/scripts/running/all_graphs_reports.py
 """
 
 # Built-in modules #
+import sys
 
 # Third party modules #
 from tqdm import tqdm
@@ -18,19 +21,32 @@ from tqdm import tqdm
 
 # Internal modules #
 from cbmcfs3_runner.core.continent import continent
+from cbmcfs3_runner.graphs import render_many
 
 ################################################################################
-for country in tqdm(continent.countries.values()):
-    # Get scenarios #
-    runner = country.scenarios['static_demand'][-1]
+def render_all():
+    """Render all graphs in a process pool, skipping unchanged ones."""
+    # Get runners #
+    runners = [c.scenarios['static_demand'][-1] for c in continent.countries.values()]
     # Optionally, filter runners #
-    #if runner.map_value < 1.0: continue
-    # Purge runners #
-    runner.paths.graphs_dir.remove()
-    # Purge country #
-    country.paths.graphs_dir.remove()
-    # Runner report #
-    runner.report()
-    # Country report #
-    country.report()
-    country.report.copy_to_outbox()
+    #runners = [r for r in runners if r.map_value >= 1.0]
+    # Render #
+    containers = [r.graphs for r in runners] + [c.graphs for c in continent.countries.values()]
+    render_many(containers, rerun='--rerun' in sys.argv)
+
+def all_reports():
+    for country in tqdm(continent.countries.values()):
+        # Get scenarios #
+        runner = country.scenarios['static_demand'][-1]
+        # Runner report #
+        runner.report()
+        # Country report #
+        country.report()
+        country.report.copy_to_outbox()
+
+################################################################################
+# The worker processes import this file again on Windows, this guard
+# prevents them from starting pools of their own.
+if __name__ == '__main__':
+    render_all()
+    all_reports()
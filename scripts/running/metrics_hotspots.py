@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A script to show which stages of the pipeline take the most time
+and resources, aggregated over all countries of a given scenario.
+
+Typically you would run this file from a command line like this:
+
+    ipython3.exe -i -- /deploy/cbmcfs3_runner/scripts/running/metrics_hotspots.py static_demand
+"""
+
+# Built-in modules #
+import sys
+
+# Third party modules #
+import pandas
+
+# First party modules #
+
+# Internal modules #
+from cbmcfs3_runner.core.continent import continent
+
+###############################################################################
+# Which scenario #
+scen_name = sys.argv[1] if len(sys.argv) > 1 else 'static_demand'
+scenario  = continent.scenarios[scen_name]
+
+# Aggregate #
+df = scenario.metrics_hotspots()
+
+# Print the full table #
+with pandas.option_context('display.max_rows', None, 'display.width', 200):
+    print(df)
@@ -3,6 +3,8 @@
 
 """
 A script to rerun only the countries that didn't pass (in a given scenario).
+Those that failed for a reason that trying again won't fix, such as
+invalid disturbances, are only listed.
 
 Typically you would run this file from a command line like this:
 
@@ -18,20 +20,21 @@ from tqdm import tqdm
 
 # Internal modules #
 from cbmcfs3_runner.core.continent import continent
+from cbmcfs3_runner.core.supervisor import permanent_reasons
 
 ###############################################################################
 # Get the failed ones #
 scenario       = continent.scenarios['static_demand']
-runners        = [r[-1] for k,r in scenario.runners.items()]
-failed_runners = [r for r in runners if r.map_value < 1.0]
+failed_runners = scenario.failed_runners()
+
+# The ones not worth running again #
+status = scenario.status
+print(status[status['failure_reason'].isin(permanent_reasons)])
 
 # Run them #
 for r in tqdm(failed_runners):
     r(interrupt_on_error=False)
 
 ###############################################################################
-# Print the tails of the logs to see if they passed this time #
-for r in failed_runners:
-    print("---------------")
-    print(r.country.iso2_code)
-    print(r.tail)
\ No newline at end of file
+# Print the status to see if they passed this time #
+print(scenario.status.query("status != 'completed'"))
\ No newline at end of file